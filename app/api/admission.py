@@ -0,0 +1,93 @@
+import math
+
+from fastapi import HTTPException, Request, status
+
+from app.config.app_config import settings
+from app.persistence.database import pool_size
+from app.persistence.device_keys import device_key_table
+from app.utils.auth import credentials_exception, device_key_pepper, verify_access_token
+from app.utils.metrics import WRITES_IN_FLIGHT, record_admission
+from app.utils.rate_limit import ConcurrencyLimiter, RateLimiter
+
+
+# Admission control of write requests, run before any database work: a token bucket
+# per client and route policy, then a limit on the writes in progress in this worker.
+# Both are kept in process memory, so with several workers a client may make
+# UVICORN_WORKERS times more requests.
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+DEFAULT_POLICY = "default"
+
+rate_limiters = {policy: RateLimiter(rate, burst) for policy, (rate, burst) in settings.RATE_LIMITS.items()}
+
+# Writes hold a pooled connection each; half the pool is left to reads
+write_limiter = ConcurrencyLimiter(settings.WRITE_CONCURRENCY or max(1, pool_size() // 2))
+
+
+def client_identity(request: Request) -> str:
+    """
+    Identify the client of a request without the database: its device key, user or address.
+
+    Device keys are looked up in the loaded key table only; keys it does not hold yet,
+    and invalid credentials, fall back to the address and are rejected by authentication.
+    """
+    api_key = request.headers.get("x-api-key")
+    if api_key:
+        device_key = device_key_table.peek(api_key, device_key_pepper())
+        if device_key is not None:
+            return f"device:{device_key.id}"
+
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            return f"user:{verify_access_token(token, credentials_exception)['id']}"
+        except HTTPException:
+            pass
+
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def route_policy(request: Request) -> str:
+    """
+    Rate limit policy of a request: the name of its endpoint without the _endpoint suffix, if it has limits.
+    """
+    route = request.scope.get("route")
+    name = getattr(route, "name", "").removesuffix("_endpoint")
+    return name if name in rate_limiters else DEFAULT_POLICY
+
+
+def too_many_requests(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+async def admit_write(request: Request):
+    """
+    Admit a write request, or reject it with 429 and Retry-After.
+    """
+    if not settings.RATE_LIMIT_ENABLED or request.method in READ_METHODS:
+        yield
+        return
+
+    policy = route_policy(request)
+    limiter = rate_limiters.get(policy)
+    if limiter is not None:
+        retry_after = limiter.acquire(client_identity(request))
+        if retry_after:
+            record_admission(policy, "rate_limited")
+            raise too_many_requests("Rate limit exceeded", retry_after)
+
+    if not write_limiter.try_acquire():
+        record_admission(policy, "overloaded")
+        raise too_many_requests("Too many writes in progress", 1)
+
+    record_admission(policy, "admitted")
+    WRITES_IN_FLIGHT.inc()
+    try:
+        yield
+    finally:
+        WRITES_IN_FLIGHT.dec()
+        write_limiter.release()
@@ -0,0 +1,94 @@
+import json
+from typing import Any, AsyncIterator
+
+from fastapi import HTTPException, Request, status
+
+from app.api.negotiation import BODY_DECODERS, MSGPACK_MEDIA_TYPE, NegotiatedRoute, media_type_of
+from app.config.app_config import settings
+
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/jsonl")
+
+
+class IngestRoute(NegotiatedRoute):
+    """
+    Route for ingest endpoints, accepting gzip and zstd compressed bodies up to INGEST_MAX_BODY_BYTES.
+    """
+
+    max_body_size = settings.INGEST_MAX_BODY_BYTES
+
+
+async def iter_items(request: Request) -> AsyncIterator[Any]:
+    """
+    Parse the items of a batch body as they are received.
+
+    NDJSON and concatenated MessagePack bodies are parsed incrementally, so only one
+    received chunk is held at a time. JSON arrays and CBOR bodies are parsed whole,
+    within the route's body size limit. Top level arrays are unpacked into their items.
+    """
+    media_type = request.scope.get("hh.body_media_type") or media_type_of(request.headers.get("content-type"))
+
+    if media_type in NDJSON_MEDIA_TYPES:
+        items = _iter_ndjson(request)
+    elif media_type in (MSGPACK_MEDIA_TYPE, "application/x-msgpack"):
+        items = _iter_msgpack(request)
+    else:
+        items = _iter_document(request, media_type)
+
+    async for item in items:
+        if isinstance(item, list):
+            for element in item:
+                yield element
+        else:
+            yield item
+
+
+async def _iter_ndjson(request: Request) -> AsyncIterator[Any]:
+    buffer = b""
+    line_number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield _loads_line(line, line_number)
+
+    if buffer.strip():
+        yield _loads_line(buffer, line_number + 1)
+
+
+def _loads_line(line: bytes, line_number: int) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON on line {line_number}: {e}")
+
+
+async def _iter_msgpack(request: Request) -> AsyncIterator[Any]:
+    import msgpack
+
+    unpacker = msgpack.Unpacker(timestamp=3, max_buffer_size=request.scope.get("hh.max_body_size") or 0)
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        unpacker.feed(chunk)
+        try:
+            items = list(unpacker)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid MessagePack body: {e}")
+        for item in items:
+            yield item
+
+    if unpacker.tell() != received:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid MessagePack body: unexpected end of data")
+
+
+async def _iter_document(request: Request, media_type: str) -> AsyncIterator[Any]:
+    body = await request.body()
+    decoder = BODY_DECODERS.get(media_type, json.loads)
+    try:
+        document = decoder(body)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid body: {e}")
+    yield document
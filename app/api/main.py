@@ -1,12 +1,21 @@
-from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+import functools
 import logging
+import os
 from fastapi import FastAPI
-import uvicorn
 
 from app.config.app_config import settings
-from app.config.logging_config import init_logger, get_module_logger
-from app.api.routers import auth_router, data_metas_router, data_points_router, datas_router, metas_router, root_router, users_router, catch_all
-from app.persistence.database import init_db
+from app.config.logging_config import init_logger, get_module_logger, stop_logger
+from app.api.routers import auth_router, data_metas_router, devices_router, data_points_router, datas_router, metas_router, metrics_router, profiles_router, root_router, stream_router, users_router, catch_all
+from app.persistence.database import dispose_engine, get_db, init_db, query_tracer, start_change_bus, stop_change_bus
+from app.persistence.device_keys import device_key_table
+from app.persistence.meta_catalog import meta_catalog
+from app.persistence.repositories.data_point_repo import DataPointRepository
+from app.persistence.versions import Change
+from app.utils.metrics import MetricsMiddleware, mark_process_dead
+from app.utils.single_flight import SingleFlightMiddleware, coalesced_routes
+from app.utils.streams import stream_hub
 
 
 @asynccontextmanager
@@ -15,10 +24,85 @@ async def lifespan(app: FastAPI):
     init_logger()
     logger = get_module_logger()
     logger.info("App is starting up...")
+    # Data points of other workers are read off the change bus listener, which must keep up with notifications
+    stream_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hh-remote-streams")
+    start_change_bus(functools.partial(apply_remote_changes, stream_executor=stream_executor), drop_caches)
+
+    mqtt_gateway = None
+    if settings.MQTT_ENABLED:
+        from app.core.services.mqtt_gateway import create_mqtt_gateway
+
+        mqtt_gateway = create_mqtt_gateway()
+        mqtt_gateway.start()
     yield
 
     # Shutdown code
     logger.info("App is shutting down...")
+    if mqtt_gateway is not None:
+        mqtt_gateway.stop()
+    stop_change_bus()
+    stream_executor.shutdown(cancel_futures=True)
+    dispose_engine()
+    mark_process_dead()
+    stop_logger()
+
+
+def apply_remote_changes(
+        changes: list[Change],
+        stream_executor: ThreadPoolExecutor
+        ) -> None:
+    """
+    Bring this worker's caches and streams up to date with changes committed by another worker.
+
+    Caches are updated at once; new data points are read and streamed in the executor.
+    """
+    for change in changes:
+        if change.table == "meta":
+            if meta_catalog.version is not None and meta_catalog.version < change.version:
+                meta_catalog.clear()
+        elif change.table == "device_key":
+            device_key_table.invalidate()
+        elif change.table == "data_point" and change.count and stream_hub.has_subscribers(change.data_id):
+            stream_executor.submit(stream_remote_data_points, change)
+
+
+def stream_remote_data_points(change: Change) -> None:
+    """
+    Publish the data points of another worker's change to the stream subscribers.
+    """
+    # Subscribers buffer STREAM_QUEUE_SIZE points at most, so older ones would be dropped anyway
+    try:
+        with contextmanager(get_db)() as db:
+            events = DataPointRepository(db).get_recent_data_points(change.data_id, change.id, min(change.count, settings.STREAM_QUEUE_SIZE))
+    except Exception:
+        get_module_logger().exception(f"Cannot stream the new data points of data {change.data_id}")
+        return
+    stream_hub.publish(change.data_id, events)
+
+
+def drop_caches() -> None:
+    """
+    Drop the caches kept up to date by the change bus, after changes may have been missed.
+    """
+    meta_catalog.clear()
+    device_key_table.invalidate()
+
+
+def prepare_multiprocess_metrics():
+    """
+    Point the workers at an empty directory for their metrics, a temporary one unless PROMETHEUS_MULTIPROC_DIR is set.
+    """
+    import tempfile
+
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not directory:
+        directory = os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="hh-metrics-")
+    os.makedirs(directory, exist_ok=True)
+
+    # Files of a previous run would be added to this one's
+    for name in os.listdir(directory):
+        if name.endswith(".db"):
+            os.remove(os.path.join(directory, name))
 
 
 def main():
@@ -26,15 +110,55 @@ def main():
     init_logger()
     logging.info("Logger initialised successfully")
 
-    # Initialize database
+    # Initialize database, then release its connections before the workers start
     init_db()
+    dispose_engine()
+
+    # Workers share their metrics through files, set up before they start
+    if settings.UVICORN_WORKERS > 1:
+        prepare_multiprocess_metrics()
 
-    # Run the server
-    uvicorn.run('app.api.main:app', host=settings.UVICORN_HOST, port=settings.UVICORN_PORT, reload=settings.UVICORN_RELOAD)
+    # Run the server. Workers are separate processes, each with its own share of the connection budget,
+    # and are replaced gracefully after WORKER_MAX_REQUESTS requests.
+    import uvicorn
+
+    uvicorn.run(
+        'app.api.main:app', 
+        host=settings.UVICORN_HOST, 
+        port=settings.UVICORN_PORT, 
+        reload=settings.UVICORN_RELOAD,
+        workers=settings.UVICORN_WORKERS,
+        limit_max_requests=settings.WORKER_MAX_REQUESTS or None,
+        limit_max_requests_jitter=settings.WORKER_MAX_REQUESTS_JITTER,
+        timeout_graceful_shutdown=settings.WORKER_GRACEFUL_TIMEOUT,
+        log_config=None, # Logging is configured by init_logger, in each worker
+        )
 
 
 app = FastAPI(debug=settings.API_DEBUG, lifespan=lifespan)
 
+# Concurrent identical reads, such as dashboards refreshing together, share one computation
+if settings.SINGLE_FLIGHT_ENABLED:
+    app.add_middleware(
+        SingleFlightMiddleware, 
+        routes=coalesced_routes(datas_router.router.routes + data_points_router.router.routes, settings.SINGLE_FLIGHT_ROUTES),
+        )
+app.add_middleware(MetricsMiddleware, on_request=query_tracer.report)
+
+# Request profiling, installed only when enabled so that it costs nothing otherwise
+if settings.PROFILING_ENABLED:
+    from app.utils.profiling import ProfilingMiddleware, instrument_sync_endpoints
+
+    app.add_middleware(
+        ProfilingMiddleware, 
+        directory=settings.PROFILING_DIR, 
+        token=settings.PROFILING_TOKEN, 
+        sample_rate=settings.PROFILING_SAMPLE_RATE, 
+        keep=settings.PROFILING_KEEP,
+        )
+    for _router in (auth_router, datas_router, data_points_router, users_router, metas_router, data_metas_router, devices_router):
+        instrument_sync_endpoints(_router.router.routes)
+
 # Include routers
 app.include_router(root_router.router)
 app.include_router(auth_router.router)
@@ -43,6 +167,11 @@ app.include_router(data_points_router.router)
 app.include_router(users_router.router)
 app.include_router(metas_router.router)
 app.include_router(data_metas_router.router)
+app.include_router(devices_router.router)
+app.include_router(stream_router.router)
+app.include_router(metrics_router.router)
+if settings.PROFILING_ENABLED:
+    app.include_router(profiles_router.router)
 app.include_router(catch_all.router)
 
 
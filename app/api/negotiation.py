@@ -0,0 +1,190 @@
+import importlib.util
+from typing import Any, AsyncGenerator, Callable
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
+
+from app.api.responses import CBOR_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, CBORResponse, MsgPackResponse, ORJSONResponse
+from app.utils.decompression import SUPPORTED_ENCODINGS, BoundedDecompressor, DecompressedSizeExceededException, InvalidCompressedDataException
+
+
+JSON_MEDIA_TYPE = "application/json"
+
+# CBOR is only offered when the optional cbor2 package is installed
+RESPONSE_CLASSES = {
+    JSON_MEDIA_TYPE: ORJSONResponse,
+    MSGPACK_MEDIA_TYPE: MsgPackResponse,
+    "application/x-msgpack": MsgPackResponse,
+}
+if importlib.util.find_spec("cbor2"):
+    RESPONSE_CLASSES[CBOR_MEDIA_TYPE] = CBORResponse
+
+
+def _decode_msgpack(body: bytes) -> Any:
+    import msgpack
+
+    return msgpack.unpackb(body, timestamp=3)
+
+
+def _decode_cbor(body: bytes) -> Any:
+    import cbor2
+
+    return cbor2.loads(body)
+
+
+BODY_DECODERS = {
+    MSGPACK_MEDIA_TYPE: _decode_msgpack,
+    "application/x-msgpack": _decode_msgpack,
+}
+if CBOR_MEDIA_TYPE in RESPONSE_CLASSES:
+    BODY_DECODERS[CBOR_MEDIA_TYPE] = _decode_cbor
+
+
+def media_type_of(header: str | None) -> str:
+    """
+    Get the bare media type of a Content-Type header.
+    """
+    return (header or "").split(";", 1)[0].strip().lower()
+
+
+def negotiate(accept: str | None) -> str:
+    """
+    Pick the response media type for an Accept header, defaulting to JSON.
+    """
+    if not accept:
+        return JSON_MEDIA_TYPE
+
+    candidates = []
+    for position, item in enumerate(accept.split(",")):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        candidates.append((-quality, position, media_type.lower()))
+
+    for negative_quality, _, media_type in sorted(candidates):
+        if negative_quality == 0:
+            break
+        if media_type in RESPONSE_CLASSES:
+            return media_type
+        if media_type in ("*/*", "application/*"):
+            return JSON_MEDIA_TYPE
+
+    return JSON_MEDIA_TYPE
+
+
+def negotiated_response(
+        request: Request, 
+        content: Any, 
+        status_code: int = 200, 
+        headers: dict[str, str] | None = None
+        ) -> Response:
+    """
+    Render content as JSON, MessagePack or CBOR according to the request's Accept header.
+    """
+    response_class = RESPONSE_CLASSES[negotiate(request.headers.get("accept"))]
+    headers = {**(headers or {}), "Vary": "Accept"}
+    return response_class(content, status_code=status_code, headers=headers)
+
+
+class DecodedBodyRequest(Request):
+    """
+    Request whose body may be compressed, or sent as MessagePack or CBOR.
+
+    The body is decompressed while it is received, failing with 413 as soon as it
+    passes the route's size limit. MessagePack and CBOR bodies are decoded straight
+    to Python objects.
+    """
+
+    async def stream(self) -> AsyncGenerator[bytes, None]:
+        max_body_size = self.scope.get("hh.max_body_size")
+        if max_body_size is None or hasattr(self, "_body"):
+            async for chunk in super().stream():
+                yield chunk
+            return
+
+        decompressor = BoundedDecompressor(self.scope.get("hh.content_encoding") or "identity", max_body_size)
+        try:
+            async for chunk in super().stream():
+                for piece in decompressor.decompress(chunk):
+                    yield piece
+            for piece in decompressor.flush():
+                yield piece
+        except DecompressedSizeExceededException as e:
+            raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=str(e))
+        except InvalidCompressedDataException as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        yield b""
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            media_type = self.scope.get("hh.body_media_type")
+            if media_type not in BODY_DECODERS:
+                return await super().json()
+            self._json = BODY_DECODERS[media_type](await self.body())
+        return self._json
+
+
+class NegotiatedRoute(APIRoute):
+    """
+    Route accepting MessagePack and CBOR request bodies as well as JSON.
+
+    FastAPI only parses JSON bodies, so those requests are presented to it as JSON
+    while their json() decodes the original format, without re-encoding anything.
+
+    Routes with a max_body_size also accept gzip and zstd Content-Encoding, and
+    reject bodies larger than max_body_size once decompressed.
+    """
+
+    max_body_size: int | None = None
+
+    def get_route_handler(self) -> Callable:
+        route_handler = super().get_route_handler()
+
+        async def negotiated_route_handler(request: Request) -> Response:
+            scope = dict(request.scope)
+
+            encoding = (request.headers.get("content-encoding") or "identity").strip().lower()
+            if self.max_body_size is not None:
+                if encoding not in ("identity", *SUPPORTED_ENCODINGS):
+                    raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=f"Unsupported content encoding '{encoding}'")
+                _check_content_length(request, self.max_body_size)
+                scope["hh.content_encoding"] = encoding
+                scope["hh.max_body_size"] = self.max_body_size
+            elif encoding != "identity":
+                raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Compressed request bodies are not accepted here")
+
+            media_type = media_type_of(request.headers.get("content-type"))
+            if media_type in BODY_DECODERS:
+                scope["headers"] = [
+                    (name, value) for name, value in scope["headers"] if name != b"content-type"
+                    ] + [(b"content-type", JSON_MEDIA_TYPE.encode("latin-1"))]
+                scope["hh.body_media_type"] = media_type
+
+            if len(scope) != len(request.scope):
+                request = DecodedBodyRequest(scope, request.receive)
+            return await route_handler(request)
+
+        return negotiated_route_handler
+
+
+def _check_content_length(request: Request, max_body_size: int) -> None:
+    """
+    Reject a body before reading it when its declared length already passes the limit.
+
+    This holds for compressed bodies too: compression only adds a few bytes of
+    framing to incompressible content, so a compressed body over the limit cannot
+    decompress to within it.
+    """
+    try:
+        content_length = int(request.headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Content-Length")
+
+    if content_length > max_body_size:
+        raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=f"Body exceeds {max_body_size} bytes")
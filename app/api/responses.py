@@ -0,0 +1,56 @@
+import datetime
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse, Response
+
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+CBOR_MEDIA_TYPE = "application/cbor"
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson.
+
+    Endpoints on the fast path return this directly with plain dicts built from
+    Core rows, which skips response_model validation and jsonable_encoder.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _msgpack_default(obj: Any) -> Any:
+    import msgpack
+
+    # Naive datetimes from the database are UTC
+    if isinstance(obj, datetime.datetime):
+        if obj.tzinfo is None:
+            obj = obj.replace(tzinfo=datetime.timezone.utc)
+        return msgpack.Timestamp.from_datetime(obj)
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+
+class MsgPackResponse(Response):
+    """
+    MessagePack response. Datetimes are encoded as native timestamps.
+    """
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        import msgpack
+
+        return msgpack.packb(content, default=_msgpack_default)
+
+
+class CBORResponse(Response):
+    """
+    CBOR response. Datetimes are encoded as native epoch timestamps.
+    """
+    media_type = CBOR_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        import cbor2
+
+        return cbor2.dumps(content, datetime_as_timestamp=True, timezone=datetime.timezone.utc)
@@ -12,20 +12,19 @@ router = APIRouter(
 
 
 @router.post("/login")
-def login(
+async def login(
     user_credentials: OAuth2PasswordRequestForm = Depends(), 
     user_service: UserService = Depends(get_user_service),
     ):
     """
     Login a user.
+
+    Password checks run in a dedicated thread pool, so a burst of logins cannot hold up other requests.
     """
-    user = user_service.get_user_by_email(user_credentials.username)
+    user = await user_service.authenticate(user_credentials.username, user_credentials.password)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-    if not auth_utils.verify_password(user_credentials.password, user.password):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-
     access_token = auth_utils.create_access_token(data={"user_id": user.id})
     return {
         "access_token": access_token, 
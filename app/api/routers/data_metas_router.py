@@ -1,13 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 
+from app.api.admission import admit_write
 from app.api.schemas.pagination_schema import PaginatedResponse
 from app.api.schemas import data_meta_schema
 from app.core.services.data_meta_service import DataMetaService, get_data_meta_service
 from app.core.services.data_service import DataService, get_data_service
 from app.core.services.exceptions import IntegrityConstraintViolationException
+from app.utils.conditional import conditional
 from app.utils.pagination import PaginationContext
 
-router = APIRouter(prefix="/datas/{data_id}/metas", tags=["Data Metas"])
+router = APIRouter(prefix="/datas/{data_id}/metas", tags=["Data Metas"], dependencies=[Depends(admit_write)])
+
+data_metas_conditional = conditional("data:{data_id}", "data_meta:{data_id}")
 
 
 @router.post("/", response_model=data_meta_schema.DataMetaResponse, status_code=status.HTTP_201_CREATED)
@@ -35,7 +39,7 @@ def create_data_meta_endpoint(
     return data_meta_res
 
 
-@router.get("/", response_model=PaginatedResponse[data_meta_schema.DataMetaResponse])
+@router.get("/", response_model=PaginatedResponse[data_meta_schema.DataMetaResponse], dependencies=[Depends(data_metas_conditional)])
 def list_data_metas_endpoint(
     data_id: int, 
     limit: int = Query(10, ge=1, le=100, description="Number of records to fetch"),
@@ -59,7 +63,7 @@ def list_data_metas_endpoint(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(ex))
 
 
-@router.get("/{meta_id}", response_model=data_meta_schema.DataMetaResponse)
+@router.get("/{meta_id}", response_model=data_meta_schema.DataMetaResponse, dependencies=[Depends(data_metas_conditional)])
 def get_data_meta_endpoint(
     data_id: int, 
     meta_id: int, 
@@ -88,7 +92,7 @@ def update_data_meta_endpoint(
     data_meta_service: DataMetaService = Depends(get_data_meta_service)
     ):
     """
-    Update a data meta.
+    Set the value of a meta for a data, creating the data meta if it does not exist.
     """
     if not data_id == data_meta_update.data_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Data id mismatch")
@@ -101,11 +105,11 @@ def update_data_meta_endpoint(
 
     try:
         data_meta = data_meta_service.update_data_meta(data_meta_update)
-    except data_meta_service.IntegrityConstraintViolationException as ex:
+    except IntegrityConstraintViolationException as ex:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(ex))
 
     if not data_meta:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Data meta not found")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Meta not found")
     return data_meta
 
 
@@ -1,14 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from datetime import datetime
 
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+
+from app.api.admission import admit_write
+from app.api.ingest import IngestRoute, iter_items
+from app.api.negotiation import negotiated_response
 from app.api.schemas import data_point_schema
 from app.api.schemas.pagination_schema import PaginatedResponse
 from app.core.services.data_point_service import DataPointService, get_data_point_service
 from app.core.services.data_service import DataService, get_data_service
+from app.config.app_config import settings
 from app.core.services.exceptions import IntegrityConstraintViolationException, NotFoundException, ValidationException
+from app.utils.auth import Principal, get_current_principal
+from app.utils.conditional import Validators, conditional
+from app.utils.metrics import record_ingest
 from app.utils.pagination import PaginationContext
 
 
-router = APIRouter(prefix="/datas/{data_id}/data_points", tags=["Data Points"])
+router = APIRouter(prefix="/datas/{data_id}/data_points", tags=["Data Points"], dependencies=[Depends(admit_write)], route_class=IngestRoute)
+
+data_points_conditional = conditional("data:{data_id}", "data_point:{data_id}")
 
 
 @router.post("/", response_model=data_point_schema.DataPointResponse, status_code=status.HTTP_201_CREATED)
@@ -16,9 +28,15 @@ def add_data_point_endpoint(
     data_id: int,
     data_point_create: data_point_schema.DataPointCreate, 
     data_point_service: DataPointService = Depends(get_data_point_service),
+    principal: Principal = Depends(get_current_principal)
     ):
     """
     Create a data point.
+
+    Authenticate with a bearer token or a device API key in `X-API-Key`.
+
+    The body may be JSON, MessagePack (`application/msgpack`) or CBOR (`application/cbor`),
+    optionally compressed with `Content-Encoding: gzip` or `zstd`.
     """
     if not data_id == data_point_create.data_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Data id mismatch")
@@ -32,19 +50,75 @@ def add_data_point_endpoint(
     except ValidationException as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
+    record_ingest(1)
     return data_point
 
 
-@router.get("/", response_model=PaginatedResponse[data_point_schema.DataPointResponse])
+@router.post(
+    "/batch", 
+    response_model=data_point_schema.DataPointBatchResponse, 
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra={"requestBody": {"required": True, "content": {
+        "application/json": {"schema": {"type": "array", "items": {"type": "object"}}},
+        "application/x-ndjson": {"schema": {"type": "string"}},
+        "application/msgpack": {"schema": {"type": "string", "format": "binary"}},
+        }}}
+    )
+async def add_data_points_endpoint(
+    request: Request,
+    data_id: int,
+    data_point_service: DataPointService = Depends(get_data_point_service),
+    principal: Principal = Depends(get_current_principal)
+    ):
+    """
+    Create many data points for a data in one transaction.
+
+    Authenticate with a bearer token or a device API key in `X-API-Key`.
+
+    The body is a JSON array, NDJSON (one data point per line) or a MessagePack array or
+    stream, optionally compressed with `Content-Encoding: gzip` or `zstd`. It is decompressed
+    and inserted in batches while it is received; a body over the size limit is rejected
+    with 413 and nothing is stored.
+    """
+    count = 0
+    batch = []
+
+    # Nothing is committed until the whole body is stored; on any error the
+    # session is closed by get_db, which rolls the transaction back.
+    try:
+        async for item in iter_items(request):
+            batch.append(item)
+            if len(batch) >= settings.INGEST_BATCH_SIZE:
+                count += await run_in_threadpool(data_point_service.add_data_points, data_id, batch, count)
+                batch = []
+        if batch:
+            count += await run_in_threadpool(data_point_service.add_data_points, data_id, batch, count)
+        await run_in_threadpool(data_point_service.commit_data_points, data_id)
+    except IntegrityConstraintViolationException as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except NotFoundException as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValidationException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    record_ingest(count)
+    return {"data_id": data_id, "count": count}
+
+
+@router.get("/", response_model=None, responses={200: {"model": PaginatedResponse[data_point_schema.DataPointResponse]}})
 def list_data_points_endpoint(
+    request: Request,
     data_id: int, 
     limit: int = Query(10, ge=1, le=100, description="Number of records to fetch"),
     offset: int = Query(0, ge=0, description="Number of records to skip"),
     data_point_service: DataPointService = Depends(get_data_point_service),
-    data_service: DataService = Depends(get_data_service)
+    data_service: DataService = Depends(get_data_service),
+    validators: Validators = Depends(data_points_conditional)
     ):
     """
     Get all data points for a data.
+
+    Responds with MessagePack or CBOR instead of JSON when the Accept header asks for it.
     """
     data = data_service.get_data_by_id(data_id)
     if not data:
@@ -52,11 +126,56 @@ def list_data_points_endpoint(
 
     context = PaginationContext(limit=limit, offset=offset)
     
-    paged_response = data_point_service.get_data_points(context, data_id)
-    return paged_response
+    paged_response = data_point_service.get_data_point_rows(context, data_id)
+    return negotiated_response(request, paged_response, headers=validators.headers)
+
+
+@router.get("/latest", response_model=data_point_schema.DataPointResponse, dependencies=[Depends(data_points_conditional)])
+def get_latest_data_point_endpoint(
+    data_id: int,
+    data_point_service: DataPointService = Depends(get_data_point_service),
+    data_service: DataService = Depends(get_data_service)
+    ):
+    """
+    Get the latest data point for a data.
+    """
+    data = data_service.get_data_by_id(data_id)
+    if not data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Data not found")
+    
+    data_point = data_point_service.get_latest_data_point(data_id)
+    if not data_point:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Data point not found")
+    return data_point
+
+
+@router.get("/aggregate", response_model=None, responses={200: {"model": data_point_schema.DataPointAggregateResponse}})
+def aggregate_data_points_endpoint(
+    request: Request,
+    data_id: int,
+    bucket_seconds: int = Query(3600, ge=1, le=366 * 86400, description="Width of the time buckets in seconds"),
+    start: datetime | None = Query(None, description="Earliest time of the data points, inclusive"),
+    end: datetime | None = Query(None, description="Latest time of the data points, exclusive"),
+    limit: int = Query(1000, ge=1, le=10000, description="Number of buckets to fetch"),
+    data_point_service: DataPointService = Depends(get_data_point_service),
+    data_service: DataService = Depends(get_data_service),
+    validators: Validators = Depends(data_points_conditional)
+    ):
+    """
+    Aggregate the data points of a data in time buckets, oldest first.
+
+    Each bucket has the number of data points; numeric data also get their min, max and average.
+    Responds with MessagePack or CBOR instead of JSON when the Accept header asks for it.
+    """
+    data = data_service.get_data_by_id(data_id)
+    if not data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Data not found")
+
+    aggregates = data_point_service.get_data_point_aggregates(data, bucket_seconds, start, end, limit)
+    return negotiated_response(request, aggregates, headers=validators.headers)
 
 
-@router.get("/{data_point_id}", response_model=data_point_schema.DataPointResponse)
+@router.get("/{data_point_id}", response_model=data_point_schema.DataPointResponse, dependencies=[Depends(data_points_conditional)])
 def get_data_point_endpoint(
     data_id: int,
     data_point_id: int, 
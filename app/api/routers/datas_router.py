@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
 
+from app.api.admission import admit_write
+from app.api.negotiation import negotiated_response
 from app.api.schemas.pagination_schema import PaginatedResponse
 from app.api.schemas import data_schema
-from app.core.services.exceptions import IntegrityConstraintViolationException
-from app.core.services.data_service import DataService, get_data_service
+from app.core.services.exceptions import IntegrityConstraintViolationException, ValidationException
+from app.core.services.data_service import DataService, get_data_service, parse_include
 from app.utils.auth import get_current_user_id
+from app.utils.conditional import Validators, conditional
 from app.utils.pagination import PaginationContext
 
 
-router = APIRouter(prefix="/datas", tags=["Datas"])
+router = APIRouter(prefix="/datas", tags=["Datas"], dependencies=[Depends(admit_write)])
 
 
 @router.post("/", response_model=data_schema.DataResponse, status_code=status.HTTP_201_CREATED)
@@ -27,34 +30,71 @@ def create_data_endpoint(
     return data
 
 
-@router.get("/", response_model=PaginatedResponse[data_schema.DataResponse])
+META_FILTER_PREFIX = "meta."
+
+
+INCLUDE_DESCRIPTION = "Comma separated relations to include: metas, created_by_user, latest"
+
+
+def includes_latest(request: Request) -> bool:
+    """
+    Latest data points change with every ingest, so such responses are not cached.
+    """
+    return "latest" in (request.query_params.get("include") or "")
+
+
+@router.get("/", response_model=None, responses={200: {"model": PaginatedResponse[data_schema.DataExpandedResponse]}})
 def list_datas_endpoint(
+    request: Request,
     search: str = Query(None, description="Search"),
+    include: str = Query(None, description=INCLUDE_DESCRIPTION),
     limit: int = Query(10, ge=1, le=100, description="Number of records to fetch"),
     offset: int = Query(0, ge=0, description="Number of records to skip"),
-    data_service: DataService = Depends(get_data_service)
+    data_service: DataService = Depends(get_data_service),
+    validators: Validators | None = Depends(conditional("data", "data_meta", "meta", "user", unless=includes_latest))
     ):
     """
     Get all datas.
+
+    Filter by meta values with `meta.<name>=<value>` query parameters, e.g. `?meta.room=kitchen&meta.unit=C`.
     """
+    try:
+        include_set = parse_include(include)
+    except ValidationException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     context = PaginationContext(limit=limit, offset=offset, search=search)
+    meta_filters = {
+        key[len(META_FILTER_PREFIX):]: value 
+        for key, value in request.query_params.items() 
+        if key.startswith(META_FILTER_PREFIX)
+        }
     
-    paged_response = data_service.get_datas(context)
-    return paged_response
+    # Items are serialized by the service, so skip validating them against a response_model again
+    paged_response = data_service.get_datas(context, meta_filters, include_set)
+    return negotiated_response(request, paged_response, headers=validators.headers if validators else None)
 
 
-@router.get("/{data_id}", response_model=data_schema.DataResponse)
+@router.get("/{data_id}", response_model=None, responses={200: {"model": data_schema.DataExpandedResponse}})
 def get_data_endpoint(
+    request: Request,
     data_id: int, 
-    data_service: DataService = Depends(get_data_service)
+    include: str = Query(None, description=INCLUDE_DESCRIPTION),
+    data_service: DataService = Depends(get_data_service),
+    validators: Validators | None = Depends(conditional("data:{data_id}", "data_meta:{data_id}", "user", unless=includes_latest))
     ):
     """
     Get a data.
     """
-    data = data_service.get_data_by_id(data_id)
+    try:
+        include_set = parse_include(include)
+    except ValidationException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    data = data_service.get_expanded_data_by_id(data_id, include_set)
     if not data:
         raise HTTPException(status_code=404, detail="Data not found")
-    return data
+    return negotiated_response(request, data, headers=validators.headers if validators else None)
 
 
 @router.put("/{data_id}", response_model=data_schema.DataResponse)
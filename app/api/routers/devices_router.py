@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from app.api.admission import admit_write
+from app.api.schemas import device_schema
+from app.api.schemas.pagination_schema import PaginatedResponse
+from app.core.services.device_service import DeviceService, get_device_service
+from app.core.services.exceptions import IntegrityConstraintViolationException
+from app.utils.auth import get_current_user_id
+from app.utils.pagination import PaginationContext
+
+
+router = APIRouter(prefix="/devices", tags=["Devices"], dependencies=[Depends(admit_write)])
+
+
+@router.post("/", response_model=device_schema.DeviceCreateResponse, status_code=status.HTTP_201_CREATED)
+def create_device_endpoint(
+    device_create: device_schema.DeviceCreate, 
+    device_service: DeviceService = Depends(get_device_service),
+    current_user_id: int = Depends(get_current_user_id)
+    ):
+    """
+    Create a device and its API key.
+
+    The key is only returned here. Devices send it in the `X-API-Key` header to the ingest endpoints.
+    """
+    try:
+        device = device_service.add_device(device_create, current_user_id)
+    except IntegrityConstraintViolationException as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return device
+
+
+@router.get("/", response_model=PaginatedResponse[device_schema.DeviceResponse])
+def list_devices_endpoint(
+    limit: int = Query(10, ge=1, le=100, description="Number of records to fetch"),
+    offset: int = Query(0, ge=0, description="Number of records to skip"),
+    device_service: DeviceService = Depends(get_device_service),
+    current_user_id: int = Depends(get_current_user_id)
+    ):
+    """
+    Get the devices created by the current user.
+    """
+    context = PaginationContext(limit=limit, offset=offset)
+
+    return device_service.get_devices(context, current_user_id)
+
+
+@router.delete("/{device_id}", status_code=status.HTTP_204_NO_CONTENT)
+def revoke_device_endpoint(
+    device_id: int, 
+    device_service: DeviceService = Depends(get_device_service),
+    current_user_id: int = Depends(get_current_user_id)
+    ):
+    """
+    Revoke the API key of a device.
+    """
+    success = device_service.revoke_device(device_id, current_user_id)
+    if not success:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Device not found")
+    return
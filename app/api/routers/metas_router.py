@@ -1,13 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 
+from app.api.admission import admit_write
 from app.core.services.exceptions import IntegrityConstraintViolationException
 from app.api.schemas.pagination_schema import PaginatedResponse
 from app.core.services.meta_service import MetaService, get_meta_service
 from app.api.schemas import meta_schema
+from app.utils.conditional import conditional
 from app.utils.pagination import PaginationContext
 
 
-router = APIRouter(prefix="/metas", tags=["Metas"])
+router = APIRouter(prefix="/metas", tags=["Metas"], dependencies=[Depends(admit_write)])
 
 
 @router.post("/", response_model=meta_schema.MetaResponse, status_code=status.HTTP_201_CREATED)
@@ -26,7 +28,7 @@ def create_meta_endpoint(
     return meta
 
 
-@router.get("/", response_model=PaginatedResponse[meta_schema.MetaResponse])
+@router.get("/", response_model=PaginatedResponse[meta_schema.MetaResponse], dependencies=[Depends(conditional("meta"))])
 def list_metas_endpoint(
     search: str = Query(None, description="Search"),
     limit: int = Query(10, ge=1, le=100, description="Number of records to fetch"),
@@ -42,7 +44,7 @@ def list_metas_endpoint(
     return paged_response
 
 
-@router.get("/{meta_id}", response_model=meta_schema.MetaResponse)
+@router.get("/{meta_id}", response_model=meta_schema.MetaResponse, dependencies=[Depends(conditional("meta"))])
 def get_meta_endpoint(
     meta_id: int, 
     meta_service: MetaService = Depends(get_meta_service)
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Response
+
+from app.utils.metrics import render_metrics
+
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """
+    Get the Prometheus metrics of the API.
+    """
+    content, media_type = render_metrics()
+    return Response(content=content, media_type=media_type)
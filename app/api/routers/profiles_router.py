@@ -0,0 +1,40 @@
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+
+from app.config.app_config import settings
+from app.utils.auth import get_current_user_id
+from app.utils.profiling import PROFILE_NAME
+
+
+router = APIRouter(prefix="/profiles", tags=["Profiles"])
+
+
+@router.get("/", response_model=list[str])
+def list_profiles_endpoint(
+    current_user_id: int = Depends(get_current_user_id)
+    ):
+    """
+    Get the names of the saved request profiles, newest first.
+    """
+    if not os.path.isdir(settings.PROFILING_DIR):
+        return []
+    names = [name for name in os.listdir(settings.PROFILING_DIR) if PROFILE_NAME.match(name)]
+    return sorted(names, key=lambda name: os.path.getmtime(os.path.join(settings.PROFILING_DIR, name)), reverse=True)
+
+
+@router.get("/{name}", response_class=FileResponse)
+def get_profile_endpoint(
+    name: str, 
+    current_user_id: int = Depends(get_current_user_id)
+    ):
+    """
+    Download a request profile as a pstats file.
+
+    Open it with `python -m pstats`, or as a flame graph with tools like snakeviz or flameprof.
+    """
+    path = os.path.join(settings.PROFILING_DIR, name)
+    if not PROFILE_NAME.match(name) or not os.path.isfile(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
@@ -0,0 +1,158 @@
+import asyncio
+import json
+from contextlib import contextmanager
+
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, WebSocketException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from fastapi.security.utils import get_authorization_scheme_param
+
+from app.config.app_config import settings
+from app.core.services.data_service import DataService
+from app.persistence.database import get_db
+from app.persistence.repositories.data_point_repo import DataPointRepository
+from app.persistence.repositories.data_repo import DataRepository
+from app.utils.auth import Principal, api_key_scheme, get_current_principal, optional_oauth2_scheme
+from app.utils.streams import Subscription, stream_hub
+
+
+router = APIRouter(prefix="/stream", tags=["Stream"])
+
+
+def check_stream(
+        data_ids: set[int],
+        token: str | None,
+        api_key: str | None
+        ) -> Principal:
+    """
+    Authenticate a stream client and check that its data ids exist.
+
+    Streams stay open for long, so the session is closed here rather than held by a dependency.
+    """
+    if len(data_ids) > settings.STREAM_MAX_DATA_IDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {settings.STREAM_MAX_DATA_IDS} data ids")
+
+    with contextmanager(get_db)() as db:
+        principal = get_current_principal(token, api_key, db)
+        missing = DataService(DataRepository(db), DataPointRepository(db)).get_missing_data_ids(data_ids)
+
+    if missing:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Data not found: {', '.join(map(str, sorted(missing)))}")
+    return principal
+
+
+async def sse_events(data_ids: set[int]):
+    subscription = stream_hub.subscribe(data_ids, settings.STREAM_QUEUE_SIZE)
+    try:
+        while True:
+            events = await subscription.get(settings.STREAM_HEARTBEAT_SECONDS)
+            dropped = subscription.take_dropped()
+            if dropped:
+                yield f"event: dropped\ndata: {{\"count\": {dropped}}}\n\n"
+            if events:
+                yield "".join(f"event: data_point\ndata: {event}\n\n" for event in events)
+            elif not dropped:
+                yield ": keepalive\n\n"
+    finally:
+        stream_hub.unsubscribe(subscription)
+
+
+async def send_events(
+        websocket: WebSocket,
+        subscription: Subscription
+        ) -> None:
+    while True:
+        events = await subscription.get()
+        dropped = subscription.take_dropped()
+        if dropped:
+            await websocket.send_text(json.dumps({"type": "dropped", "count": dropped}))
+        if events:
+            await websocket.send_text(f"{{\"type\": \"data_points\", \"items\": [{', '.join(events)}]}}")
+
+
+def requested_data_ids(message: str) -> tuple[str, set[int]]:
+    """
+    Parse a {"subscribe": [data ids]} or {"unsubscribe": [data ids]} client message.
+    """
+    try:
+        body = json.loads(message)
+    except ValueError:
+        body = None
+    if isinstance(body, dict) and len(body) == 1:
+        (action, data_ids), = body.items()
+        if action in ("subscribe", "unsubscribe") and isinstance(data_ids, list) and all(type(id) is int for id in data_ids):
+            return action, set(data_ids)
+    raise ValueError('Expected {"subscribe": [data ids]} or {"unsubscribe": [data ids]}')
+
+
+@router.get("/", response_class=StreamingResponse, responses={200: {"content": {"text/event-stream": {}}}})
+async def stream_events_endpoint(
+    data_id: list[int] = Query(..., description="Datas to stream, repeatable"),
+    access_token: str | None = Query(None, description="Bearer token, for clients which cannot set headers such as EventSource"),
+    token: str | None = Depends(optional_oauth2_scheme),
+    api_key: str | None = Depends(api_key_scheme)
+    ):
+    """
+    Stream the new data points of datas as Server-Sent Events.
+
+    Each data point is sent as a `data_point` event once committed. A client reading too
+    slowly loses the oldest points, reported by a `dropped` event with their count.
+    """
+    await run_in_threadpool(check_stream, set(data_id), token or access_token, api_key)
+
+    return StreamingResponse(
+        sse_events(set(data_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+
+@router.websocket("/")
+async def stream_websocket_endpoint(
+    websocket: WebSocket,
+    data_id: list[int] = Query([], description="Datas to stream, repeatable"),
+    access_token: str | None = Query(None, description="Bearer token, for clients which cannot set headers such as browsers")
+    ):
+    """
+    Stream the new data points of datas over a WebSocket.
+
+    The server sends `{"type": "data_points", "items": [...]}` messages, and `{"type": "dropped", "count": n}`
+    when a client reading too slowly lost its oldest points. Clients change their datas by sending
+    `{"subscribe": [data ids]}` or `{"unsubscribe": [data ids]}`.
+    """
+    scheme, token = get_authorization_scheme_param(websocket.headers.get("Authorization"))
+    token = token if scheme.lower() == "bearer" else access_token
+    api_key = websocket.headers.get("X-API-Key")
+
+    try:
+        await run_in_threadpool(check_stream, set(data_id), token, api_key)
+    except HTTPException as e:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+
+    await websocket.accept()
+    subscription = stream_hub.subscribe(data_id, settings.STREAM_QUEUE_SIZE)
+    sender = asyncio.create_task(send_events(websocket, subscription))
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                action, data_ids = requested_data_ids(message)
+                if action == "subscribe":
+                    await run_in_threadpool(check_stream, subscription.data_ids | data_ids, token, api_key)
+                    data_ids = subscription.data_ids | data_ids
+                else:
+                    data_ids = subscription.data_ids - data_ids
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "detail": e.detail})
+                continue
+
+            stream_hub.update(subscription, data_ids)
+            await websocket.send_json({"type": "subscribed", "data_ids": sorted(data_ids)})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        stream_hub.unsubscribe(subscription)
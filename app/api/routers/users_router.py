@@ -1,17 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 
+from app.api.admission import admit_write
 from app.api.schemas.pagination_schema import PaginatedResponse
 from app.api.schemas import user_schema
 from app.core.services.exceptions import IntegrityConstraintViolationException
 from app.core.services.user_service import UserService, get_user_service
+from app.utils.conditional import conditional
 from app.utils.pagination import PaginationContext
 
 
-router = APIRouter(prefix="/users", tags=["Users"])
+router = APIRouter(prefix="/users", tags=["Users"], dependencies=[Depends(admit_write)])
 
 
 @router.post("/", response_model=user_schema.UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user_endpoint(
+async def create_user_endpoint(
     user_create: user_schema.UserCreate, 
     user_service: UserService = Depends(get_user_service)
     ):
@@ -19,14 +21,14 @@ def create_user_endpoint(
     Create a user.
     """
     try:
-        user = user_service.add_user(user_create)
+        user = await user_service.add_user(user_create)
     except IntegrityConstraintViolationException as e:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     
     return user
 
 
-@router.get("/", response_model=PaginatedResponse[user_schema.UserResponse])
+@router.get("/", response_model=PaginatedResponse[user_schema.UserResponse], dependencies=[Depends(conditional("user"))])
 def list_users_endpoint(
     search: str = Query(None, description="Search by name"),
     limit: int = Query(10, ge=1, le=100, description="Number of records to fetch"),
@@ -43,7 +45,7 @@ def list_users_endpoint(
     return paged_response
 
 
-@router.get("/{user_id}", response_model=user_schema.UserResponse)
+@router.get("/{user_id}", response_model=user_schema.UserResponse, dependencies=[Depends(conditional("user"))])
 def get_user_endpoint(
     user_id: int, 
     user_service: UserService = Depends(get_user_service)
@@ -1,10 +1,10 @@
 from datetime import datetime, timezone
 from typing import Any
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class DataPointBase(BaseModel):
-    created_at: datetime = datetime.now(timezone.utc)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     value: Any
 
 class DataPointCreate(DataPointBase):
@@ -15,4 +15,20 @@ class DataPointResponse(DataPointBase):
     data_id: int
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class DataPointBatchResponse(BaseModel):
+    data_id: int
+    count: int
+
+class DataPointBucket(BaseModel):
+    start: datetime
+    count: int
+    min: float | None = None
+    max: float | None = None
+    avg: float | None = None
+
+class DataPointAggregateResponse(BaseModel):
+    data_id: int
+    bucket_seconds: int
+    buckets: list[DataPointBucket]
@@ -1,7 +1,11 @@
 from datetime import datetime
-from typing import Optional, Any
+from typing import List, Optional, Any
 from pydantic import BaseModel
 
+from app.api.schemas.data_meta_schema import DataMetaResponse
+from app.api.schemas.data_point_schema import DataPointResponse
+from app.api.schemas.user_schema import UserResponse
+
 
 class DataBase(BaseModel):
     name: str
@@ -25,3 +29,9 @@ class DataResponse(DataBase):
 
     class Config:
         from_attributes = True
+
+
+class DataExpandedResponse(DataResponse):
+    metas: Optional[List[DataMetaResponse]] = None
+    created_by_user: Optional[UserResponse] = None
+    latest: Optional[DataPointResponse] = None
@@ -0,0 +1,26 @@
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict
+
+
+class DeviceBase(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    name: str
+
+
+class DeviceCreate(DeviceBase):
+    pass
+
+
+class DeviceResponse(DeviceBase):
+    id: int
+    key_id: str
+    created_by_user_id: int
+    created_at: datetime
+    revoked_at: datetime | None
+
+    class Config:
+        from_attributes = True
+
+
+class DeviceCreateResponse(DeviceResponse):
+    api_key: str # Only returned when the key is created
@@ -1,3 +1,6 @@
+from typing import Literal
+
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -6,24 +9,102 @@ class Settings(BaseSettings):
     API_DEBUG: bool = False
 
     # Database settings
-    POSTGRES_USER: str
-    POSTGRES_PASSWORD: str
+    DB_BACKEND: Literal["postgresql", "sqlite"] = "postgresql"
+    POSTGRES_USER: str | None = None # Required by the postgresql backend
+    POSTGRES_PASSWORD: str | None = None
     POSTGRES_HOST: str = "localhost"
     POSTGRES_PORT: int = 5432
-    POSTGRES_DB: str
+    POSTGRES_DB: str | None = None
+    SQLITE_PATH: str = "home_historian.db" # Database file of the sqlite backend
+    SQLITE_CACHE_SIZE_KB: int = 65536 # Page cache of each sqlite connection
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024 # Bytes of the sqlite file read through mmap, 0 disables
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000 # Wait for another writer before failing with "database is locked"
+    DB_CONNECTION_BUDGET: int = 20 # Connections shared by all workers; each pools an equal share
+    DB_POOL_TIMEOUT: float = 30.0 # Seconds to wait for a free pooled connection
+    SLOW_QUERY_MS: float = 200 # Statements slower than this are logged with their parameters, 0 disables
+    SLOW_QUERY_EXPLAIN: bool = False # Log the plan of slow SELECTs; on Postgres this runs them again with EXPLAIN ANALYZE
+    SLOW_QUERY_LOG_PARAMETERS: bool = False # Log the parameters of slow statements, which may include password hashes and key digests
+    REQUEST_STATEMENT_WARN: int = 25 # Warn when a request executes more statements, 0 disables
+    REQUEST_REPEAT_WARN: int = 5 # Warn when a request executes one statement more times (N+1 queries), 0 disables
+    CHANGE_BUS_ENABLED: bool = True # Share committed changes between workers with LISTEN/NOTIFY; postgresql backend only
+    CHANGE_BUS_FLUSH_MS: float = 50 # Changes are merged over this window before being sent, so bursts send one event per key
 
     # Authentication settings
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    TOKEN_CACHE_SIZE: int = 10000 # Verified tokens kept in memory, 0 disables the cache
+    DEVICE_KEY_SECRET: str | None = None # Key for device API key digests, defaults to SECRET_KEY
+    BCRYPT_ROUNDS: int = 12 # Stored hashes with other rounds are rehashed on login
+    PASSWORD_HASH_WORKERS: int = 2 # Threads for bcrypt, bounding its CPU use under login storms
+
+    # Ingest settings
+    INGEST_MAX_BODY_BYTES: int = 32 * 1024 * 1024 # Limit on decompressed request bodies
+    INGEST_BATCH_SIZE: int = 1000
+
+    # Rate limit settings
+    RATE_LIMIT_ENABLED: bool = True # Admission control of write requests, per worker
+    RATE_LIMITS: dict[str, tuple[float, float]] = { # Requests per second and burst of each client, by endpoint name without _endpoint
+        "default": (20, 40),
+        "add_data_point": (10, 30),
+        "add_data_points": (1, 5),
+    }
+    WRITE_CONCURRENCY: int = 0 # Writes in progress per worker, more are rejected; 0 for half the connection pool
+
+    # Single flight settings
+    SINGLE_FLIGHT_ENABLED: bool = True # Run concurrent identical GET requests of the routes below once, sharing the response
+    SINGLE_FLIGHT_ROUTES: list[str] = ["list_datas", "list_data_points", "get_latest_data_point", "aggregate_data_points"] # Endpoint names without _endpoint
+
+    # Stream settings
+    STREAM_QUEUE_SIZE: int = 1000 # Data points buffered per stream client; the oldest are dropped when it reads too slowly
+    STREAM_MAX_DATA_IDS: int = 100 # Datas one stream client may subscribe to
+    STREAM_HEARTBEAT_SECONDS: float = 15.0 # Keepalive interval of idle streams, under proxies' idle timeouts
+
+    # MQTT settings
+    MQTT_ENABLED: bool = False # Ingest the messages of data topics; requires the paho-mqtt package
+    MQTT_HOST: str = "localhost"
+    MQTT_PORT: int = 1883
+    MQTT_USERNAME: str | None = None
+    MQTT_PASSWORD: str | None = None
+    MQTT_CLIENT_ID: str = "home-historian" # Suffixed by the process id; also the shared subscription group of the workers
+    MQTT_QOS: int = 1
+    MQTT_TOPIC_META: str = "mqtt_topic" # Meta whose data meta values are the topics of datas, with + and # wildcards
+    MQTT_RELOAD_SECONDS: float = 30.0 # Interval between reloads of the data topics
+    MQTT_MAX_IN_FLIGHT: int = 10000 # Messages received but not yet written; more are dropped
+    MQTT_BATCH_SIZE: int = 1000 # Data points written together at most
+    MQTT_BATCH_MS: float = 200 # Wait for more messages before writing a batch
+
+    # Profiling settings
+    PROFILING_ENABLED: bool = False # Off, the profiling middleware and endpoints are not installed at all
+    PROFILING_TOKEN: str | None = None # Requests with this value in the X-Profile header are profiled
+    PROFILING_SAMPLE_RATE: float = 0.0 # Fraction of other requests to profile
+    PROFILING_DIR: str = "profiles"
+    PROFILING_KEEP: int = 100 # Saved profiles kept, oldest deleted first
 
     # Uvicorn settings
     UVICORN_HOST: str = "0.0.0.0"
     UVICORN_PORT: int = 8000
     UVICORN_RELOAD: bool = False
+    UVICORN_WORKERS: int = 1 # Worker processes; ignored when reloading
+    WORKER_MAX_REQUESTS: int = 0 # Requests before a worker is gracefully replaced, 0 to never replace
+    WORKER_MAX_REQUESTS_JITTER: int = 0 # Random extra requests, so workers are not replaced all at once
+    WORKER_GRACEFUL_TIMEOUT: int = 30 # Seconds a stopping worker may spend finishing requests
 
     # Load environment variables from .env
     class Config:
         env_file = ".env"
 
+    @model_validator(mode="after")
+    def check_backend(self):
+        if self.DB_BACKEND == "postgresql" and not (self.POSTGRES_USER and self.POSTGRES_PASSWORD and self.POSTGRES_DB):
+            raise ValueError("POSTGRES_USER, POSTGRES_PASSWORD and POSTGRES_DB are required by the postgresql backend")
+        return self
+
+    @model_validator(mode="after")
+    def check_rate_limits(self):
+        for name, (rate, burst) in self.RATE_LIMITS.items():
+            if rate <= 0 or burst < 1:
+                raise ValueError(f"RATE_LIMITS of {name} need a rate above 0 and a burst of at least 1")
+        return self
+
 settings = Settings()
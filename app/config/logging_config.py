@@ -1,12 +1,185 @@
-import yaml
+import atexit
+import copy
+import datetime
+import json
 import logging.config
 import logging
+import logging.handlers
+import queue
+import random
+import re
+import threading
 
 
-def init_logger() -> dict:
-    with open("logging_config.yml", "r") as f:
-        config = yaml.safe_load(f.read())
-    logging.config.dictConfig(config)
+# Standard attributes of log records; others were passed in `extra`
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+DEFAULT_QUEUE_SIZE = 10000
+
+# Query parameters carrying credentials, e.g. the bearer token of stream clients which cannot set headers
+SECRET_QUERY_PARAMETERS = re.compile(r"(?<=[?&])(access_token)=[^&]*")
+
+_configured = False
+_listener: logging.handlers.QueueListener | None = None
+_queued_loggers: list[logging.Logger] = []
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line, with any `extra` attributes as fields.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES and not name.startswith("_"):
+                entry[name] = value
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class AccessSampleFilter(logging.Filter):
+    """
+    Keep a fraction of uvicorn access records. Warnings and responses with status 400 or more are always kept.
+    """
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        # uvicorn.access records have the args (client, method, path, http version, status)
+        args = record.args
+        if isinstance(args, tuple) and len(args) == 5 and isinstance(args[4], int) and args[4] >= 400:
+            return True
+        return random.random() < self.rate
+
+
+class AccessRedactFilter(logging.Filter):
+    """
+    Replace the values of credential query parameters in uvicorn access records.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # uvicorn.access records have the args (client, method, path, http version, status)
+        args = record.args
+        if isinstance(args, tuple) and len(args) == 5 and isinstance(args[2], str) and "?" in args[2]:
+            record.args = (args[0], args[1], SECRET_QUERY_PARAMETERS.sub(r"\1=REDACTED", args[2]), args[3], args[4])
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue records for the handlers a logger had, without ever blocking; records are dropped while the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue, targets: list[logging.Handler]):
+        super().__init__(log_queue)
+        self.targets = targets
+        self.dropped = 0
+        # Records none of the targets would handle are not queued at all
+        self.setLevel(min(target.level for target in targets))
+
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now, as they may change once the caller moves on
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.hh_targets = self.targets
+        return record
+
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Dispatcher:
+    """
+    Hand queued records to the handlers of the logger they were logged to.
+    """
+
+    def handle(self, record: logging.LogRecord) -> None:
+        for target in record.__dict__.pop("hh_targets"):
+            if record.levelno >= target.level:
+                target.handle(record)
+
+
+def _queue_handlers(log_queue: queue.Queue) -> list[logging.Logger]:
+    """
+    Move the handlers of every configured logger behind a handler feeding the queue.
+    """
+    loggers = [logging.getLogger()] + [logger for logger in logging.Logger.manager.loggerDict.values() if isinstance(logger, logging.Logger)]
+    queued = []
+    for logger in loggers:
+        if logger.handlers:
+            logger.handlers = [_QueueHandler(log_queue, list(logger.handlers))]
+            queued.append(logger)
+    return queued
+
+
+def init_logger() -> None:
+    """
+    Configure logging from logging_config.yml, once per process.
+
+    Handlers do not run in the caller's thread: records are queued and handled by a
+    background thread, so slow disks never hold up requests. Set `queue: {enabled: false}`
+    in the configuration to write synchronously instead.
+    """
+    global _configured, _listener, _queued_loggers
+    import yaml
+
+    with _lock:
+        if _configured:
+            return
+
+        with open("logging_config.yml", "r") as f:
+            config = yaml.safe_load(f.read())
+        queue_config = config.pop("queue", None) or {}
+        logging.config.dictConfig(config)
+        # Whatever the configuration, tokens never reach the access log
+        logging.getLogger("uvicorn.access").addFilter(AccessRedactFilter())
+        _configured = True
+
+        if queue_config.get("enabled", True):
+            log_queue = queue.Queue(queue_config.get("size", DEFAULT_QUEUE_SIZE))
+            _queued_loggers = _queue_handlers(log_queue)
+            _listener = logging.handlers.QueueListener(log_queue, _Dispatcher())
+            _listener.start()
+            atexit.register(stop_logger)
+
+
+def stop_logger() -> None:
+    """
+    Handle the queued records and stop the logging thread. Later records are handled synchronously.
+    """
+    global _listener, _queued_loggers
+    with _lock:
+        if _listener is None:
+            return
+        for logger in _queued_loggers:
+            logger.handlers = logger.handlers[0].targets
+        _listener.stop()
+        _listener = None
+        _queued_loggers = []
 
 
 def get_module_logger():
@@ -55,7 +55,7 @@ class DataMetaService:
             data_meta_update: data_meta_schema.DataMetaUpdate
             ) -> data_meta_schema.DataMetaResponse | None:
         """
-        Update a data meta by id.
+        Set the value of a meta for a data, creating the data meta if needed.
         """
         return self.data_meta_repo.update_data_meta_by_id(data_meta_update.data_id, data_meta_update)
 
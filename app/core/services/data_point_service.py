@@ -1,9 +1,12 @@
+from datetime import datetime
+
 from fastapi import Depends
+from pydantic import ValidationError
 
 from app.api.schemas.pagination_schema import PaginatedResponse
-from app.api.schemas import data_point_schema
+from app.api.schemas import data_point_schema, data_schema
 from app.core.domains import data_domain, data_point_domain
-from app.core.services.exceptions import NotFoundException
+from app.core.services.exceptions import NotFoundException, ValidationException
 from app.persistence.repositories.data_point_repo import DataPointRepository, get_data_point_repo
 from app.persistence.repositories.data_repo import DataRepository, get_data_repo
 from app.utils.pagination import PaginationContext
@@ -44,6 +47,47 @@ class DataPointService:
         return created_data_point
 
 
+    def add_data_points(
+            self, 
+            data_id: int, 
+            items: list, 
+            start: int = 0
+            ) -> int:
+        """
+        Validate and add a batch of data points for a data, without committing.
+
+        Errors name the failing item by its position in the request, counting from start.
+        """
+        data = self.data_repo.get_data_by_id(data_id)
+        if not data:
+            raise NotFoundException("Data not found")
+
+        data_type = data_domain.DataType(data.data_type)
+
+        data_points = []
+        for index, item in enumerate(items, start):
+            try:
+                data_point = data_point_schema.DataPointBase.model_validate(item)
+                data_point_domain.validate_data_point(data_point, data_type)
+            except ValidationError as e:
+                raise ValidationException(f"Item {index}: {e.errors()[0]['msg']}")
+            except ValidationException as e:
+                raise ValidationException(f"Item {index}: {e.message}")
+            data_points.append(data_point)
+
+        return self.data_point_repo.add_data_points(data_id, data_points)
+
+
+    def commit_data_points(
+            self, 
+            data_id: int
+            ) -> None:
+        """
+        Commit the data points added for a data.
+        """
+        self.data_point_repo.commit_data_points(data_id)
+
+
     def get_data_points(
             self, 
             context: PaginationContext, 
@@ -55,6 +99,43 @@ class DataPointService:
         return self.data_point_repo.get_data_points(context, data_id)
 
 
+    def get_data_point_rows(
+            self, 
+            context: PaginationContext, 
+            data_id: int
+            ) -> dict:
+        """
+        Get a page of data points for a data as plain dictionaries.
+        """
+        return self.data_point_repo.get_data_point_rows(context, data_id)
+
+
+    def get_latest_data_point(
+            self, 
+            data_id: int
+            ) -> data_point_schema.DataPointResponse | None:
+        """
+        Get the latest data point for a data.
+        """
+        return self.data_point_repo.get_latest_data_points([data_id]).get(data_id)
+
+
+    def get_data_point_aggregates(
+            self, 
+            data: data_schema.DataResponse, 
+            bucket_seconds: int, 
+            start: datetime | None = None, 
+            end: datetime | None = None, 
+            limit: int = 1000
+            ) -> dict:
+        """
+        Aggregate the data points of a data per time bucket as plain dictionaries. Only numeric data get min, max and average.
+        """
+        numeric = data_domain.DataType(data.data_type) in (data_domain.DataType.FLOAT, data_domain.DataType.INTEGER)
+        buckets = self.data_point_repo.get_data_point_buckets(data.id, bucket_seconds, start, end, limit, numeric)
+        return {"data_id": data.id, "bucket_seconds": bucket_seconds, "buckets": buckets}
+
+
     def get_data_point_by_id(
             self, 
             data_point_id: int
@@ -1,11 +1,36 @@
 from fastapi import Depends
 
-from app.api.schemas.pagination_schema import PaginatedResponse
 from app.api.schemas import data_schema
+from app.core.services.exceptions import ValidationException
+from app.persistence import models
+from app.persistence.repositories.data_point_repo import DataPointRepository, get_data_point_repo
 from app.persistence.repositories.data_repo import DataRepository, get_data_repo
 from app.utils.pagination import PaginationContext
 
 
+DATA_INCLUDES = ("metas", "created_by_user", "latest")
+
+serialize_data = models.compile_serializer(models.Data)
+serialize_data_meta = models.compile_serializer(models.DataMeta)
+serialize_data_point = models.compile_serializer(models.DataPoint)
+serialize_user = models.compile_serializer(models.User, exclude=("password",))
+
+
+def parse_include(include: str | None) -> set[str]:
+    """
+    Parse a comma separated list of relations to include with datas.
+    """
+    if not include:
+        return set()
+
+    names = {name.strip() for name in include.split(",") if name.strip()}
+    unknown = names.difference(DATA_INCLUDES)
+    if unknown:
+        raise ValidationException(f"Cannot include {', '.join(sorted(unknown))}. Valid values are: {', '.join(DATA_INCLUDES)}")
+
+    return names
+
+
 class DataService:
     """
     Data service.
@@ -13,9 +38,11 @@ class DataService:
 
     def __init__(
             self,
-            data_repo: DataRepository = Depends(get_data_repo)
+            data_repo: DataRepository = Depends(get_data_repo),
+            data_point_repo: DataPointRepository = Depends(get_data_point_repo)
             ):
         self.data_repo = data_repo
+        self.data_point_repo = data_point_repo
 
 
     def add_data(
@@ -31,12 +58,21 @@ class DataService:
 
     def get_datas(
             self, 
-            context: PaginationContext
-            ) -> PaginatedResponse[data_schema.DataResponse]:
+            context: PaginationContext,
+            meta_filters: dict[str, str] | None = None,
+            include: set[str] = frozenset()
+            ) -> dict:
         """
-        Get all datas.
+        Get all datas, with the included relations, as plain dictionaries.
         """
-        return self.data_repo.get_datas(context)
+        paged_response = self.data_repo.get_datas(context, meta_filters, include)
+
+        return {
+            "total": paged_response.total,
+            "limit": paged_response.limit,
+            "offset": paged_response.offset,
+            "items": self._expand_datas(paged_response.items, include),
+            }
 
 
     def get_data_by_id(
@@ -49,6 +85,31 @@ class DataService:
         return self.data_repo.get_data_by_id(data_id)
 
 
+    def get_missing_data_ids(
+            self, 
+            data_ids: set[int]
+            ) -> set[int]:
+        """
+        Get which of the data ids do not exist.
+        """
+        return set(data_ids) - self.data_repo.get_existing_data_ids(data_ids)
+
+
+    def get_expanded_data_by_id(
+            self, 
+            data_id: int,
+            include: set[str] = frozenset()
+            ) -> dict | None:
+        """
+        Get a data by id, with the included relations.
+        """
+        data = self.data_repo.get_data_by_id(data_id, include)
+        if not data:
+            return None
+
+        return self._expand_datas([data], include)[0]
+
+
     def update_data_by_id(
             self, 
             data_id: int, 
@@ -68,7 +129,37 @@ class DataService:
         Delete a data by id.
         """
         return self.data_repo.delete_data_by_id(data_id)
+
+
+    def _expand_datas(
+            self, 
+            datas: list[models.Data], 
+            include: set[str]
+            ) -> list[dict]:
+        """
+        Serialize datas along with their included relations.
+        """
+        latest_data_points = {}
+        if "latest" in include:
+            latest_data_points = self.data_point_repo.get_latest_data_points([data.id for data in datas])
+
+        items = []
+        for data in datas:
+            item = serialize_data(data)
+            if "metas" in include:
+                item["metas"] = [serialize_data_meta(data_meta) for data_meta in data.data_metas]
+            if "created_by_user" in include:
+                item["created_by_user"] = serialize_user(data.created_by_user) if data.created_by_user else None
+            if "latest" in include:
+                latest_data_point = latest_data_points.get(data.id)
+                item["latest"] = serialize_data_point(latest_data_point) if latest_data_point else None
+            items.append(item)
+
+        return items
     
 
-def get_data_service(data_repo: DataRepository = Depends(get_data_repo)) -> DataService:
-    return DataService(data_repo)
+def get_data_service(
+        data_repo: DataRepository = Depends(get_data_repo),
+        data_point_repo: DataPointRepository = Depends(get_data_point_repo)
+        ) -> DataService:
+    return DataService(data_repo, data_point_repo)
@@ -0,0 +1,62 @@
+from fastapi import Depends
+
+from app.api.schemas import device_schema
+from app.api.schemas.pagination_schema import PaginatedResponse
+from app.persistence.repositories.device_key_repo import DeviceKeyRepository, get_device_key_repo
+from app.utils.api_keys import digest_secret, generate_api_key
+from app.utils.auth import device_key_pepper
+from app.utils.pagination import PaginationContext
+
+
+class DeviceService:
+    """
+    Device service.
+    """
+
+    def __init__(
+            self, 
+            device_key_repo: DeviceKeyRepository = Depends(get_device_key_repo)
+            ):
+        self.device_key_repo = device_key_repo
+
+
+    def add_device(
+            self, 
+            device_create: device_schema.DeviceCreate, 
+            user_id: int
+            ) -> device_schema.DeviceCreateResponse:
+        """
+        Add a device, returning its API key. Only a digest of the key is stored.
+        """
+        key_id, secret, api_key = generate_api_key()
+        digest = digest_secret(secret, device_key_pepper())
+
+        db_device_key = self.device_key_repo.add_device_key(device_create, key_id, digest, user_id)
+
+        return device_schema.DeviceCreateResponse(**db_device_key.to_dict(), api_key=api_key)
+
+
+    def get_devices(
+            self, 
+            context: PaginationContext, 
+            user_id: int
+            ) -> PaginatedResponse[device_schema.DeviceResponse]:
+        """
+        Get the devices created by a user.
+        """
+        return self.device_key_repo.get_device_keys(context, user_id)
+
+
+    def revoke_device(
+            self, 
+            device_id: int, 
+            user_id: int
+            ) -> bool:
+        """
+        Revoke the API key of a device created by a user.
+        """
+        return self.device_key_repo.revoke_device_key(device_id, user_id)
+
+
+def get_device_service(device_key_repo: DeviceKeyRepository = Depends(get_device_key_repo)) -> DeviceService:
+    return DeviceService(device_key_repo)
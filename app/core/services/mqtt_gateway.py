@@ -0,0 +1,419 @@
+import json
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from pydantic import ValidationError
+
+from app.api.schemas import data_point_schema
+from app.core.domains import data_domain, data_point_domain
+from app.core.services.exceptions import ValidationException
+from app.utils.metrics import record_mqtt
+
+
+# MQTT ingestion. Datas are mapped to topics by a data meta, by default "mqtt_topic",
+# whose value is a topic or a topic filter with + and # wildcards. Messages are
+# validated with the data type of their data in the MQTT client's thread, queued
+# in a bounded queue, and written in batches by a writer thread through the
+# repository's batch insert path. When the writer falls behind the queue fills
+# up, and further messages are dropped at once rather than stalling the client,
+# which must keep answering the broker.
+#
+# paho-mqtt is optional and only imported when the gateway is started; the
+# gateway takes any client with paho's interface, so tests can use a stand-in.
+
+logger = logging.getLogger(__name__)
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """
+    Whether a topic matches a topic filter with MQTT + and # wildcards.
+    """
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for index, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if index >= len(topic_levels):
+            return False
+        if level != "+" and level != topic_levels[index]:
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+@dataclass(frozen=True)
+class TopicRoute:
+    topic_filter: str
+    data_id: int
+    data_type: data_domain.DataType
+
+
+class TopicMap:
+    """
+    The datas of topics: exact topics are looked up first, then filters with wildcards in order.
+    """
+
+    def __init__(self, routes: list[TopicRoute]):
+        self.routes = routes
+        self._exact = {}
+        self._wildcards = []
+        for route in routes:
+            if "+" in route.topic_filter or "#" in route.topic_filter:
+                self._wildcards.append(route)
+            else:
+                self._exact.setdefault(route.topic_filter, route)
+
+
+    @property
+    def topic_filters(self) -> set[str]:
+        return {route.topic_filter for route in self.routes}
+
+
+    def route(self, topic: str) -> TopicRoute | None:
+        route = self._exact.get(topic)
+        if route is not None:
+            return route
+        for route in self._wildcards:
+            if topic_matches(route.topic_filter, topic):
+                return route
+        return None
+
+
+def topic_routes(rows) -> list[TopicRoute]:
+    """
+    Build the routes from (data_id, data_type, topic) rows, skipping invalid topic filters.
+    """
+    routes = []
+    for data_id, data_type, topic_filter in rows:
+        if not isinstance(topic_filter, str) or not valid_topic_filter(topic_filter):
+            logger.warning(f"Ignoring invalid MQTT topic {topic_filter!r} of data {data_id}")
+            continue
+        routes.append(TopicRoute(topic_filter, data_id, data_domain.DataType(data_type)))
+    return routes
+
+
+def valid_topic_filter(topic_filter: str) -> bool:
+    levels = topic_filter.split("/")
+    return bool(topic_filter) and all(
+        level in ("+", "#") or ("+" not in level and "#" not in level)
+        for level in levels
+        ) and "#" not in levels[:-1]
+
+
+def parse_payload(
+        payload: bytes,
+        data_type: data_domain.DataType
+        ) -> data_point_schema.DataPointBase:
+    """
+    Parse and validate the data point of a message.
+
+    The payload is either a JSON object with a value and an optional created_at,
+    or a bare value: JSON, or plain text for strings. Without created_at the data
+    point is timed on receipt. Numeric values sent as text are stored as numbers,
+    and values of string datas as text.
+    """
+    try:
+        text = payload.decode("utf-8").strip()
+    except UnicodeDecodeError:
+        raise ValidationException("Payload is not UTF-8")
+    try:
+        body: Any = json.loads(text)
+    except ValueError:
+        body = text
+    # A bare value of a string data is its text, even when it reads as a JSON number or boolean
+    if data_type == data_domain.DataType.STRING and not isinstance(body, (dict, str)):
+        body = text
+
+    try:
+        if isinstance(body, dict):
+            data_point = data_point_schema.DataPointBase.model_validate(body)
+        else:
+            data_point = data_point_schema.DataPointBase(value=body)
+    except ValidationError as e:
+        raise ValidationException(e.errors()[0]["msg"])
+
+    data_point_domain.validate_data_point(data_point, data_type)
+    if data_type == data_domain.DataType.FLOAT:
+        data_point.value = float(data_point.value)
+    elif data_type == data_domain.DataType.INTEGER:
+        data_point.value = int(data_point.value)
+    elif data_type == data_domain.DataType.STRING and not isinstance(data_point.value, str):
+        data_point.value = json.dumps(data_point.value)
+    return data_point
+
+
+class BatchWriter:
+    """
+    Write data points in batches from a bounded queue, in a background thread.
+    """
+
+    def __init__(
+            self,
+            write: Callable[[int, list[data_point_schema.DataPointBase]], None],
+            max_in_flight: int = 10000,
+            batch_size: int = 1000,
+            linger_seconds: float = 0.2
+            ):
+        self.write = write
+        self.batch_size = batch_size
+        self.linger_seconds = linger_seconds
+        self.written = 0
+        self.dropped = 0 # Not queued, as the queue was full
+        self.failed = 0 # Queued, but their write failed
+        self._queue: queue.Queue = queue.Queue(max_in_flight)
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+
+    def submit(
+            self,
+            data_id: int,
+            data_point: data_point_schema.DataPointBase
+            ) -> bool:
+        """
+        Queue a data point without waiting. Returns False when it was dropped, as the queue is full.
+        """
+        try:
+            self._queue.put_nowait((data_id, data_point))
+            return True
+        except queue.Full:
+            # With QoS 1 the broker already has its acknowledgement, so this is the only trace of the loss
+            self.dropped += 1
+            record_mqtt("dropped")
+            return False
+
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="hh-mqtt-writer", daemon=True)
+        self._thread.start()
+
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Write the queued data points and stop the thread.
+        """
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+    def _run(self) -> None:
+        while True:
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+
+            # Wait a little for more, so that each write carries many data points
+            deadline = time.monotonic() + self.linger_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self.write_batch(batch)
+
+
+    def write_batch(self, batch: list[tuple[int, data_point_schema.DataPointBase]]) -> None:
+        """
+        Write a batch, one write per data.
+        """
+        by_data: dict[int, list[data_point_schema.DataPointBase]] = {}
+        for data_id, data_point in batch:
+            by_data.setdefault(data_id, []).append(data_point)
+
+        for data_id, data_points in by_data.items():
+            try:
+                self.write(data_id, data_points)
+                self.written += len(data_points)
+                record_mqtt("written", len(data_points))
+            except Exception:
+                self.failed += len(data_points)
+                record_mqtt("failed", len(data_points))
+                logger.exception(f"Cannot write {len(data_points)} MQTT data points of data {data_id}")
+
+
+class MqttGateway:
+    """
+    Subscribe to the topics of datas and feed their messages to a batch writer.
+    """
+
+    def __init__(
+            self,
+            client,
+            writer: BatchWriter,
+            load_routes: Callable[[], list[TopicRoute]],
+            host: str = "localhost",
+            port: int = 1883,
+            qos: int = 1,
+            shared_group: str | None = None,
+            reload_seconds: float = 30.0,
+            keepalive: int = 60
+            ):
+        self.client = client
+        self.writer = writer
+        self.load_routes = load_routes
+        self.host = host
+        self.port = port
+        self.qos = qos
+        self.shared_group = shared_group
+        self.reload_seconds = reload_seconds
+        self.keepalive = keepalive
+        self.topic_map = TopicMap([])
+        self.received = 0
+        self.unrouted = 0 # Messages on topics of no data
+        self.invalid = 0 # Messages rejected by validation
+        self._subscribed: set[str] = set()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._reloader: threading.Thread | None = None
+
+        client.on_connect = self.on_connect
+        client.on_message = self.on_message
+
+
+    def start(self) -> None:
+        self.writer.start()
+        self.reload()
+        self.client.connect_async(self.host, self.port, self.keepalive)
+        self.client.loop_start()
+        self._stopping.clear()
+        self._reloader = threading.Thread(target=self._run_reloader, name="hh-mqtt-reload", daemon=True)
+        self._reloader.start()
+
+
+    def stop(self) -> None:
+        """
+        Disconnect, then write the queued data points.
+        """
+        self._stopping.set()
+        self.client.disconnect()
+        self.client.loop_stop()
+        if self._reloader is not None:
+            self._reloader.join()
+            self._reloader = None
+        self.writer.stop()
+
+
+    def reload(self) -> None:
+        """
+        Load the topics of the datas, and follow their changes while connected.
+        """
+        topic_map = TopicMap(self.load_routes())
+        with self._lock:
+            self.topic_map = topic_map
+            if self.client.is_connected():
+                self._subscribe(topic_map.topic_filters)
+
+
+    def on_connect(self, client, userdata, flags, reason_code, properties=None) -> None:
+        if getattr(reason_code, "is_failure", False):
+            logger.warning(f"MQTT connection to {self.host}:{self.port} refused: {reason_code}")
+            return
+        logger.info(f"Connected to MQTT broker {self.host}:{self.port}")
+        # Subscriptions do not survive a new session, so subscribe to every topic again
+        with self._lock:
+            self._subscribed = set()
+            self._subscribe(self.topic_map.topic_filters)
+
+
+    def on_message(self, client, userdata, message) -> None:
+        self.received += 1
+        route = self.topic_map.route(message.topic)
+        if route is None:
+            self.unrouted += 1
+            record_mqtt("unrouted")
+            return
+        try:
+            data_point = parse_payload(message.payload, route.data_type)
+        except ValidationException as e:
+            self.invalid += 1
+            record_mqtt("invalid")
+            logger.debug(f"Invalid MQTT message on {message.topic}: {e.message}")
+            return
+        self.writer.submit(route.data_id, data_point)
+
+
+    def _subscribe(self, topic_filters: set[str]) -> None:
+        added = topic_filters - self._subscribed
+        removed = self._subscribed - topic_filters
+        if removed:
+            self.client.unsubscribe([self._subscription(topic_filter) for topic_filter in sorted(removed)])
+        if added:
+            self.client.subscribe([(self._subscription(topic_filter), self.qos) for topic_filter in sorted(added)])
+        self._subscribed = set(topic_filters)
+
+
+    def _subscription(self, topic_filter: str) -> str:
+        # With a shared subscription the broker hands each message to one worker of the group
+        return f"$share/{self.shared_group}/{topic_filter}" if self.shared_group else topic_filter
+
+
+    def _run_reloader(self) -> None:
+        while not self._stopping.wait(self.reload_seconds):
+            try:
+                self.reload()
+            except Exception:
+                logger.exception("Cannot reload the MQTT topics")
+
+
+def create_mqtt_gateway() -> MqttGateway:
+    """
+    Create the gateway of the app settings, with a paho-mqtt client.
+    """
+    import os
+    from contextlib import contextmanager
+
+    from app.config.app_config import settings
+    from app.persistence.database import get_db
+    from app.persistence.repositories.data_meta_repo import DataMetaRepository
+    from app.persistence.repositories.data_point_repo import DataPointRepository
+    from app.utils.metrics import record_ingest
+
+    try:
+        import paho.mqtt.client as mqtt
+    except ImportError:
+        raise RuntimeError("MQTT_ENABLED requires the paho-mqtt package")
+
+    def load_routes() -> list[TopicRoute]:
+        with contextmanager(get_db)() as db:
+            return topic_routes(DataMetaRepository(db).get_data_meta_values_by_meta_name(settings.MQTT_TOPIC_META))
+
+    def write(data_id: int, data_points: list[data_point_schema.DataPointBase]) -> None:
+        with contextmanager(get_db)() as db:
+            repository = DataPointRepository(db)
+            repository.add_data_points(data_id, data_points)
+            repository.commit_data_points(data_id)
+        record_ingest(len(data_points))
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=f"{settings.MQTT_CLIENT_ID}-{os.getpid()}")
+    if settings.MQTT_USERNAME:
+        client.username_pw_set(settings.MQTT_USERNAME, settings.MQTT_PASSWORD)
+    client.reconnect_delay_set(1, 60)
+
+    writer = BatchWriter(
+        write,
+        max_in_flight=settings.MQTT_MAX_IN_FLIGHT,
+        batch_size=settings.MQTT_BATCH_SIZE,
+        linger_seconds=settings.MQTT_BATCH_MS / 1000,
+        )
+    return MqttGateway(
+        client,
+        writer,
+        load_routes,
+        host=settings.MQTT_HOST,
+        port=settings.MQTT_PORT,
+        qos=settings.MQTT_QOS,
+        # Workers share the subscriptions, so each message is stored once
+        shared_group=settings.MQTT_CLIENT_ID if settings.UVICORN_WORKERS > 1 else None,
+        reload_seconds=settings.MQTT_RELOAD_SECONDS,
+        )
@@ -1,10 +1,11 @@
 from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
 from pydantic import EmailStr
 
 from app.api.schemas.pagination_schema import PaginatedResponse
 from app.api.schemas import user_schema
 from app.persistence.repositories.user_repo import UserRepository, get_user_repo
-from app.utils.auth import hash_password
+from app.utils.auth import hash_password_async, verify_and_update_password_async
 from app.utils.pagination import PaginationContext
 
 
@@ -20,21 +21,47 @@ class UserService:
         self.user_repo = user_repo
 
 
-    def add_user(
+    async def add_user(
             self, 
             user_create: user_schema.UserCreate
             ) -> user_schema.UserResponse:
         """
         Add a user.
         """
-        hashed_password = hash_password(user_create.password)
+        hashed_password = await hash_password_async(user_create.password)
         user_create.password = hashed_password
 
-        created_user = self.user_repo.add_user(user_create)
+        created_user = await run_in_threadpool(self.user_repo.add_user, user_create)
 
         return created_user
 
 
+    async def authenticate(
+            self, 
+            email: EmailStr, 
+            password: str
+            ) -> user_schema.UserResponse | None:
+        """
+        Get the user with an email and password, or None if they do not match.
+
+        A stored hash made with outdated parameters is replaced on a successful login.
+        """
+        user = await run_in_threadpool(self.user_repo.get_user_by_email, email)
+        if not user:
+            return None
+
+        verified, new_hash = await verify_and_update_password_async(password, user.password)
+        if not verified:
+            return None
+
+        # Read before the rehash commits and expires the user, which would reload it on the event loop
+        user_response = user_schema.UserResponse.model_validate(user)
+        if new_hash:
+            await run_in_threadpool(self.user_repo.update_password, user_response.id, new_hash)
+
+        return user_response
+
+
     def get_users(
             self, 
             context: PaginationContext
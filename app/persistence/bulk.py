@@ -0,0 +1,92 @@
+import datetime
+import json
+from typing import Any, Iterable
+
+from sqlalchemy import Connection, Table, exc, insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.persistence import models
+
+
+# Dialect specific fast paths for bulk writes. They bypass the ORM and the
+# session's flush, so callers bump the change versions themselves.
+
+# How SQLAlchemy stores DateTime columns on SQLite; rows written here must sort and compare the same
+SQLITE_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def naive_utc(value: datetime.datetime) -> datetime.datetime:
+    """
+    Convert an aware datetime to naive UTC, as datetimes are stored.
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def insert_data_points(
+        connection: Connection,
+        rows: Iterable[tuple[int, datetime.datetime, Any]]
+        ) -> list[int]:
+    """
+    Insert (data_id, created_at, value) data points in the connection's transaction. Returns their ids, in order.
+
+    Postgres loads them with COPY, SQLite with a single prepared statement executed for
+    every row; both skip SQLAlchemy's per row type processing. Aware datetimes are stored
+    as naive UTC, like the utcnow column defaults.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    dialect = connection.dialect.name
+
+    if dialect == "postgresql":
+        # COPY cannot return the ids, and concurrent inserts may interleave their sequence
+        # values, so the ids are drawn from the sequence first and copied with the rows
+        ids = list(connection.exec_driver_sql(
+            "SELECT nextval(pg_get_serial_sequence('hh.data_point', 'id')) FROM generate_series(1, %s)", (len(rows),)
+            ).scalars())
+        statement = "COPY hh.data_point (id, data_id, created_at, value) FROM STDIN"
+        dbapi_error = connection.dialect.loaded_dbapi.Error
+        cursor = connection.connection.dbapi_connection.cursor()
+        try:
+            with cursor.copy(statement) as copy:
+                for id, (data_id, created_at, value) in zip(ids, rows):
+                    copy.write_row((id, data_id, naive_utc(created_at), json.dumps(value)))
+        except dbapi_error as e:
+            # Raise what SQLAlchemy would, e.g. IntegrityError for a foreign key violation
+            raise exc.DBAPIError.instance(statement, None, e, dbapi_error) from e
+        finally:
+            cursor.close()
+        return ids
+    elif dialect == "sqlite":
+        parameters = [
+            (data_id, naive_utc(created_at).strftime(SQLITE_DATETIME_FORMAT), json.dumps(value))
+            for data_id, created_at, value in rows
+        ]
+        connection.exec_driver_sql("INSERT INTO hh.data_point (data_id, created_at, value) VALUES (?, ?, ?)", parameters)
+        # The transaction holds the write lock, so the rows took consecutive ids
+        last_id = connection.exec_driver_sql("SELECT last_insert_rowid()").scalar()
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+    else:
+        parameters = [{"data_id": data_id, "created_at": created_at, "value": value} for data_id, created_at, value in rows]
+        statement = insert(models.DataPoint).returning(models.DataPoint.id, sort_by_parameter_order=True)
+        return list(connection.execute(statement, parameters).scalars())
+
+
+def upsert(
+        connection: Connection,
+        table: Table,
+        values: dict,
+        index_elements: list[str]
+        ):
+    """
+    Insert a row, or update the other columns of the row conflicting on the unique index. Returns the row.
+    """
+    dialect = postgresql if connection.dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(table).values(values)
+    statement = statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={name: statement.excluded[name] for name in values if name not in index_elements},
+        )
+    return connection.execute(statement.returning(*table.columns)).one()
@@ -0,0 +1,259 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.persistence.versions import PENDING_CHANGES, Change, merge_changes
+
+
+# Change bus between the worker processes, over Postgres LISTEN/NOTIFY.
+#
+# The version bumps of a transaction are collected on its connection (see
+# versions.bump_versions) and handed to the bus once the session commits. The bus
+# merges the changes of each key over FLUSH_SECONDS, so an ingest burst on a
+# series sends one event rather than one per request, and a background thread
+# sends them with pg_notify on its own connection; NOTIFY inside the writing
+# transactions would serialize their commits on the notification queue lock.
+#
+# Each worker also holds one LISTEN connection, whose thread hands the changes
+# of the other workers to a handler; a worker's own changes are skipped, as it
+# already applied them locally. Notifications are not persisted: changes sent
+# while a listener is reconnecting are lost, so it reports the reconnection for
+# caches to be dropped. Changes the notifier failed to send are kept for its next
+# attempt, which first tells the other workers to drop their caches: whether the
+# notification being sent when the connection failed went out is unknown.
+
+CHANNEL = "hh_changes"
+FLUSH_SECONDS = 0.05
+MAX_PAYLOAD_BYTES = 7900 # Postgres limits notification payloads to 8000 bytes
+RECONNECT_SECONDS = 5.0
+CONNECTIONS = 2 # Opened by each bus outside the pool: the notifier's and the listener's
+RESET_KEY = "*" # Key of the change telling receivers that changes may have been lost
+
+logger = logging.getLogger(__name__)
+
+_listeners: dict[sessionmaker, dict[str, Callable]] = {} # Session events of track_changes, by session factory
+
+
+def encode_changes(origin: str, changes: Iterable[Change]) -> list[tuple[str, list[Change]]]:
+    """
+    Encode changes as compact JSON payloads, split to fit in notifications. Returns each payload with its changes.
+    """
+    payloads = []
+    items = []
+    batch = []
+    size = 0
+    for change in changes:
+        item = json.dumps([change.key, change.version, change.id, change.count], separators=(",", ":"))
+        if items and size + len(item) + 1 > MAX_PAYLOAD_BYTES - len(origin) - 16:
+            payloads.append((_payload(origin, items), batch))
+            items, batch, size = [], [], 0
+        items.append(item)
+        batch.append(change)
+        size += len(item) + 1
+    if items:
+        payloads.append((_payload(origin, items), batch))
+    return payloads
+
+
+def _payload(origin: str, items: list[str]) -> str:
+    return f'{{"o":{json.dumps(origin)},"c":[{",".join(items)}]}}'
+
+
+def decode_changes(payload: str) -> tuple[str, list[Change]]:
+    """
+    Decode a payload into its origin and changes.
+    """
+    body = json.loads(payload)
+    return body["o"], [Change(key, version, id, count) for key, version, id, count in body["c"]]
+
+
+def track_changes(
+        session_factory: sessionmaker,
+        publish: Callable[[list[Change]], None]
+        ) -> None:
+    """
+    Publish the version changes of the sessions' transactions once they commit.
+    """
+
+    # The changes are collected in a dict shared by the session and its connection, which
+    # cannot be reached once the session has released it
+    def after_begin(session: Session, transaction, connection) -> None:
+        pending = connection.info[PENDING_CHANGES] = {}
+        session.info.setdefault(PENDING_CHANGES, []).append(pending)
+
+    def after_commit(session: Session) -> None:
+        changes = {}
+        for pending in session.info.pop(PENDING_CHANGES, []):
+            merge_changes(changes, list(pending.values()))
+        if changes:
+            publish(list(changes.values()))
+
+    def after_transaction_end(session: Session, transaction) -> None:
+        # Rolled back or closed without committing, the changes never happened
+        if transaction.parent is None:
+            for pending in session.info.pop(PENDING_CHANGES, []):
+                pending.clear()
+
+    untrack_changes(session_factory)
+    _listeners[session_factory] = {"after_begin": after_begin, "after_commit": after_commit, "after_transaction_end": after_transaction_end}
+    for name, listener in _listeners[session_factory].items():
+        event.listen(session_factory, name, listener)
+
+
+def untrack_changes(session_factory: sessionmaker) -> None:
+    for name, listener in _listeners.pop(session_factory, {}).items():
+        event.remove(session_factory, name, listener)
+
+
+class ChangeBus:
+    """
+    Send the changes of this process to the other workers, and receive theirs.
+    """
+
+    def __init__(
+            self,
+            conninfo: str,
+            handler: Callable[[list[Change]], None],
+            on_reconnect: Callable[[], None] = lambda: None,
+            channel: str = CHANNEL,
+            flush_seconds: float = FLUSH_SECONDS
+            ):
+        self.conninfo = conninfo
+        self.handler = handler
+        self.on_reconnect = on_reconnect
+        self.channel = channel
+        self.flush_seconds = flush_seconds
+        self.origin = uuid.uuid4().hex[:12]
+        self.sent = 0 # Notifications sent
+        self.received = 0 # Notifications received from other workers
+        self._pending: dict[str, Change] = {}
+        self._missed = False # Whether changes may have been lost since the last notification sent
+        self._condition = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+
+    def publish(self, changes: list[Change]) -> None:
+        """
+        Queue committed changes for the other workers, never blocking on the database.
+        """
+        with self._condition:
+            merge_changes(self._pending, changes)
+            self._condition.notify()
+
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._run_notifier, name="hh-change-notify", daemon=True),
+            threading.Thread(target=self._run_listener, name="hh-change-listen", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Send the pending changes and stop the threads.
+        """
+        self._stopping.set()
+        with self._condition:
+            self._condition.notify()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+    def flush(self, connection) -> None:
+        """
+        Send the pending changes on a psycopg connection in autocommit mode.
+
+        When sending fails, the changes not sent yet are pending again, and the next
+        flush starts by telling the receivers to drop their caches.
+        """
+        with self._condition:
+            changes, self._pending = self._pending, {}
+            missed, self._missed = self._missed, False
+        payloads = encode_changes(self.origin, ([Change(RESET_KEY, 0)] if missed else []) + list(changes.values()))
+        for i, (payload, _) in enumerate(payloads):
+            try:
+                connection.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+            except Exception:
+                with self._condition:
+                    merge_changes(self._pending, [change for _, batch in payloads[i:] for change in batch if change.key != RESET_KEY])
+                    self._missed = True
+                raise
+            self.sent += 1
+
+
+    def receive(self, payload: str) -> None:
+        """
+        Hand the changes of a notification to the handler, unless this process sent it.
+        """
+        origin, changes = decode_changes(payload)
+        if origin == self.origin:
+            return
+        self.received += 1
+        if changes and changes[0].key == RESET_KEY:
+            self.on_reconnect()
+            changes = changes[1:]
+        if changes:
+            self.handler(changes)
+
+
+    def _run_notifier(self) -> None:
+        import psycopg
+
+        connection = None
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping.is_set():
+                    self._condition.wait()
+                if not self._pending:
+                    break
+            # Let the changes of a burst accumulate
+            if not self._stopping.is_set():
+                time.sleep(self.flush_seconds)
+            try:
+                if connection is None or connection.closed:
+                    connection = psycopg.connect(self.conninfo, autocommit=True)
+                self.flush(connection)
+            except psycopg.Error:
+                logger.exception("Cannot send changes to the other workers")
+                connection = None
+                if self._stopping.wait(RECONNECT_SECONDS):
+                    break
+        if connection is not None:
+            connection.close()
+
+
+    def _run_listener(self) -> None:
+        import psycopg
+
+        connected_before = False
+        while not self._stopping.is_set():
+            try:
+                with psycopg.connect(self.conninfo, autocommit=True) as connection:
+                    connection.execute(f"LISTEN {self.channel}")
+                    if connected_before:
+                        self.on_reconnect()
+                    connected_before = True
+                    while not self._stopping.is_set():
+                        for notify in connection.notifies(timeout=1.0):
+                            self._handle(notify.payload)
+            except psycopg.Error:
+                logger.exception("Lost the change notification connection")
+                self._stopping.wait(RECONNECT_SECONDS)
+
+
+    def _handle(self, payload: str) -> None:
+        try:
+            self.receive(payload)
+        except Exception:
+            logger.exception("Cannot apply changes from another worker")
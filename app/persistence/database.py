@@ -1,24 +1,173 @@
-from sqlalchemy import create_engine
+import os
+import threading
+
+from sqlalchemy import Engine, create_engine, event
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
 
 from app.config.app_config import settings
+from app.persistence import models, versions
+from app.persistence.sqlite import configure_sqlite_engine
+from app.utils.metrics import TimedQueuePool, instrument_engine
+from app.utils.query_trace import QueryTracer
+
+
+Base = models.BaseWithToDict
+
+
+def database_url() -> str:
+    """
+    Build the URL of the configured database backend.
+    """
+    if settings.DB_BACKEND == "sqlite":
+        # The database file is attached as the hh schema on connect, see app.persistence.sqlite
+        return "sqlite://"
+    return f"postgresql+psycopg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
+
+
+DATABASE_URL = database_url()
+
+# The engine is created on first use, since creating it imports the database driver
+_engine: Engine | None = None
+_engine_lock = threading.Lock()
+
+# The change bus of this worker, started by the app, see app.persistence.changes
+_change_bus = None
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+event.listen(SessionLocal, "after_flush", versions.bump_versions_after_flush)
+
+query_tracer = QueryTracer(
+    slow_ms=settings.SLOW_QUERY_MS, 
+    explain=settings.SLOW_QUERY_EXPLAIN, 
+    statement_warn=settings.REQUEST_STATEMENT_WARN, 
+    repeat_warn=settings.REQUEST_REPEAT_WARN,
+    log_parameters=settings.SLOW_QUERY_LOG_PARAMETERS,
+    )
 
 
-Base = declarative_base()
+def change_bus_enabled() -> bool:
+    return settings.DB_BACKEND == "postgresql" and settings.CHANGE_BUS_ENABLED
 
-# Build the DATABASE_URL
-DATABASE_URL = f"postgresql+psycopg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def pool_size() -> int:
+    """
+    Connections each worker may pool, so that all workers together stay within DB_CONNECTION_BUDGET.
+
+    The connections of the change bus are part of each worker's share.
+    """
+    from app.persistence.changes import CONNECTIONS
+
+    share = settings.DB_CONNECTION_BUDGET // max(1, settings.UVICORN_WORKERS)
+    if change_bus_enabled():
+        share -= CONNECTIONS
+    return max(1, share)
+
+
+def get_engine() -> Engine:
+    """
+    Get the database engine, creating it on first use.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                # No overflow, so the budget is a hard limit; requests wait for a free connection instead
+                _engine = create_engine(
+                    DATABASE_URL, 
+                    poolclass=TimedQueuePool, 
+                    pool_size=pool_size(), 
+                    max_overflow=0, 
+                    pool_timeout=settings.DB_POOL_TIMEOUT,
+                    **backend_options(),
+                    )
+                configure_backend(_engine)
+                instrument_engine(_engine, slow_seconds=query_tracer.slow_seconds, on_slow_statement=query_tracer.log_slow)
+                SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+def backend_options() -> dict:
+    """
+    Engine options specific to the database backend.
+    """
+    if settings.DB_BACKEND == "sqlite":
+        # Connections move between the threadpool's threads, one at a time
+        return {"connect_args": {"check_same_thread": False}}
+    return {}
+
+
+def configure_backend(engine: Engine) -> None:
+    """
+    Set up new connections of an engine for its database backend.
+    """
+    if settings.DB_BACKEND == "sqlite":
+        configure_sqlite_engine(
+            engine, 
+            settings.SQLITE_PATH, 
+            cache_size_kb=settings.SQLITE_CACHE_SIZE_KB, 
+            mmap_size=settings.SQLITE_MMAP_SIZE, 
+            busy_timeout_ms=settings.SQLITE_BUSY_TIMEOUT_MS,
+            )
+
+
+def dispose_engine() -> None:
+    """
+    Close every pooled connection.
+    """
+    if _engine is not None:
+        _engine.dispose()
+
+
+def start_change_bus(handler, on_reconnect) -> None:
+    """
+    Share the changes committed by this worker's sessions with the other workers, and
+    hand theirs to handler. Only the postgresql backend has a change bus.
+    """
+    global _change_bus
+    from app.persistence.changes import ChangeBus, track_changes
+
+    if _change_bus is not None or not change_bus_enabled():
+        return
+
+    conninfo = get_engine().url.set(drivername="postgresql").render_as_string(hide_password=False)
+    _change_bus = ChangeBus(conninfo, handler, on_reconnect, flush_seconds=settings.CHANGE_BUS_FLUSH_MS / 1000)
+    track_changes(SessionLocal, _change_bus.publish)
+    _change_bus.start()
+
+
+def stop_change_bus() -> None:
+    """
+    Send the pending changes and stop the change bus.
+    """
+    global _change_bus
+    from app.persistence.changes import untrack_changes
+
+    if _change_bus is not None:
+        untrack_changes(SessionLocal)
+        _change_bus.stop()
+        _change_bus = None
+
+
+def _after_fork_in_child() -> None:
+    # Pooled connections belong to the parent; the child must not use or close them,
+    # nor rely on the change bus threads, which do not survive the fork
+    global _engine_lock, _change_bus
+    _engine_lock = threading.Lock()
+    _change_bus = None
+    if _engine is not None:
+        _engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
 
 
 def init_db():
     """
-    Initialize the database.
+    Initialize the database, running any pending migrations.
     """
-    Base.metadata.create_all(bind=engine)
+    from app.persistence import migrate
+
+    migrate.upgrade_if_needed(get_engine())
 
     # TODO: Create default admin user
 
@@ -27,6 +176,7 @@ def get_db():
     """
     Get a database session.
     """
+    get_engine()
     db = SessionLocal()
     try:
         yield db
@@ -0,0 +1,121 @@
+import threading
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.persistence import models, versions
+from app.utils.api_keys import parse_api_key, verify_secret
+
+
+# Every live device key is kept in memory, so authenticating a device request is
+# a dict lookup and one HMAC, with no database round trip. Local revocations
+# invalidate the table at once. Changes made by other processes are seen through
+# the "device_key" change version, checked at most every RELOAD_SECONDS, and an
+# unknown key id triggers an early check at most every MISS_RELOAD_SECONDS.
+RELOAD_SECONDS = 5.0
+MISS_RELOAD_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class CachedDeviceKey:
+    id: int
+    key_id: str
+    digest: str
+    created_by_user_id: int
+
+
+@dataclass(frozen=True)
+class DeviceKeyTableSnapshot:
+    by_key_id: dict[str, CachedDeviceKey]
+    version: int # Version of the "device_key" change key the snapshot was loaded at
+
+
+class DeviceKeyTable:
+    """
+    In-process table of the live device keys, keyed by key id.
+    """
+
+    def __init__(
+            self, 
+            reload_seconds: float = RELOAD_SECONDS, 
+            miss_reload_seconds: float = MISS_RELOAD_SECONDS
+            ):
+        self.reload_seconds = reload_seconds
+        self.miss_reload_seconds = miss_reload_seconds
+        self._snapshot: DeviceKeyTableSnapshot | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+
+    def authenticate(self, db: Session, api_key: str, pepper: bytes) -> CachedDeviceKey | None:
+        """
+        Get the live device key matching an API key, or None.
+        """
+        parsed = parse_api_key(api_key)
+        if not parsed:
+            return None
+        key_id, secret = parsed
+
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is None or now - self._checked_at > self.reload_seconds:
+            snapshot = self._check(db, now)
+
+        device_key = snapshot.by_key_id.get(key_id)
+        if device_key is None and now - self._checked_at > self.miss_reload_seconds:
+            device_key = self._check(db, now).by_key_id.get(key_id)
+
+        if device_key is None or not verify_secret(secret, device_key.digest, pepper):
+            return None
+        return device_key
+
+
+    def peek(self, api_key: str, pepper: bytes) -> CachedDeviceKey | None:
+        """
+        Get the device key matching an API key from the loaded table only, never touching the database.
+
+        Keys added since the table was loaded are not found.
+        """
+        parsed = parse_api_key(api_key)
+        snapshot = self._snapshot
+        if not parsed or snapshot is None:
+            return None
+        key_id, secret = parsed
+
+        device_key = snapshot.by_key_id.get(key_id)
+        if device_key is None or not verify_secret(secret, device_key.digest, pepper):
+            return None
+        return device_key
+
+
+    def invalidate(self) -> None:
+        """
+        Drop the table, so that it is loaded again on next use.
+        """
+        self._snapshot = None
+
+
+    def _check(self, db: Session, now: float) -> DeviceKeyTableSnapshot:
+        """
+        Reload the table if the device keys changed since it was loaded.
+        """
+        with self._lock:
+            self._checked_at = now
+            version, _ = versions.get_versions(db, ["device_key"]).get("device_key", (0, None))
+            if self._snapshot is not None and self._snapshot.version == version:
+                return self._snapshot
+
+            rows = db.execute(
+                select(models.DeviceKey.id, models.DeviceKey.key_id, models.DeviceKey.digest, models.DeviceKey.created_by_user_id)
+                .where(models.DeviceKey.revoked_at.is_(None))
+                )
+            self._snapshot = DeviceKeyTableSnapshot(
+                by_key_id={row.key_id: CachedDeviceKey(*row) for row in rows},
+                version=version,
+                )
+            return self._snapshot
+
+
+device_key_table = DeviceKeyTable()
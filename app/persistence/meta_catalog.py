@@ -0,0 +1,129 @@
+import threading
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.persistence import models, versions
+
+
+# The Meta table holds a few dozen rows which nearly every data meta write and
+# meta filter needs, so each process keeps the whole catalog in memory. It is
+# replaced as a whole on every refresh, so readers never see a half built catalog
+# and need no lock. MetaRepository refreshes it after its writes. Writes made by
+# other processes are picked up when a lookup misses: at most every
+# MISS_RELOAD_SECONDS, the version of the catalog is checked, and it is reloaded
+# only if it changed, so lookups of unknown metas cannot make every request hit
+# the database. Until then a renamed or deleted meta may still be served from the
+# old catalog.
+
+MISS_RELOAD_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class CachedMeta:
+    id: int
+    name: str
+    meta_type: str
+
+
+@dataclass(frozen=True)
+class MetaCatalogSnapshot:
+    by_id: dict[int, CachedMeta]
+    by_name: dict[str, CachedMeta]
+    version: int # Version of the "meta" change key the snapshot was loaded at
+
+
+class MetaCatalog:
+    """
+    In-process cache of the Meta table, keyed by id and by name.
+    """
+
+    def __init__(self, miss_reload_seconds: float = MISS_RELOAD_SECONDS):
+        self.miss_reload_seconds = miss_reload_seconds
+        self._snapshot: MetaCatalogSnapshot | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+
+    @property
+    def version(self) -> int | None:
+        """
+        Version stamp of the loaded catalog, or None before the first load.
+        """
+        snapshot = self._snapshot
+        return snapshot.version if snapshot else None
+
+
+    def snapshot(self, db: Session) -> MetaCatalogSnapshot:
+        """
+        Get the current catalog, loading it on first use.
+        """
+        return self._snapshot or self.refresh(db)
+
+
+    def get_by_id(self, db: Session, meta_id: int) -> CachedMeta | None:
+        """
+        Get a meta by id, checking for a newer catalog if it is not known.
+        """
+        meta = self.snapshot(db).by_id.get(meta_id)
+        if meta is None and self._should_check():
+            meta = self._check(db).by_id.get(meta_id)
+        return meta
+
+
+    def get_by_name(self, db: Session, name: str) -> CachedMeta | None:
+        """
+        Get a meta by name, checking for a newer catalog if it is not known.
+        """
+        meta = self.snapshot(db).by_name.get(name)
+        if meta is None and self._should_check():
+            meta = self._check(db).by_name.get(name)
+        return meta
+
+
+    def _should_check(self) -> bool:
+        return time.monotonic() - self._checked_at > self.miss_reload_seconds
+
+
+    def _check(self, db: Session) -> MetaCatalogSnapshot:
+        """
+        Reload the catalog if the metas changed since it was loaded.
+        """
+        self._checked_at = time.monotonic()
+        version, _ = versions.get_versions(db, ["meta"]).get("meta", (0, None))
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        return self.refresh(db)
+
+
+    def refresh(self, db: Session) -> MetaCatalogSnapshot:
+        """
+        Reload the whole catalog from the database.
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            metas = [
+                CachedMeta(id, name, meta_type)
+                for id, name, meta_type in db.execute(select(models.Meta.id, models.Meta.name, models.Meta.meta_type))
+                ]
+            version, _ = versions.get_versions(db, ["meta"]).get("meta", (0, None))
+
+            self._snapshot = MetaCatalogSnapshot(
+                by_id={meta.id: meta for meta in metas},
+                by_name={meta.name: meta for meta in metas},
+                version=version,
+                )
+            return self._snapshot
+
+
+    def clear(self) -> None:
+        """
+        Drop the catalog, so that it is loaded again on next use.
+        """
+        self._snapshot = None
+
+
+meta_catalog = MetaCatalog()
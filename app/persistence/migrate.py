@@ -0,0 +1,70 @@
+import os
+
+from sqlalchemy import Engine, inspect, text
+
+
+MIGRATIONS_PATH = os.path.join(os.path.dirname(__file__), "migrations")
+
+# Latest revision in migrations/versions; tests check it against the scripts, so
+# that start up can compare it with the database without importing alembic.
+HEAD_REVISION = "0003"
+
+# Revision matching databases created before migrations existed
+BASELINE_REVISION = "0001"
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    """
+    Leave objects that are not in the models out of autogenerate: the SQLite FTS5
+    tables, maintained by triggers, and the version table itself.
+    """
+    if type_ == "table" and (name.startswith("data_fts") or name == "alembic_version"):
+        return False
+    return True
+
+
+def current_revision(connection) -> str | None:
+    """
+    Get the revision the database is at, or None if it has no version table.
+    """
+    if not inspect(connection).has_table("alembic_version", schema="hh"):
+        return None
+    return connection.execute(text("SELECT version_num FROM hh.alembic_version")).scalar()
+
+
+def alembic_config(connection=None):
+    """
+    Build the alembic configuration, optionally running on an existing connection.
+    """
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_PATH)
+    config.attributes["connection"] = connection
+    return config
+
+
+def upgrade_if_needed(engine: Engine) -> bool:
+    """
+    Migrate the database to the head revision, if it is not there already.
+
+    Databases with tables but no version table predate migrations, and are
+    stamped with the baseline revision before upgrading.
+
+    Returns:
+        bool: Whether any migration ran.
+    """
+    with engine.connect() as connection:
+        revision = current_revision(connection)
+        if revision == HEAD_REVISION:
+            return False
+
+        from alembic import command
+
+        if revision is None and inspect(connection).has_table("data", schema="hh"):
+            command.stamp(alembic_config(connection), BASELINE_REVISION)
+
+        command.upgrade(alembic_config(connection), "head")
+        connection.commit()
+
+    return True
@@ -0,0 +1,52 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.persistence import models
+from app.persistence.migrate import include_object
+
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+target_metadata = models.BaseWithToDict.metadata
+
+
+def run_migrations(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        version_table_schema="hh",
+        include_schemas=True,
+        include_object=include_object,
+        )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_offline() -> None:
+    from app.persistence.database import DATABASE_URL
+
+    context.configure(url=DATABASE_URL, target_metadata=target_metadata, version_table_schema="hh", literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # app.persistence.migrate passes its connection in; the alembic CLI does not
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        run_migrations(connection)
+        return
+
+    from app.persistence.database import get_engine
+
+    with get_engine().connect() as connection:
+        run_migrations(connection)
+        connection.commit()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,83 @@
+"""Initial schema: users, datas, data points, metas and data metas
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+Databases created before migrations existed match this revision and are
+stamped with it on first start.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+TYPES = "'string','integer','float','datetime'"
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Column("username", sa.String, nullable=False, unique=True),
+        sa.Column("email", sa.String, nullable=False, unique=True),
+        sa.Column("password", sa.String, nullable=False),
+        schema="hh",
+        )
+    op.create_index("ix_hh_user_id", "user", ["id"], schema="hh")
+
+    op.create_table(
+        "meta",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("name", sa.String, nullable=False, unique=True),
+        sa.Column("meta_type", sa.String, nullable=False),
+        sa.CheckConstraint(f"meta_type IN ({TYPES})", name="check_meta_type_value"),
+        schema="hh",
+        )
+    op.create_index("ix_hh_meta_id", "meta", ["id"], schema="hh")
+
+    op.create_table(
+        "data",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("created_by_user_id", sa.Integer, sa.ForeignKey("hh.user.id", ondelete="restrict"), nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Column("name", sa.String, nullable=False, unique=True),
+        sa.Column("description", sa.Text, nullable=True),
+        sa.Column("data_type", sa.String, nullable=False),
+        sa.CheckConstraint(f"data_type IN ({TYPES})", name="check_data_type_value"),
+        schema="hh",
+        )
+    op.create_index("ix_hh_data_id", "data", ["id"], schema="hh")
+
+    op.create_table(
+        "data_point",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("data_id", sa.Integer, sa.ForeignKey("hh.data.id", ondelete="RESTRICT"), nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Column("value", sa.JSON, nullable=False),
+        schema="hh",
+        )
+    op.create_index("ix_hh_data_point_id", "data_point", ["id"], schema="hh")
+
+    op.create_table(
+        "data_meta",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("data_id", sa.Integer, sa.ForeignKey("hh.data.id", ondelete="RESTRICT"), nullable=False),
+        sa.Column("meta_id", sa.Integer, sa.ForeignKey("hh.meta.id", ondelete="RESTRICT"), nullable=False),
+        sa.Column("value", sa.JSON, nullable=False),
+        schema="hh",
+        )
+    op.create_index("ix_hh_data_meta_id", "data_meta", ["id"], schema="hh")
+
+
+def downgrade() -> None:
+    op.drop_table("data_meta", schema="hh")
+    op.drop_table("data_point", schema="hh")
+    op.drop_table("data", schema="hh")
+    op.drop_table("meta", schema="hh")
+    op.drop_table("user", schema="hh")
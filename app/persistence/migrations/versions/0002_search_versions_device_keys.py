@@ -0,0 +1,115 @@
+"""Query and search indexes, change versions and device keys
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+SQLITE_DATA_FTS_METAS = """
+    (SELECT coalesce(group_concat(json_extract(value, '$'), ' '), '')
+     FROM data_meta WHERE data_id = {data_id} AND json_type(value) = 'text')
+"""
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS hh.data_fts USING fts5(name, description, metas)",
+    """CREATE TRIGGER IF NOT EXISTS hh.data_fts_insert AFTER INSERT ON data BEGIN
+        INSERT INTO data_fts (rowid, name, description, metas) VALUES (new.id, new.name, new.description, '');
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS hh.data_fts_update AFTER UPDATE OF name, description ON data BEGIN
+        UPDATE data_fts SET name = new.name, description = new.description WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS hh.data_fts_delete AFTER DELETE ON data BEGIN
+        DELETE FROM data_fts WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS hh.data_meta_fts_insert AFTER INSERT ON data_meta BEGIN
+        UPDATE data_fts SET metas = {SQLITE_DATA_FTS_METAS.format(data_id="new.data_id")} WHERE rowid = new.data_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS hh.data_meta_fts_update AFTER UPDATE ON data_meta BEGIN
+        UPDATE data_fts SET metas = {SQLITE_DATA_FTS_METAS.format(data_id="new.data_id")} WHERE rowid = new.data_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS hh.data_meta_fts_delete AFTER DELETE ON data_meta BEGIN
+        UPDATE data_fts SET metas = {SQLITE_DATA_FTS_METAS.format(data_id="old.data_id")} WHERE rowid = old.data_id;
+    END""",
+    # Index the rows written before the triggers existed
+    f"""INSERT INTO hh.data_fts (rowid, name, description, metas)
+        SELECT id, name, description, {SQLITE_DATA_FTS_METAS.format(data_id="data.id")} FROM hh.data""",
+]
+
+SQLITE_FTS_DROP = [
+    "DROP TRIGGER IF EXISTS hh.data_meta_fts_delete",
+    "DROP TRIGGER IF EXISTS hh.data_meta_fts_update",
+    "DROP TRIGGER IF EXISTS hh.data_meta_fts_insert",
+    "DROP TRIGGER IF EXISTS hh.data_fts_delete",
+    "DROP TRIGGER IF EXISTS hh.data_fts_update",
+    "DROP TRIGGER IF EXISTS hh.data_fts_insert",
+    "DROP TABLE IF EXISTS hh.data_fts",
+]
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    op.create_table(
+        "change_version",
+        sa.Column("key", sa.String, primary_key=True),
+        sa.Column("version", sa.BigInteger, nullable=False),
+        sa.Column("updated_at", sa.DateTime, nullable=False),
+        schema="hh",
+        )
+
+    op.create_table(
+        "device_key",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("key_id", sa.String, nullable=False, unique=True),
+        sa.Column("name", sa.String, nullable=False),
+        sa.Column("digest", sa.String, nullable=False),
+        sa.Column("created_by_user_id", sa.Integer, sa.ForeignKey("hh.user.id", ondelete="restrict"), nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Column("revoked_at", sa.DateTime, nullable=True),
+        schema="hh",
+        )
+    op.create_index("ix_hh_device_key_id", "device_key", ["id"], schema="hh")
+
+    op.create_index("ix_data_point_data_id_created_at", "data_point", ["data_id", "created_at"], schema="hh")
+    op.create_index("ix_data_meta_data_id", "data_meta", ["data_id"], schema="hh")
+
+    if dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX ix_data_meta_meta_id_value ON hh.data_meta (meta_id, (value #>> '{}'))")
+        op.execute('CREATE INDEX ix_user_username_trgm ON hh."user" USING gin (username gin_trgm_ops)')
+        op.execute("CREATE INDEX ix_data_name_trgm ON hh.data USING gin (name gin_trgm_ops)")
+        op.execute("CREATE INDEX ix_meta_name_trgm ON hh.meta USING gin (name gin_trgm_ops)")
+        op.execute("CREATE INDEX ix_data_search_document ON hh.data USING gin (to_tsvector('simple', (name || ' ') || coalesce(description, '')))")
+        op.execute(
+            "CREATE INDEX ix_data_meta_search_document ON hh.data_meta USING gin (to_tsvector('simple', (value #>> '{}'))) "
+            "WHERE json_typeof(value) = 'string'"
+            )
+    elif dialect == "sqlite":
+        op.execute("CREATE INDEX hh.ix_data_meta_meta_id_value ON data_meta (meta_id, CAST(json_extract(value, '$') AS TEXT))")
+        for statement in SQLITE_FTS_DDL:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        for name in ("ix_data_meta_search_document", "ix_data_search_document", "ix_meta_name_trgm", "ix_data_name_trgm", "ix_user_username_trgm"):
+            op.execute(f"DROP INDEX IF EXISTS hh.{name}")
+    elif dialect == "sqlite":
+        for statement in SQLITE_FTS_DROP:
+            op.execute(statement)
+
+    op.execute("DROP INDEX IF EXISTS hh.ix_data_meta_meta_id_value")
+    op.drop_index("ix_data_meta_data_id", "data_meta", schema="hh")
+    op.drop_index("ix_data_point_data_id_created_at", "data_point", schema="hh")
+    op.drop_table("device_key", schema="hh")
+    op.drop_table("change_version", schema="hh")
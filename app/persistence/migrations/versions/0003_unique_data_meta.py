@@ -0,0 +1,42 @@
+"""One data meta per data and meta, the target of data meta upserts
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+from sqlalchemy import text
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# Pairs listed in the error when duplicates are found
+MAX_LISTED_DUPLICATES = 20
+
+
+def upgrade() -> None:
+    # Migrations run on every start, so duplicates are reported rather than deleted;
+    # the README shows how to remove them
+    duplicates = op.get_bind().execute(text(
+        "SELECT data_id, meta_id FROM hh.data_meta GROUP BY data_id, meta_id HAVING count(*) > 1 "
+        "ORDER BY data_id, meta_id"
+        )).all()
+    if duplicates:
+        pairs = ", ".join(f"({data_id}, {meta_id})" for data_id, meta_id in duplicates[:MAX_LISTED_DUPLICATES])
+        more = f" and {len(duplicates) - MAX_LISTED_DUPLICATES} more" if len(duplicates) > MAX_LISTED_DUPLICATES else ""
+        raise RuntimeError(
+            f"Cannot make data metas unique: several data metas share the (data_id, meta_id) pairs {pairs}{more}. "
+            "Keep one data meta per pair, see Migrations in the README, then start again."
+            )
+
+    op.create_index("uq_data_meta_data_id_meta_id", "data_meta", ["data_id", "meta_id"], unique=True, schema="hh")
+    # Served by the unique index, which starts with data_id
+    op.drop_index("ix_data_meta_data_id", "data_meta", schema="hh")
+
+
+def downgrade() -> None:
+    op.create_index("ix_data_meta_data_id", "data_meta", ["data_id"], schema="hh")
+    op.drop_index("uq_data_meta_data_id_meta_id", "data_meta", schema="hh")
@@ -1,9 +1,12 @@
 import datetime
 import json
-from sqlalchemy import JSON, Integer, String, Text, DateTime, Column, ForeignKey, CheckConstraint
-from sqlalchemy.orm import relationship, class_mapper
+from operator import attrgetter
+from sqlalchemy import JSON, DDL, BigInteger, Float, Integer, String, Text, DateTime, Column, ForeignKey, CheckConstraint, Index, event, func, text
+from sqlalchemy.orm import relationship
 from sqlalchemy.types import TypeDecorator
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import as_declarative, declared_attr
+from sqlalchemy.sql.functions import FunctionElement
 
 
 class JSONEncodedDict(TypeDecorator):
@@ -21,51 +24,94 @@ class JSONEncodedDict(TypeDecorator):
         return json.loads(value)  # Deserialize to Python dict
 
 
+class json_text(FunctionElement):
+    """Text form of a JSON value, usable in comparisons and expression indexes."""
+    type = Text()
+    name = "json_text"
+    inherit_cache = True
+
+
+@compiles(json_text, "postgresql")
+def _compile_json_text_postgresql(element, compiler, **kw):
+    return "(%s #>> '{}')" % compiler.process(element.clauses, **kw)
+
+
+@compiles(json_text, "sqlite")
+def _compile_json_text_sqlite(element, compiler, **kw):
+    return "CAST(json_extract(%s, '$') AS TEXT)" % compiler.process(element.clauses, **kw)
+
+
+class json_number(FunctionElement):
+    """Numeric form of a JSON number, for aggregates."""
+    type = Float()
+    name = "json_number"
+    inherit_cache = True
+
+
+@compiles(json_number, "postgresql")
+def _compile_json_number_postgresql(element, compiler, **kw):
+    return "CAST(%s #>> '{}' AS DOUBLE PRECISION)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(json_number, "sqlite")
+def _compile_json_number_sqlite(element, compiler, **kw):
+    return "json_extract(%s, '$')" % compiler.process(element.clauses, **kw)
+
+
+class epoch_bucket(FunctionElement):
+    """Start of the time bucket of a timestamp, in seconds since the epoch: epoch_bucket(column, seconds)."""
+    type = BigInteger()
+    name = "epoch_bucket"
+    inherit_cache = True
+
+
+@compiles(epoch_bucket, "postgresql")
+def _compile_epoch_bucket_postgresql(element, compiler, **kw):
+    column, seconds = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"CAST(floor(extract(epoch FROM {column}) / {seconds}) * {seconds} AS BIGINT)"
+
+
+@compiles(epoch_bucket, "sqlite")
+def _compile_epoch_bucket_sqlite(element, compiler, **kw):
+    column, seconds = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"(CAST(strftime('%s', {column}) AS INTEGER) / {seconds} * {seconds})"
+
+
 @as_declarative()
 class BaseWithToDict:
     @declared_attr
     def __tablename__(cls):
         return cls.__name__.lower()
 
-    def to_dict(self, include_relationships=True, include_columns=True, visited=None):
+    def to_dict(self):
         """
-        Convert the SQLAlchemy object to a dictionary, including relationships.
-        
-        Args:
-            include_relationships (bool): Whether to include related objects.
-            include_columns (bool): Whether to include direct columns.
-            visited (set): Tracks visited objects to avoid infinite recursion.
-        
+        Convert the SQLAlchemy object to a dictionary of its columns.
+
+        Relationships are not followed; load them in batches and serialize them separately.
+
         Returns:
             dict: The object represented as a dictionary.
         """
-        if visited is None:
-            visited = set()
+        return self._serializer(self)
 
-        # Avoid infinite recursion by skipping already visited objects
-        if self in visited:
-            return {}
-        visited.add(self)
 
-        data = {}
+def compile_serializer(model, exclude=()):
+    """
+    Compile a function converting instances of a model to dictionaries of their columns.
 
-        # Include column attributes
-        if include_columns:
-            for column in class_mapper(self.__class__).columns:
-                data[column.name] = getattr(self, column.name)
+    Args:
+        model: The mapped class.
+        exclude (tuple): Column names to leave out.
 
-        # Include relationships
-        if include_relationships:
-            for rel in class_mapper(self.__class__).relationships:
-                related_obj = getattr(self, rel.key)
-                if related_obj is None:
-                    data[rel.key] = None
-                elif isinstance(related_obj, list):  # Handle one-to-many or many-to-many
-                    data[rel.key] = [obj.to_dict(include_relationships, include_columns, visited) for obj in related_obj]
-                else:  # Handle one-to-one or many-to-one
-                    data[rel.key] = related_obj.to_dict(include_relationships, include_columns, visited)
+    Returns:
+        Callable: The serializer.
+    """
+    names = tuple(column.name for column in model.__table__.columns if column.name not in exclude)
+    getter = attrgetter(*names)
 
-        return data
+    if len(names) == 1:
+        return lambda obj: {names[0]: getter(obj)}
+    return lambda obj: dict(zip(names, getter(obj)))
 
 
 class User(BaseWithToDict):
@@ -144,4 +190,116 @@ class DataMeta(BaseWithToDict):
     data = relationship("Data", back_populates="data_metas", lazy="noload")
     meta = relationship("Meta", back_populates="data_metas", lazy="noload")
 
-    # TODO: Add validation for 'value' column.
\ No newline at end of file
+    # TODO: Add validation for 'value' column.
+
+
+class DeviceKey(BaseWithToDict):
+    __tablename__ = "device_key"
+    __table_args__ = {"schema": "hh"}
+
+    id = Column(Integer, primary_key=True, index=True)
+    key_id = Column(String, unique=True, nullable=False)
+    name = Column(String, nullable=False)
+    digest = Column(String, nullable=False) # HMAC-SHA256 of the key's secret part
+    created_by_user_id = Column(Integer, ForeignKey("hh.user.id", ondelete="restrict"), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    revoked_at = Column(DateTime, nullable=True)
+
+
+class ChangeVersion(BaseWithToDict):
+    __tablename__ = "change_version"
+    __table_args__ = {"schema": "hh"}
+
+    key = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+
+# Serializers behind to_dict, compiled once at import
+for _model in (User, Data, DataPoint, Meta, DataMeta, ChangeVersion):
+    _model._serializer = staticmethod(compile_serializer(_model))
+DeviceKey._serializer = staticmethod(compile_serializer(DeviceKey, exclude=("digest",)))
+
+# Serves listing the points of a data and finding its latest point
+Index("ix_data_point_data_id_created_at", DataPoint.data_id, DataPoint.created_at)
+
+# Search indexes. Postgres uses pg_trgm GIN indexes for substring matching and
+# tsvector GIN indexes for full text search. SQLite keeps an FTS5 table in sync
+# with triggers instead. The document expressions are shared with the queries in
+# app.persistence.search so that the planner matches them against the indexes.
+TS_CONFIG = text("'simple'")
+
+
+def data_search_document():
+    """
+    Full text document of a data, built from its name and description.
+    """
+    document = Data.name.op("||")(text("' '")).op("||")(func.coalesce(Data.description, text("''")))
+    return func.to_tsvector(TS_CONFIG, document)
+
+
+def data_meta_search_document():
+    """
+    Full text document of a data meta value.
+    """
+    return func.to_tsvector(TS_CONFIG, json_text(DataMeta.value))
+
+
+def data_meta_is_string():
+    """
+    Condition matching data metas with a string value.
+    """
+    return func.json_typeof(DataMeta.value).op("=")(text("'string'"))
+
+
+Index("ix_user_username_trgm", User.username, postgresql_using="gin", postgresql_ops={"username": "gin_trgm_ops"}).ddl_if(dialect="postgresql")
+Index("ix_data_name_trgm", Data.name, postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}).ddl_if(dialect="postgresql")
+Index("ix_data_search_document", data_search_document(), postgresql_using="gin").ddl_if(dialect="postgresql")
+Index("ix_meta_name_trgm", Meta.name, postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}).ddl_if(dialect="postgresql")
+# One value per meta of a data; the target of data meta upserts
+Index("uq_data_meta_data_id_meta_id", DataMeta.data_id, DataMeta.meta_id, unique=True)
+Index("ix_data_meta_meta_id_value", DataMeta.meta_id, json_text(DataMeta.value))
+Index("ix_data_meta_search_document", data_meta_search_document(), postgresql_using="gin", postgresql_where=data_meta_is_string()).ddl_if(dialect="postgresql")
+
+event.listen(
+    BaseWithToDict.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+    )
+
+# The FTS5 row of a data holds its name, description and string meta values
+SQLITE_DATA_FTS_METAS = """
+    (SELECT coalesce(group_concat(json_extract(value, '$'), ' '), '')
+     FROM data_meta WHERE data_id = {data_id} AND json_type(value) = 'text')
+"""
+
+sqlite_data_fts_ddl = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS hh.data_fts USING fts5(name, description, metas)",
+    """CREATE TRIGGER IF NOT EXISTS hh.data_fts_insert AFTER INSERT ON data BEGIN
+        INSERT INTO data_fts (rowid, name, description, metas) VALUES (new.id, new.name, new.description, '');
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS hh.data_fts_update AFTER UPDATE OF name, description ON data BEGIN
+        UPDATE data_fts SET name = new.name, description = new.description WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS hh.data_fts_delete AFTER DELETE ON data BEGIN
+        DELETE FROM data_fts WHERE rowid = old.id;
+    END""",
+]
+
+sqlite_data_meta_fts_ddl = [
+    f"""CREATE TRIGGER IF NOT EXISTS hh.data_meta_fts_insert AFTER INSERT ON data_meta BEGIN
+        UPDATE data_fts SET metas = {SQLITE_DATA_FTS_METAS.format(data_id="new.data_id")} WHERE rowid = new.data_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS hh.data_meta_fts_update AFTER UPDATE ON data_meta BEGIN
+        UPDATE data_fts SET metas = {SQLITE_DATA_FTS_METAS.format(data_id="new.data_id")} WHERE rowid = new.data_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS hh.data_meta_fts_delete AFTER DELETE ON data_meta BEGIN
+        UPDATE data_fts SET metas = {SQLITE_DATA_FTS_METAS.format(data_id="old.data_id")} WHERE rowid = old.data_id;
+    END""",
+]
+
+for _statement in sqlite_data_fts_ddl:
+    event.listen(Data.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in sqlite_data_meta_fts_ddl:
+    event.listen(DataMeta.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(Data.__table__, "before_drop", DDL("DROP TABLE IF EXISTS hh.data_fts").execute_if(dialect="sqlite"))
@@ -1,11 +1,13 @@
 from fastapi import Depends
+from sqlalchemy import Row, select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
 from app.api.schemas import data_meta_schema
 from app.api.schemas.pagination_schema import PaginatedResponse
 from app.core.services.exceptions import IntegrityConstraintViolationException
-from app.persistence import models
+from app.persistence import bulk, models, search, versions
+from app.persistence.meta_catalog import meta_catalog
 from app.persistence.database import get_db
 from app.utils.pagination import PaginationContext, paginate_query
 
@@ -28,9 +30,8 @@ class DataMetaRepository:
         """
         Create a data meta.
         """
-        # Validate the value is compatible with the meta type
-        db_meta = self.db.query(models.Meta).filter(models.Meta.id == data_meta_create.meta_id).first()
-        if not db_meta:
+        meta = meta_catalog.get_by_id(self.db, data_meta_create.meta_id)
+        if not meta:
             raise IntegrityConstraintViolationException("Meta not found")
         
         # TODO: Validate the value is compatible with the meta type
@@ -62,7 +63,7 @@ class DataMetaRepository:
         query = self.db.query(models.DataMeta).filter(models.DataMeta.data_id == data_id)
 
         if context.search:
-            query = query.filter(models.DataMeta.value.contains(context.search))
+            query = query.filter(search.json_contains(models.DataMeta.value, context.search))
 
         results = paginate_query(query, context.limit, context.offset)
 
@@ -80,30 +81,51 @@ class DataMetaRepository:
         return self.db.query(models.DataMeta).filter(models.DataMeta.data_id == data_id, models.DataMeta.meta_id == meta_id).first()
 
 
+    def get_data_meta_values_by_meta_name(
+            self, 
+            meta_name: str
+            ) -> list[Row]:
+        """
+        Get the (data_id, data_type, value) of every data meta of a meta, by the meta's name.
+        """
+        meta = meta_catalog.get_by_name(self.db, meta_name)
+        if not meta:
+            return []
+
+        statement = (
+            select(models.DataMeta.data_id, models.Data.data_type, models.DataMeta.value)
+            .join(models.Data, models.Data.id == models.DataMeta.data_id)
+            .where(models.DataMeta.meta_id == meta.id)
+            .order_by(models.DataMeta.data_id)
+        )
+        return self.db.execute(statement).all()
+
+
     def update_data_meta_by_id(
             self, 
             data_id: int, 
             data_meta_update: data_meta_schema.DataMetaUpdate
-            ) -> models.DataMeta | None:
+            ) -> Row | None:
         """
-        Update a data meta by id.
+        Set the value of a meta for a data, creating the data meta if needed.
+
+        Returns None when the meta does not exist.
         """
-        db_data_meta = self.db.query(models.DataMeta).filter(models.DataMeta.data_id == data_id, models.DataMeta.meta_id == data_meta_update.meta_id).first()
-        if not db_data_meta:
+        if not meta_catalog.get_by_id(self.db, data_meta_update.meta_id):
             return None
-        
+
+        # A single upsert on the (data_id, meta_id) unique index instead of a select and an update
+        values = {"data_id": data_id, "meta_id": data_meta_update.meta_id, "value": data_meta_update.value}
         try:
-            self.db.query(models.DataMeta).filter(models.DataMeta.data_id == data_id, models.DataMeta.meta_id == data_meta_update.meta_id).update(data_meta_update.model_dump())
+            connection = self.db.connection()
+            row = bulk.upsert(connection, models.DataMeta.__table__, values, ["data_id", "meta_id"])
+            versions.bump_versions(connection, {"data_meta", f"data_meta:{data_id}"})
             self.db.commit()
-            self.db.refresh(db_data_meta)
-        except IntegrityError as ex:
+        except IntegrityError:
             self.db.rollback()
-            if "UNIQUE constraint failed:" in str(ex):
-                raise IntegrityConstraintViolationException("Data meta already exists")
-            else:
-                raise IntegrityConstraintViolationException(f"Cannot update data meta")
+            raise IntegrityConstraintViolationException(f"Cannot update data meta")
 
-        return db_data_meta
+        return row
     
 
     def delete_data_meta(
@@ -1,13 +1,17 @@
+import datetime
+
 from fastapi import Depends
+from sqlalchemy import func, literal_column, select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
 from app.api.schemas import data_point_schema
 from app.api.schemas.pagination_schema import PaginatedResponse
 from app.core.services.exceptions import IntegrityConstraintViolationException
-from app.persistence import models
+from app.persistence import bulk, models, search, versions
 from app.persistence.database import get_db
-from app.utils.pagination import PaginationContext, paginate_query
+from app.utils.streams import stream_hub
+from app.utils.pagination import PaginationContext, paginate_query, paginate_rows
 
 
 class DataPointRepository:
@@ -19,6 +23,9 @@ class DataPointRepository:
             self, db: Session
             ):
         self.db = db
+        self._unpublished: list[dict] = [] # Batch data points to stream once committed
+        self._added = 0 # Batch data points added since the last commit
+        self._last_id: int | None = None # Id of the last of them
 
         
 
@@ -40,10 +47,64 @@ class DataPointRepository:
             if "UNIQUE constraint failed:" in str(IntegrityError):
                 raise IntegrityConstraintViolationException("Data point already exists")
             raise IntegrityConstraintViolationException("Cannot add data point")
+
+        stream_hub.publish(db_data_point.data_id, [stream_event(db_data_point.id, db_data_point.data_id, db_data_point.created_at, db_data_point.value)])
         
         return db_data_point
 
 
+    def add_data_points(
+            self, 
+            data_id: int, 
+            data_points: list[data_point_schema.DataPointBase]
+            ) -> int:
+        """
+        Insert a batch of data points for a data without committing.
+
+        Several batches may be added in one transaction, finished by commit_data_points().
+        """
+        rows = [(data_id, data_point.created_at, data_point.value) for data_point in data_points]
+
+        try:
+            ids = bulk.insert_data_points(self.db.connection(), rows)
+        except IntegrityError:
+            self.db.rollback()
+            self._unpublished = []
+            self._added = 0
+            self._last_id = None
+            raise IntegrityConstraintViolationException("Cannot add data points")
+
+        if ids:
+            self._added += len(ids)
+            self._last_id = ids[-1]
+
+        # Keep the points for the stream only when someone listens to it
+        if stream_hub.has_subscribers(data_id):
+            self._unpublished += [stream_event(id, *row) for id, row in zip(ids, rows)]
+
+        return len(rows)
+
+
+    def commit_data_points(
+            self, 
+            data_id: int
+            ) -> None:
+        """
+        Commit the data points added for a data.
+        """
+        # Bulk inserts bypass the flush, so bump the series version here, with the
+        # points added for the change bus to stream them in the other workers
+        key = f"data_point:{data_id}"
+        rows = {key: (self._last_id, self._added)} if self._added else None
+        versions.bump_versions(self.db.connection(), {key}, rows)
+        self.db.commit()
+        self._added = 0
+        self._last_id = None
+
+        unpublished, self._unpublished = self._unpublished, []
+        stream_hub.publish(data_id, unpublished)
+
+
     def get_data_points(
             self, 
             context: PaginationContext, 
@@ -55,13 +116,118 @@ class DataPointRepository:
         query = self.db.query(models.DataPoint).filter(models.DataPoint.data_id == data_id)
 
         if context.search:
-            query = query.filter(models.DataPoint.value.contains(context.search))
+            query = query.filter(search.json_contains(models.DataPoint.value, context.search))
 
         results = paginate_query(query, context.limit, context.offset)
 
         return results
 
 
+    def get_data_point_rows(
+            self, 
+            context: PaginationContext, 
+            data_id: int
+            ) -> dict:
+        """
+        Get a page of data points for a data as plain dictionaries, oldest first.
+        """
+        statement = (
+            select(models.DataPoint.id, models.DataPoint.data_id, models.DataPoint.created_at, models.DataPoint.value)
+            .where(models.DataPoint.data_id == data_id)
+            .order_by(models.DataPoint.created_at, models.DataPoint.id)
+        )
+
+        if context.search:
+            statement = statement.where(search.json_contains(models.DataPoint.value, context.search))
+
+        return paginate_rows(self.db, statement, context.limit, context.offset)
+
+
+    def get_data_point_buckets(
+            self, 
+            data_id: int, 
+            bucket_seconds: int, 
+            start: datetime.datetime | None, 
+            end: datetime.datetime | None, 
+            limit: int, 
+            numeric: bool
+            ) -> list[dict]:
+        """
+        Count the data points of a data per time bucket, oldest first, with the min, max and average of numeric values.
+
+        Buckets are aligned on the epoch and computed by the database, see models.epoch_bucket.
+        """
+        # A literal width, so the bucket expression is the same text in SELECT and GROUP BY
+        bucket = models.epoch_bucket(models.DataPoint.created_at, literal_column(str(int(bucket_seconds)))).label("bucket")
+        columns = [bucket, func.count().label("count")]
+        if numeric:
+            value = models.json_number(models.DataPoint.value)
+            columns += [func.min(value).label("min"), func.max(value).label("max"), func.avg(value).label("avg")]
+
+        statement = select(*columns).where(models.DataPoint.data_id == data_id)
+        if start is not None:
+            statement = statement.where(models.DataPoint.created_at >= bulk.naive_utc(start))
+        if end is not None:
+            statement = statement.where(models.DataPoint.created_at < bulk.naive_utc(end))
+        statement = statement.group_by(bucket).order_by(bucket).limit(limit)
+
+        buckets = []
+        for row in self.db.execute(statement).mappings():
+            item = {"start": datetime.datetime.fromtimestamp(row["bucket"], datetime.timezone.utc).replace(tzinfo=None), "count": row["count"]}
+            # SQLite returns the min and max of integer values as integers
+            for name in ("min", "max", "avg"):
+                item[name] = float(row[name]) if numeric and row[name] is not None else None
+            buckets.append(item)
+        return buckets
+
+
+    def get_recent_data_points(
+            self, 
+            data_id: int, 
+            last_id: int | None, 
+            count: int
+            ) -> list[dict]:
+        """
+        Get the last data points added to a data, up to the one with last_id, as stream events, oldest first.
+        """
+        statement = (
+            select(models.DataPoint.id, models.DataPoint.data_id, models.DataPoint.created_at, models.DataPoint.value)
+            .where(models.DataPoint.data_id == data_id)
+            .order_by(models.DataPoint.id.desc())
+            .limit(count)
+        )
+        if last_id is not None:
+            statement = statement.where(models.DataPoint.id <= last_id)
+
+        return [stream_event(*row) for row in reversed(self.db.execute(statement).all())]
+
+
+    def get_latest_data_points(
+            self, 
+            data_ids: list[int]
+            ) -> dict[int, models.DataPoint]:
+        """
+        Get the latest data point of each data, keyed by data id.
+        """
+        if not data_ids:
+            return {}
+
+        # One index probe per data on (data_id, created_at), all in a single query
+        latest_id = (
+            select(models.DataPoint.id)
+            .where(models.DataPoint.data_id == models.Data.id)
+            .order_by(models.DataPoint.created_at.desc(), models.DataPoint.id.desc())
+            .limit(1)
+            .correlate(models.Data)
+            .scalar_subquery()
+        )
+        latest_ids = select(latest_id).where(models.Data.id.in_(data_ids))
+
+        data_points = self.db.query(models.DataPoint).filter(models.DataPoint.id.in_(latest_ids)).all()
+
+        return {data_point.data_id: data_point for data_point in data_points}
+
+
     def get_data_point_by_id(
             self, 
             data_point_id: int
@@ -89,5 +255,19 @@ class DataPointRepository:
         return True
 
 
+def stream_event(
+        id: int,
+        data_id: int,
+        created_at: datetime.datetime,
+        value
+        ) -> dict:
+    """
+    A new data point as published to its stream, with its time in naive UTC as stored.
+
+    Ids grow with each insert, so clients can skip points they already received.
+    """
+    return {"id": id, "data_id": data_id, "created_at": bulk.naive_utc(created_at), "value": value}
+
+
 def get_data_point_repo(db: Session = Depends(get_db)) -> DataPointRepository:
     return DataPointRepository(db)
@@ -1,14 +1,24 @@
 from fastapi import Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import false, select
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy.exc import IntegrityError
 
 from app.api.schemas import data_schema
 from app.api.schemas.pagination_schema import PaginatedResponse
 from app.core.services.exceptions import IntegrityConstraintViolationException
-from app.persistence import models
+from app.persistence import models, search
+from app.persistence.meta_catalog import meta_catalog
 from app.persistence.database import get_db
 from app.utils.pagination import PaginationContext, paginate_query
 
+
+# Relationships which can be included with datas, each loaded with one batched query
+DATA_RELATIONSHIPS = {
+    "metas": models.Data.data_metas,
+    "created_by_user": models.Data.created_by_user,
+}
+
+
 class DataRepository:
     """
     Data repository.
@@ -49,27 +59,57 @@ class DataRepository:
         return db_data
     
 
-    def get_datas(self, context: PaginationContext) -> PaginatedResponse[data_schema.DataResponse]:
+    def get_datas(
+            self, 
+            context: PaginationContext,
+            meta_filters: dict[str, str] | None = None,
+            include: set[str] = frozenset()
+            ) -> PaginatedResponse[data_schema.DataResponse]:
         """
-        Get datas.
+        Get datas, optionally filtered by meta values and with related rows loaded.
         """
         query = self.db.query(models.Data)
 
         if context.search:
-            query = query.filter(models.Data.name.contains(context.search))
+            query = search.search_datas(query, context.search, self.db.get_bind().dialect.name)
+
+        # Each filter is a semi-join served by the (meta_id, value) index on data_meta
+        for meta_name, value in (meta_filters or {}).items():
+            meta = meta_catalog.get_by_name(self.db, meta_name)
+            if not meta:
+                query = query.filter(false())
+                continue
+
+            matching_data_ids = (
+                select(models.DataMeta.data_id)
+                .where(models.DataMeta.meta_id == meta.id, models.json_text(models.DataMeta.value) == value)
+            )
+            query = query.filter(models.Data.id.in_(matching_data_ids))
+
+        query = query.options(*self._include_options(include))
 
         return paginate_query(query, context.limit, context.offset)
 
 
-    def get_data_by_id(self, data_id: int) -> data_schema.DataResponse | None:
+    def get_data_by_id(self, data_id: int, include: set[str] = frozenset()) -> data_schema.DataResponse | None:
         """
         Get a data by id.
         """
-        db_data = self.db.query(models.Data).filter(models.Data.id == data_id).first()
+        db_data = self.db.query(models.Data).options(*self._include_options(include)).filter(models.Data.id == data_id).first()
         if not db_data:
             return None
 
         return db_data
+
+
+    def get_existing_data_ids(self, data_ids: set[int]) -> set[int]:
+        """
+        Get which of the data ids exist.
+        """
+        if not data_ids:
+            return set()
+
+        return set(self.db.scalars(select(models.Data.id).where(models.Data.id.in_(data_ids))))
     
 
     def update_data_by_id(self, data_id: int, data_update: data_schema.DataUpdate) -> data_schema.DataResponse | None:
@@ -81,7 +121,8 @@ class DataRepository:
             return None
         
         try:
-            self.db.query(models.Data).filter(models.Data.id == data_id).update(data_update.model_dump())
+            for key, value in data_update.model_dump().items():
+                setattr(db_data, key, value)
             self.db.commit()
             self.db.refresh(db_data)
         except IntegrityError:
@@ -109,5 +150,12 @@ class DataRepository:
         return True
 
 
+    def _include_options(self, include: set[str]) -> list:
+        """
+        Get the loader options for the included relationships.
+        """
+        return [selectinload(relationship) for name, relationship in DATA_RELATIONSHIPS.items() if name in include]
+
+
 def get_data_repo(db: Session = Depends(get_db)) -> DataRepository:
     return DataRepository(db)
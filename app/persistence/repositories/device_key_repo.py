@@ -0,0 +1,89 @@
+import datetime
+
+from fastapi import Depends
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+
+from app.api.schemas import device_schema
+from app.api.schemas.pagination_schema import PaginatedResponse
+from app.core.services.exceptions import IntegrityConstraintViolationException
+from app.persistence import models
+from app.persistence.database import get_db
+from app.persistence.device_keys import device_key_table
+from app.utils.pagination import PaginationContext, paginate_query
+
+
+class DeviceKeyRepository:
+    """
+    Device key repository.
+    """
+
+    def __init__(
+            self, 
+            db: Session
+            ):
+        self.db = db
+
+
+    def add_device_key(
+            self, 
+            device_create: device_schema.DeviceCreate, 
+            key_id: str, 
+            digest: str, 
+            user_id: int
+            ) -> models.DeviceKey:
+        """
+        Add a device key.
+        """
+        db_device_key = models.DeviceKey(**device_create.model_dump(), key_id=key_id, digest=digest, created_by_user_id=user_id)
+
+        try:
+            self.db.add(db_device_key)
+            self.db.commit()
+            self.db.refresh(db_device_key)
+        except IntegrityError:
+            self.db.rollback()
+            raise IntegrityConstraintViolationException("Cannot add device key")
+
+        return db_device_key
+
+
+    def get_device_keys(
+            self, 
+            context: PaginationContext, 
+            user_id: int
+            ) -> PaginatedResponse[device_schema.DeviceResponse]:
+        """
+        Get the device keys created by a user.
+        """
+        query = self.db.query(models.DeviceKey).filter(models.DeviceKey.created_by_user_id == user_id).order_by(models.DeviceKey.id)
+
+        return paginate_query(query, context.limit, context.offset)
+
+
+    def revoke_device_key(
+            self, 
+            device_id: int, 
+            user_id: int
+            ) -> bool:
+        """
+        Revoke a device key created by a user.
+        """
+        db_device_key = (
+            self.db.query(models.DeviceKey)
+            .filter(models.DeviceKey.id == device_id, models.DeviceKey.created_by_user_id == user_id, models.DeviceKey.revoked_at.is_(None))
+            .first()
+        )
+        if not db_device_key:
+            return False
+
+        db_device_key.revoked_at = datetime.datetime.utcnow()
+        self.db.commit()
+
+        device_key_table.invalidate()
+
+        return True
+
+
+def get_device_key_repo(db: Session = Depends(get_db)) -> DeviceKeyRepository:
+    return DeviceKeyRepository(db)
@@ -5,7 +5,8 @@ from sqlalchemy.exc import IntegrityError
 from app.api.schemas import meta_schema
 from app.api.schemas.pagination_schema import PaginatedResponse
 from app.core.services.exceptions import IntegrityConstraintViolationException
-from app.persistence import models
+from app.persistence import models, search
+from app.persistence.meta_catalog import meta_catalog
 from app.persistence.database import get_db
 from app.utils.pagination import PaginationContext, paginate_query
 
@@ -44,6 +45,8 @@ class MetaRepository:
             else:
                 raise IntegrityConstraintViolationException(f"Cannot create meta: {ex}")
         
+        meta_catalog.refresh(self.db)
+
         return db_meta
     
 
@@ -57,7 +60,7 @@ class MetaRepository:
         query = self.db.query(models.Meta)
 
         if context.search:
-            query = query.filter(models.Meta.name.contains(context.search))
+            query = query.filter(search.contains(models.Meta.name, context.search))
 
         results = paginate_query(query, context.limit, context.offset)
 
@@ -87,13 +90,16 @@ class MetaRepository:
             return None
         
         try:
-            self.db.query(models.Meta).filter(models.Meta.id == meta_id).update(meta_update.model_dump())
+            for key, value in meta_update.model_dump().items():
+                setattr(db_meta, key, value)
             self.db.commit()
             self.db.refresh(db_meta)
         except IntegrityError:
             self.db.rollback()
             raise IntegrityConstraintViolationException("Cannot update meta")
 
+        meta_catalog.refresh(self.db)
+
         return db_meta
     
 
@@ -115,6 +121,8 @@ class MetaRepository:
             self.db.rollback()
             raise IntegrityConstraintViolationException("Cannot delete meta")
         
+        meta_catalog.refresh(self.db)
+
         return True
 
 
@@ -1,12 +1,13 @@
 from fastapi import Depends
 from pydantic import EmailStr
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
 from app.api.schemas import user_schema
 from app.api.schemas.pagination_schema import PaginatedResponse
 from app.core.services.exceptions import IntegrityConstraintViolationException
-from app.persistence import models
+from app.persistence import models, search
 from app.persistence.database import get_db
 from app.utils.pagination import PaginationContext, paginate_query
 
@@ -54,7 +55,7 @@ class UserRepository:
         query = self.db.query(models.User)
 
         if context.search:
-            query = query.filter(models.User.username.contains(context.search))
+            query = query.filter(search.contains(models.User.username, context.search))
 
         results = paginate_query(query, context.limit, context.offset)
 
@@ -80,6 +81,19 @@ class UserRepository:
         return self.db.query(models.User).filter(models.User.email == email).first()
 
 
+    def update_password(
+            self, 
+            user_id: int, 
+            hashed_password: str
+            ) -> None:
+        """
+        Replace the stored password hash of a user.
+        """
+        # A Core update, since a rehash changes nothing visible and should not bump the user version
+        self.db.execute(update(models.User).where(models.User.id == user_id).values(password=hashed_password))
+        self.db.commit()
+
+
     def delete_user_by_id(
             self, 
             user_id: int
@@ -0,0 +1,82 @@
+import re
+
+from sqlalchemy import column, desc, func, literal_column, or_, select, table
+from sqlalchemy.orm import Query
+
+from app.persistence import models
+
+
+# FTS5 table maintained by the triggers in app.persistence.models
+sqlite_data_fts = table("data_fts", column("rowid"), column("rank"), schema="hh")
+
+
+def contains(column, search: str):
+    """
+    Case insensitive substring match, served by the trigram indexes on Postgres.
+    """
+    return column.icontains(search, autoescape=True)
+
+
+def json_contains(column, search: str):
+    """
+    Case insensitive substring match against the text form of a JSON value.
+    """
+    return models.json_text(column).icontains(search, autoescape=True)
+
+
+def fts5_query(search: str) -> str:
+    """
+    Build an FTS5 query matching every word of the search as a prefix.
+    """
+    words = re.findall(r"\w+", search)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_datas(query: Query, search: str, dialect_name: str) -> Query:
+    """
+    Filter datas by a search over their name, description and string meta values, best matches first.
+    """
+    if dialect_name == "postgresql":
+        return _search_datas_postgresql(query, search)
+    elif dialect_name == "sqlite" and fts5_query(search):
+        return _search_datas_sqlite(query, search)
+
+    return query.filter(contains(models.Data.name, search))
+
+
+def _search_datas_postgresql(query: Query, search: str) -> Query:
+    ts_query = func.websearch_to_tsquery(models.TS_CONFIG, search)
+    document = models.data_search_document()
+
+    meta_matches = (
+        select(models.DataMeta.data_id)
+        .where(models.data_meta_is_string())
+        .where(models.data_meta_search_document().op("@@")(ts_query))
+    )
+
+    rank = func.ts_rank(document, ts_query) + func.similarity(models.Data.name, search)
+
+    return (
+        query
+        .filter(or_(
+            contains(models.Data.name, search),
+            document.op("@@")(ts_query),
+            models.Data.id.in_(meta_matches),
+        ))
+        .order_by(desc(rank), models.Data.id)
+    )
+
+
+def _search_datas_sqlite(query: Query, search: str) -> Query:
+    matches = (
+        select(sqlite_data_fts.c.rowid, sqlite_data_fts.c.rank)
+        .where(literal_column(sqlite_data_fts.name).op("MATCH")(fts5_query(search)))
+        .subquery()
+    )
+
+    # FTS5 ranks are negative bm25 scores, so lower is better
+    return (
+        query
+        .join(matches, matches.c.rowid == models.Data.id)
+        .order_by(matches.c.rank, models.Data.id)
+    )
@@ -0,0 +1,60 @@
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.pool import StaticPool
+
+
+# The tables live in the `hh` schema, so the database file is attached as `hh`
+# to a connection whose own main database is empty and in memory. Pragmas apply
+# to the attached file:
+# - WAL lets readers run alongside the single writer, and with synchronous=NORMAL
+#   a commit only appends to the WAL instead of syncing the database file, which
+#   is what makes frequent small commits affordable on SD cards.
+# - mmap serves reads from the page cache without copying, and cache_size keeps
+#   hot pages (the data_point index) in memory.
+
+
+def sqlite_pragmas(cache_size_kb: int, mmap_size: int) -> list[str]:
+    """
+    Pragmas run on every new connection, after attaching the database.
+    """
+    return [
+        "PRAGMA hh.journal_mode=WAL",
+        "PRAGMA hh.synchronous=NORMAL",
+        f"PRAGMA hh.cache_size={-int(cache_size_kb)}",
+        f"PRAGMA hh.mmap_size={int(mmap_size)}",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA foreign_keys=ON",
+    ]
+
+
+def configure_sqlite_engine(
+        engine: Engine,
+        path: str,
+        cache_size_kb: int = 65536,
+        mmap_size: int = 256 * 1024 * 1024,
+        busy_timeout_ms: int = 5000
+        ) -> None:
+    """
+    Attach the database file as the `hh` schema and tune every connection of an engine.
+    """
+    pragmas = [f"PRAGMA busy_timeout={int(busy_timeout_ms)}", *sqlite_pragmas(cache_size_kb, mmap_size)]
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("ATTACH DATABASE ? AS hh", (path,))
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def memory_engine() -> Engine:
+    """
+    Engine of a throwaway in-memory database with the `hh` schema, for tests and benchmarks.
+
+    All sessions and threads share its single connection, so they see the same database.
+    """
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    configure_sqlite_engine(engine, ":memory:", cache_size_kb=2048, mmap_size=0)
+    return engine
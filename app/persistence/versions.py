@@ -0,0 +1,134 @@
+import datetime
+from dataclasses import dataclass
+
+from sqlalchemy import Connection, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.persistence import models
+
+
+# Version counters are kept per table and per series, e.g. "meta", "data:3" or
+# "data_point:3". They are bumped in the same transaction as the write, so a
+# reader never sees new rows with an old version. ORM writes are picked up by
+# bump_versions_after_flush; Core bulk writes must call bump_versions themselves.
+#
+# There is deliberately no table wide "data_point" key: every ingest would
+# update the same row and serialize all concurrent ingest transactions on it.
+
+change_version = models.ChangeVersion.__table__
+
+# Connection.info entry collecting the changes of the current transaction, set
+# while changes are tracked for the change bus, see app.persistence.changes
+PENDING_CHANGES = "hh_pending_changes"
+
+
+@dataclass(frozen=True)
+class Change:
+    """
+    A committed bump of a version key, with the rows written when they are known.
+    """
+    key: str
+    version: int
+    id: int | None = None # Highest id of the rows written
+    count: int = 0 # Number of rows written
+
+    @property
+    def table(self) -> str:
+        return self.key.partition(":")[0]
+
+    @property
+    def data_id(self) -> int | None:
+        _, _, data_id = self.key.partition(":")
+        return int(data_id) if data_id else None
+
+    def merge(self, other: "Change") -> "Change":
+        """
+        Combine with a later change of the same key.
+        """
+        ids = [id for id in (self.id, other.id) if id is not None]
+        return Change(self.key, max(self.version, other.version), max(ids) if ids else None, self.count + other.count)
+
+
+def merge_changes(changes: dict[str, Change], new: list[Change]) -> None:
+    """
+    Merge changes into a dict of changes by key, in place.
+    """
+    for change in new:
+        previous = changes.get(change.key)
+        changes[change.key] = change if previous is None else previous.merge(change)
+
+
+def keys_for(obj) -> set[str]:
+    """
+    Get the version keys affected by writing a model instance.
+    """
+    if isinstance(obj, models.DataPoint):
+        return {f"data_point:{obj.data_id}"}
+    elif isinstance(obj, models.DataMeta):
+        return {"data_meta", f"data_meta:{obj.data_id}"}
+    elif isinstance(obj, models.Data):
+        return {"data", f"data:{obj.id}"}
+    elif isinstance(obj, (models.Meta, models.User, models.DeviceKey)):
+        return {obj.__tablename__}
+    return set()
+
+
+def bump_versions(
+        connection: Connection, 
+        keys: set[str], 
+        rows: dict[str, tuple[int | None, int]] | None = None
+        ) -> dict[str, int]:
+    """
+    Increment the version of each key, creating missing keys. Returns the new versions.
+
+    rows optionally gives the highest id and number of the rows written per key,
+    passed on to the change bus along with the versions.
+    """
+    if not keys:
+        return {}
+
+    dialect = postgresql if connection.dialect.name == "postgresql" else sqlite
+    now = datetime.datetime.utcnow()
+
+    # Sorted so that concurrent transactions lock the rows in the same order
+    statement = dialect.insert(change_version).values([{"key": key, "version": 1, "updated_at": now} for key in sorted(keys)])
+    statement = statement.on_conflict_do_update(
+        index_elements=[change_version.c.key],
+        set_={"version": change_version.c.version + 1, "updated_at": statement.excluded.updated_at}
+        )
+    new_versions = dict(connection.execute(statement.returning(change_version.c.key, change_version.c.version)).all())
+
+    pending = connection.info.get(PENDING_CHANGES)
+    if pending is not None:
+        rows = rows or {}
+        merge_changes(pending, [Change(key, version, *rows.get(key, (None, 0))) for key, version in new_versions.items()])
+
+    return new_versions
+
+
+def bump_versions_after_flush(session: Session, flush_context) -> None:
+    """
+    Session event bumping the versions of everything written by a flush.
+    """
+    keys = set()
+    rows = {}
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        keys.update(keys_for(obj))
+        if isinstance(obj, models.DataPoint) and obj in session.new:
+            key = f"data_point:{obj.data_id}"
+            last_id, count = rows.get(key, (None, 0))
+            rows[key] = (max(last_id or 0, obj.id), count + 1)
+
+    bump_versions(session.connection(), keys, rows)
+
+
+def get_versions(db: Session, keys: list[str]) -> dict[str, tuple[int, datetime.datetime]]:
+    """
+    Get the version and last update time of each key. Keys never written are missing.
+    """
+    rows = db.execute(
+        select(change_version.c.key, change_version.c.version, change_version.c.updated_at)
+        .where(change_version.c.key.in_(keys))
+        )
+    return {key: (version, updated_at) for key, version, updated_at in rows}
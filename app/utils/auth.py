@@ -1,14 +1,78 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
-from jose import jwt, JWTError
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
+from sqlalchemy.orm import Session
 
 from app.config.app_config import settings
+from app.persistence.database import get_db
+from app.persistence.device_keys import device_key_table
+from app.utils.token_cache import TokenCache
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
+api_key_scheme = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+# Claims of verified tokens, so each signature is checked once rather than on every request
+token_cache = TokenCache(maxsize=settings.TOKEN_CACHE_SIZE)
+
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Who a request acts for: a user, either directly or through one of their device keys.
+    """
+    user_id: int
+    device_key_id: int | None = None
+
+
+@functools.cache
+def get_pwd_context():
+    """
+    Get the password hashing context, importing passlib on first use.
+
+    Hashes made with other rounds still verify, and are reported by verify_and_update for rehashing.
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+
+# bcrypt releases the GIL, so a small dedicated thread pool runs password work in
+# parallel while bounding how many request threads and CPU cores it can hold.
+_password_executor: ThreadPoolExecutor | None = None
+_password_executor_lock = threading.Lock()
+
+
+def _get_password_executor() -> ThreadPoolExecutor:
+    global _password_executor
+    if _password_executor is None:
+        with _password_executor_lock:
+            if _password_executor is None:
+                _password_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+    return _password_executor
+
+
+def _reset_password_executor() -> None:
+    # The pool's threads do not survive a fork; the child creates its own on first use
+    global _password_executor, _password_executor_lock
+    _password_executor = None
+    _password_executor_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_password_executor)
 
 
 def hash_password(
@@ -17,7 +81,7 @@ def hash_password(
     """
     Hash a password.
     """
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def verify_password(
@@ -27,7 +91,30 @@ def verify_password(
     """
     Verify a password.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+
+async def hash_password_async(
+        password: str
+        ) -> str:
+    """
+    Hash a password in the password thread pool.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_password_executor(), get_pwd_context().hash, password)
+
+
+async def verify_and_update_password_async(
+        plain_password: str, 
+        hashed_password: str
+        ) -> tuple[bool, str | None]:
+    """
+    Verify a password in the password thread pool.
+
+    Returns whether it matched, and a new hash when the stored one uses outdated parameters.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_password_executor(), get_pwd_context().verify_and_update, plain_password, hashed_password)
 
 
 def create_access_token(
@@ -37,6 +124,8 @@ def create_access_token(
     """
     Create an access token.
     """
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -53,7 +142,16 @@ def verify_access_token(
         ):
     """
     Verify an access token.
+
+    Verified tokens are cached until they expire; the cache is dropped when the signing key changes.
     """
+    token_cache.use_key((settings.ALGORITHM, settings.SECRET_KEY))
+    token_data = token_cache.get(token)
+    if token_data is not None:
+        return token_data
+
+    from jose import jwt, JWTError
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         id: str = payload.get("user_id")
@@ -63,6 +161,8 @@ def verify_access_token(
     except JWTError:
         raise credentials_exception
 
+    token_cache.put(token, payload.get("exp"), token_data)
+
     return token_data
 
 
@@ -72,11 +172,33 @@ def get_current_user_id(
     """
     Get the current user.
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
     token_data = verify_access_token(token, credentials_exception)
 
     return token_data["id"]
+
+
+def device_key_pepper() -> bytes:
+    """
+    Key for the HMAC digests of device API keys.
+    """
+    return (settings.DEVICE_KEY_SECRET or settings.SECRET_KEY).encode()
+
+
+def get_current_principal(
+        token: str | None = Depends(optional_oauth2_scheme),
+        api_key: str | None = Depends(api_key_scheme),
+        db: Session = Depends(get_db)
+        ) -> Principal:
+    """
+    Get the current principal from a device API key in X-API-Key, or a bearer token.
+    """
+    if api_key:
+        device_key = device_key_table.authenticate(db, api_key, device_key_pepper())
+        if device_key is None:
+            raise credentials_exception
+        return Principal(user_id=device_key.created_by_user_id, device_key_id=device_key.id)
+
+    if token:
+        return Principal(user_id=verify_access_token(token, credentials_exception)["id"])
+
+    raise credentials_exception
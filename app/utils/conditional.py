@@ -0,0 +1,97 @@
+import datetime
+import email.utils
+import hashlib
+from dataclasses import dataclass
+from typing import Callable
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy.orm import Session
+
+from app.persistence import versions
+from app.persistence.database import get_db
+
+
+@dataclass
+class Validators:
+    etag: str
+    last_modified: datetime.datetime | None = None
+
+    @property
+    def headers(self) -> dict[str, str]:
+        # The ETag depends on the negotiated media type, so caches must key on Accept, 304s included
+        headers = {"ETag": self.etag, "Vary": "Accept"}
+        if self.last_modified:
+            headers["Last-Modified"] = email.utils.format_datetime(self.last_modified.replace(tzinfo=datetime.timezone.utc), usegmt=True)
+        return headers
+
+
+def make_validators(
+        request: Request, 
+        keys: list[str], 
+        key_versions: dict[str, tuple[int, datetime.datetime]]
+        ) -> Validators:
+    """
+    Build a strong ETag and Last-Modified for a request from the versions of the keys it depends on.
+    """
+    state = ",".join(f"{key}={key_versions.get(key, (0, None))[0]}" for key in keys)
+    representation = f"{request.url.path}?{request.url.query}|{request.headers.get('accept', '')}|{state}"
+    etag = '"' + hashlib.sha256(representation.encode("utf-8")).hexdigest()[:32] + '"'
+
+    updates = [updated_at for _, updated_at in key_versions.values()]
+    return Validators(etag=etag, last_modified=max(updates) if updates else None)
+
+
+def is_not_modified(request: Request, validators: Validators) -> bool:
+    """
+    Check If-None-Match, or If-Modified-Since when there is no If-None-Match.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        etags = {etag.strip().removeprefix("W/") for etag in if_none_match.split(",")}
+        return validators.etag in etags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and validators.last_modified:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        last_modified = validators.last_modified.replace(tzinfo=datetime.timezone.utc, microsecond=0)
+        return last_modified <= since
+
+    return False
+
+
+def conditional(
+        *key_templates: str, 
+        unless: Callable[[Request], bool] | None = None
+        ):
+    """
+    Dependency answering conditional GETs with 304 Not Modified before any row is loaded.
+
+    Key templates are formatted with the path parameters, e.g. "data_point:{data_id}".
+    Requests for which unless returns True are served without validators.
+    """
+    def dependency(
+            request: Request, 
+            response: Response, 
+            db: Session = Depends(get_db)
+            ) -> Validators | None:
+        if unless and unless(request):
+            return None
+
+        keys = [template.format(**request.path_params) for template in key_templates]
+        validators = make_validators(request, keys, versions.get_versions(db, keys))
+
+        if is_not_modified(request, validators):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators.headers)
+
+        # Endpoints returning a Response themselves must pass validators.headers on
+        response.headers.update(validators.headers)
+        return validators
+
+    return dependency
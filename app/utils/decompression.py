@@ -0,0 +1,129 @@
+import importlib.util
+import zlib
+from typing import Iterator
+
+
+# zstd is only offered when the optional zstandard package is installed
+SUPPORTED_ENCODINGS = ("gzip", "zstd") if importlib.util.find_spec("zstandard") else ("gzip",)
+
+# Largest piece produced at once, so a small compressed chunk can never expand
+# into a large allocation before the size limit is checked
+OUTPUT_CHUNK_SIZE = 64 * 1024
+
+# zstd input is decompressed in slices of this size: its decompressor has no output
+# limit, and a few bytes may expand to a 128 KiB block, so a slice yields at most 8 MiB
+ZSTD_INPUT_SLICE = 256
+
+
+class DecompressedSizeExceededException(Exception):
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"Decompressed body exceeds {max_size} bytes")
+
+
+class InvalidCompressedDataException(Exception):
+    def __init__(self, encoding: str, message: str):
+        self.encoding = encoding
+        super().__init__(f"Invalid {encoding} data: {message}")
+
+
+class UnsupportedEncodingException(Exception):
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        super().__init__(f"Unsupported content encoding '{encoding}'")
+
+
+class BoundedDecompressor:
+    """
+    Incremental decompressor which fails as soon as its output passes a size limit.
+
+    Feed compressed chunks to decompress() and finish with flush(); both return
+    pieces of at most OUTPUT_CHUNK_SIZE bytes.
+    """
+
+    def __init__(self, encoding: str, max_size: int):
+        self.encoding = encoding.strip().lower()
+        self.max_size = max_size
+        self.size = 0
+
+        if self.encoding == "gzip":
+            self._zlib = zlib.decompressobj(wbits=zlib.MAX_WBITS | 32)
+        elif self.encoding == "zstd" and "zstd" in SUPPORTED_ENCODINGS:
+            import zstandard
+
+            self._zstd_error = zstandard.ZstdError
+            self._zstd_decompressor = zstandard.ZstdDecompressor()
+            self._zstd = self._zstd_decompressor.decompressobj()
+        elif self.encoding != "identity":
+            raise UnsupportedEncodingException(self.encoding)
+
+
+    def decompress(self, data: bytes) -> list[bytes]:
+        """
+        Decompress the next chunk of input.
+        """
+        if self.encoding == "gzip":
+            try:
+                return list(self._decompress_gzip(data))
+            except zlib.error as e:
+                raise InvalidCompressedDataException(self.encoding, str(e))
+        elif self.encoding == "zstd":
+            try:
+                return list(self._decompress_zstd(data))
+            except self._zstd_error as e:
+                raise InvalidCompressedDataException(self.encoding, str(e))
+
+        self._count(len(data))
+        return [data] if data else []
+
+
+    def flush(self) -> list[bytes]:
+        """
+        Finish the input, failing if it was truncated.
+        """
+        if self.encoding == "gzip":
+            pieces = self.decompress(b"")
+            if not self._zlib.eof:
+                raise InvalidCompressedDataException(self.encoding, "unexpected end of data")
+            return pieces
+        elif self.encoding == "zstd":
+            if not self._zstd.eof:
+                raise InvalidCompressedDataException(self.encoding, "unexpected end of data")
+        return []
+
+
+    def _decompress_gzip(self, data: bytes) -> Iterator[bytes]:
+        while True:
+            piece = self._zlib.decompress(data, OUTPUT_CHUNK_SIZE)
+            self._count(len(piece))
+            if piece:
+                yield piece
+
+            data = self._zlib.unconsumed_tail
+            if self._zlib.eof and self._zlib.unused_data:
+                # Concatenated gzip members
+                data = self._zlib.unused_data
+                self._zlib = zlib.decompressobj(wbits=zlib.MAX_WBITS | 32)
+            elif not data and len(piece) < OUTPUT_CHUNK_SIZE:
+                return
+
+
+    def _decompress_zstd(self, data: bytes) -> Iterator[bytes]:
+        for start in range(0, len(data), ZSTD_INPUT_SLICE):
+            data_slice = data[start:start + ZSTD_INPUT_SLICE]
+            while data_slice:
+                if self._zstd.eof:
+                    # Concatenated zstd frames
+                    self._zstd = self._zstd_decompressor.decompressobj()
+                output = self._zstd.decompress(data_slice)
+                self._count(len(output))
+                for i in range(0, len(output), OUTPUT_CHUNK_SIZE):
+                    yield output[i:i + OUTPUT_CHUNK_SIZE]
+                data_slice = self._zstd.unused_data if self._zstd.eof else b""
+
+
+    def _count(self, size: int) -> None:
+        self.size += size
+        if self.size > self.max_size:
+            raise DecompressedSizeExceededException(self.max_size)
+
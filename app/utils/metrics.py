@@ -0,0 +1,231 @@
+import collections
+import contextvars
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import Engine, event
+from sqlalchemy.pool import QueuePool
+
+
+# Prometheus metrics of the API. With several workers, set PROMETHEUS_MULTIPROC_DIR
+# before the workers start (main() does this) so that /metrics aggregates all of
+# them. The hot path cost is a few perf_counter() calls and dict lookups per
+# request and per statement; labelled children are cached instead of being looked
+# up through labels() every time.
+
+REQUESTS = Counter("hh_http_requests_total", "HTTP requests", ["method", "route", "status"])
+REQUEST_SECONDS = Histogram("hh_http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"])
+IN_FLIGHT = Gauge("hh_http_requests_in_flight", "HTTP requests being served", multiprocess_mode="livesum")
+
+DB_STATEMENTS = Counter("hh_db_statements_total", "Database statements executed")
+DB_STATEMENT_SECONDS = Counter("hh_db_statement_seconds_total", "Time spent executing database statements")
+REQUEST_DB_STATEMENTS = Histogram(
+    "hh_http_request_db_statements", "Database statements per HTTP request", ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200),
+    )
+REQUEST_DB_SECONDS = Histogram("hh_http_request_db_seconds", "Database time per HTTP request", ["route"])
+
+POOL_CHECKOUT_SECONDS = Histogram(
+    "hh_db_pool_checkout_seconds", "Time waiting for a pooled database connection",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+    )
+
+# Not labelled by data, which would make one series per data, growing with the data and multiplied by the workers
+INGEST_ROWS = Counter("hh_ingest_rows_total", "Data points stored")
+
+WRITE_ADMISSIONS = Counter(
+    "hh_write_admissions_total", "Write requests by rate limit policy and outcome: admitted, rate_limited or overloaded", ["policy", "outcome"],
+    )
+SINGLE_FLIGHT_REQUESTS = Counter(
+    "hh_single_flight_requests_total", "Coalesced GET requests by route and outcome: computed, shared or failed", ["route", "outcome"],
+    )
+MQTT_MESSAGES = Counter(
+    "hh_mqtt_messages_total", "MQTT messages by outcome: written, failed, dropped as the queue was full, invalid or unrouted", ["outcome"],
+    )
+TOKEN_CACHE_HITS = Counter("hh_token_cache_hits_total", "Bearer tokens found in the verified token cache")
+TOKEN_CACHE_MISSES = Counter("hh_token_cache_misses_total", "Bearer tokens verified for lack of a cached entry")
+TOKEN_CACHE_EVICTIONS = Counter("hh_token_cache_evictions_total", "Verified tokens evicted from the full token cache")
+WRITES_IN_FLIGHT = Gauge("hh_writes_in_flight", "Write requests holding a concurrency slot", multiprocess_mode="livesum")
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+@dataclass
+class StatementStats:
+    count: int = 0
+    seconds: float = 0.0
+    statements: collections.Counter = field(default_factory=collections.Counter) # Executions of each statement
+
+
+# Statements of the current request. The stats object is shared with the threads
+# the request runs sync code in, which copy the context.
+request_statements: contextvars.ContextVar[StatementStats | None] = contextvars.ContextVar("request_statements", default=None)
+
+
+def _labelled(cache: dict, metric, *labels):
+    child = cache.get(labels)
+    if child is None:
+        child = cache[labels] = metric.labels(*labels)
+    return child
+
+
+_request_children = {}
+_latency_children = {}
+_db_statement_children = {}
+_db_seconds_children = {}
+_admission_children = {}
+_single_flight_children = {}
+_mqtt_children = {}
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request counts, latency, in-flight requests and database use per route template.
+
+    on_request is then called with the statement stats, method and route template of each request.
+    """
+
+    def __init__(self, app, on_request: Callable[[StatementStats, str, str], None] | None = None):
+        self.app = app
+        self.on_request = on_request
+
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        stats = StatementStats()
+        token = request_statements.set(stats)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            request_statements.reset(token)
+
+            route = scope.get("route")
+            route = getattr(route, "path", None) or UNMATCHED_ROUTE
+            method = scope["method"]
+            status_label = str(status)
+            _labelled(_request_children, REQUESTS, method, route, status_label).inc()
+            _labelled(_latency_children, REQUEST_SECONDS, method, route, status_label).observe(elapsed)
+            _labelled(_db_statement_children, REQUEST_DB_STATEMENTS, route).observe(stats.count)
+            _labelled(_db_seconds_children, REQUEST_DB_SECONDS, route).observe(stats.seconds)
+            if self.on_request is not None:
+                self.on_request(stats, method, route)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("hh_statement_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> float:
+    elapsed = time.perf_counter() - conn.info["hh_statement_start"].pop()
+    DB_STATEMENTS.inc()
+    DB_STATEMENT_SECONDS.inc(elapsed)
+
+    stats = request_statements.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+        stats.statements[statement] += 1
+    return elapsed
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    starts = exception_context.connection.info.get("hh_statement_start") if exception_context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(
+        engine: Engine,
+        slow_seconds: float = 0,
+        on_slow_statement: Callable | None = None
+        ) -> None:
+    """
+    Count and time the statements an engine executes.
+
+    Statements taking slow_seconds or more are handed to on_slow_statement(conn, statement, parameters, executemany, elapsed).
+    """
+    after_cursor_execute = _after_cursor_execute
+    if slow_seconds > 0 and on_slow_statement is not None:
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = _after_cursor_execute(conn, cursor, statement, parameters, context, executemany)
+            if elapsed >= slow_seconds:
+                on_slow_statement(conn, statement, parameters, executemany, elapsed)
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool recording how long each checkout waits for a connection.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start)
+
+
+def record_ingest(rows: int) -> None:
+    """
+    Count data points stored.
+    """
+    INGEST_ROWS.inc(rows)
+
+
+def record_admission(policy: str, outcome: str) -> None:
+    _labelled(_admission_children, WRITE_ADMISSIONS, policy, outcome).inc()
+
+
+def record_single_flight(route: str, outcome: str) -> None:
+    _labelled(_single_flight_children, SINGLE_FLIGHT_REQUESTS, route, outcome).inc()
+
+
+def record_mqtt(outcome: str, messages: int = 1) -> None:
+    _labelled(_mqtt_children, MQTT_MESSAGES, outcome).inc(messages)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Render the metrics of this process, or of all workers in multiprocess mode.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """
+    Drop the live gauges of this worker in multiprocess mode, as it stops.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(os.getpid())
@@ -1,4 +1,5 @@
-from sqlalchemy.orm import Query
+from sqlalchemy import Select, func, select
+from sqlalchemy.orm import Query, Session
 from dataclasses import dataclass
 
 from app.api.schemas.pagination_schema import PaginatedResponse
@@ -20,3 +21,21 @@ def paginate_query(query: Query, limit: int, offset: int):
         offset=offset, 
         items=results
         )
+
+
+def paginate_rows(db: Session, statement: Select, limit: int, offset: int) -> dict:
+    """
+    Paginate a Core select, returning the page as plain dictionaries.
+
+    This is the fast path for large pages: rows are built straight from the
+    result tuples, with no ORM instances and no response_model validation.
+    """
+    total = db.execute(select(func.count()).select_from(statement.order_by(None).subquery())).scalar_one()
+    result = db.execute(statement.offset(offset).limit(limit))
+    keys = tuple(result.keys())
+    return {
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "items": [dict(zip(keys, row)) for row in result],
+        }
@@ -0,0 +1,179 @@
+import asyncio
+import contextvars
+import cProfile
+import functools
+import os
+import pstats
+import random
+import re
+import secrets
+import threading
+import time
+
+from fastapi.routing import APIRoute
+
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+# Names of saved profiles, checked before serving one
+PROFILE_NAME = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{16}\.prof$")
+
+
+class RequestProfile:
+    """
+    cProfile profiles of one request: one for the event loop, and before Python 3.12 one per threadpool call.
+    """
+
+    def __init__(self):
+        self.profiles = []
+        self.lock = threading.Lock()
+
+
+    def add(self, profile: cProfile.Profile) -> None:
+        with self.lock:
+            self.profiles.append(profile)
+
+
+    def dump(self, path: str) -> None:
+        """
+        Merge the profiles and save them as a pstats file.
+        """
+        with self.lock:
+            stats = pstats.Stats(*self.profiles)
+        stats.dump_stats(path)
+
+
+# Profile of the current request, seen by its threadpool calls through the copied context
+current_profile: contextvars.ContextVar[RequestProfile | None] = contextvars.ContextVar("current_profile", default=None)
+
+
+def enable_profile() -> cProfile.Profile | None:
+    """
+    Start a profile, or return None when another profiler is already active.
+    """
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        return None
+    return profile
+
+
+def profile_sync(function):
+    """
+    Wrap a sync function so that its calls are profiled while the request is.
+    """
+    if getattr(function, "_profiled", False):
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        request_profile = current_profile.get()
+        if request_profile is None:
+            return function(*args, **kwargs)
+
+        # Before Python 3.12 cProfile only sees the thread it is enabled in. Since then it
+        # sees all threads, and the request's event loop profile already records this call
+        profile = enable_profile()
+        if profile is None:
+            return function(*args, **kwargs)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profile.disable()
+            request_profile.add(profile)
+
+    wrapper._profiled = True
+    return wrapper
+
+
+def instrument_sync_endpoints(routes) -> None:
+    """
+    Profile the sync endpoints among the routes of a router, which FastAPI runs in the threadpool.
+
+    Call it before the router is included, since included routes are built from the endpoints.
+    Dependencies are left alone, as wrapping them would break dependency overrides.
+    """
+    for route in routes:
+        if isinstance(route, APIRoute) and not asyncio.iscoroutinefunction(route.endpoint):
+            route.endpoint = profile_sync(route.endpoint)
+            route.dependant.call = route.endpoint
+
+
+def profile_name() -> str:
+    return f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{secrets.token_hex(8)}.prof"
+
+
+def prune_profiles(directory: str, keep: int) -> None:
+    """
+    Delete all but the newest saved profiles.
+    """
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if PROFILE_NAME.match(name)]
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:-keep] if keep > 0 else paths:
+        os.remove(path)
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling requests that carry the profiling token in the `X-Profile`
+    header, and a sampled fraction of other requests.
+
+    Profiles are saved as pstats files in a directory, named in the `X-Profile-Id` response
+    header. The event loop profile also records other requests running on the loop meanwhile,
+    so only one request is profiled at a time.
+    """
+
+    def __init__(self, app, directory: str, token: str | None = None, sample_rate: float = 0.0, keep: int = 100):
+        self.app = app
+        self.directory = directory
+        self.token = token.encode() if token else None
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self.active = False
+
+
+    def wants_profile(self, scope) -> bool:
+        if self.token is not None:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER.encode():
+                    return secrets.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.active or not self.wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        name = profile_name()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (PROFILE_ID_HEADER, name.encode())]
+            await send(message)
+
+        profile = enable_profile()
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+
+        request_profile = RequestProfile()
+        token = current_profile.set(request_profile)
+        self.active = True
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.disable()
+            self.active = False
+            current_profile.reset(token)
+
+            request_profile.add(profile)
+            await asyncio.to_thread(self.save, request_profile, name)
+
+
+    def save(self, request_profile: RequestProfile, name: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        request_profile.dump(os.path.join(self.directory, name))
+        prune_profiles(self.directory, self.keep)
@@ -0,0 +1,145 @@
+from contextlib import contextmanager
+
+from sqlalchemy import Engine, event
+
+from app.config.logging_config import get_module_logger
+from app.utils.metrics import StatementStats
+
+
+# Statements are collected by app.utils.metrics: instrument_engine hands slow ones
+# to QueryTracer.log_slow, and MetricsMiddleware hands the statements of each
+# request to QueryTracer.report.
+
+logger = get_module_logger()
+
+# Logged parameters are cut to this length
+MAX_PARAMETERS_LENGTH = 500
+
+# Plans of slow statements, per dialect. EXPLAIN ANALYZE runs the statement again,
+# so only SELECTs are explained.
+EXPLAIN_PREFIXES = {
+    "postgresql": "EXPLAIN (ANALYZE, BUFFERS) ",
+    "sqlite": "EXPLAIN QUERY PLAN ",
+}
+
+
+def _short(value) -> str:
+    text = repr(value)
+    if len(text) > MAX_PARAMETERS_LENGTH:
+        return text[:MAX_PARAMETERS_LENGTH] + "..."
+    return text
+
+
+def _redacted(parameters) -> str:
+    """
+    Describe parameters without their values, which may be password hashes or key digests.
+    """
+    if isinstance(parameters, dict):
+        return f"{sorted(parameters)} (values redacted)"
+    if isinstance(parameters, (list, tuple)):
+        return f"{len(parameters)} values (redacted)"
+    return "(redacted)"
+
+
+class QueryTracer:
+    """
+    Log slow statements, and requests executing too many statements or repeating one (N+1 queries).
+
+    Thresholds of 0 disable the corresponding check. Parameters of slow statements are
+    only logged with log_parameters.
+    """
+
+    def __init__(
+            self,
+            slow_ms: float = 0,
+            explain: bool = False,
+            statement_warn: int = 0,
+            repeat_warn: int = 0,
+            log_parameters: bool = False
+            ):
+        self.slow_seconds = slow_ms / 1000
+        self.explain = explain
+        self.statement_warn = statement_warn
+        self.repeat_warn = repeat_warn
+        self.log_parameters = log_parameters
+
+
+    def log_slow(self, conn, statement, parameters, executemany, elapsed) -> None:
+        plan = None
+        if self.explain and not executemany and statement.lstrip()[:6].upper() == "SELECT":
+            plan = self._explain(conn, statement, parameters)
+
+        logger.warning(
+            "Slow statement (%.1f ms): %s\nParameters: %s%s",
+            elapsed * 1000, statement, _short(parameters) if self.log_parameters else _redacted(parameters), f"\nPlan:\n{plan}" if plan else "",
+            )
+
+
+    def _explain(self, conn, statement, parameters) -> str | None:
+        prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+        if prefix is None:
+            return None
+
+        # A separate cursor, so the results of the traced statement are left alone. On
+        # Postgres a failed EXPLAIN, e.g. on statement_timeout, would abort the request's
+        # transaction, so it runs in a savepoint
+        savepoint = conn.dialect.name == "postgresql"
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            if savepoint:
+                cursor.execute("SAVEPOINT hh_explain")
+            try:
+                cursor.execute(prefix + statement, parameters)
+                plan = "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+            except Exception as e:
+                if savepoint:
+                    cursor.execute("ROLLBACK TO SAVEPOINT hh_explain")
+                plan = f"EXPLAIN failed: {e}"
+            if savepoint:
+                cursor.execute("RELEASE SAVEPOINT hh_explain")
+            return plan
+        except Exception as e:
+            return f"EXPLAIN failed: {e}"
+        finally:
+            cursor.close()
+
+
+    def report(self, stats: StatementStats, method: str, route: str) -> None:
+        """
+        Warn about a request that executed too many statements or repeated one.
+        """
+        if self.statement_warn and stats.count > self.statement_warn:
+            logger.warning("%s %s executed %d statements", method, route, stats.count)
+
+        if self.repeat_warn:
+            for statement, count in stats.statements.items():
+                if count > self.repeat_warn:
+                    logger.warning("%s %s executed the same statement %d times: %s", method, route, count, statement)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(engine: Engine, max_statements: int):
+    """
+    Fail when the block executes more than max_statements statements on the engine, from any thread.
+
+    Meant for tests, e.g. `with query_budget(engine, 3): repo.get_datas(...)`.
+    """
+    stats = StatementStats()
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        stats.count += 1
+        stats.statements[statement] += 1
+
+    event.listen(engine, "after_cursor_execute", count)
+    try:
+        yield stats
+    finally:
+        event.remove(engine, "after_cursor_execute", count)
+
+    if stats.count > max_statements:
+        statements = "\n".join(f"{n} x {statement}" for statement, n in stats.statements.most_common())
+        raise QueryBudgetExceeded(f"Executed {stats.count} statements, over the budget of {max_statements}:\n{statements}")
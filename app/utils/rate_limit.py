@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+
+class RateLimiter:
+    """
+    Token buckets per client, in memory: each client may make burst requests at once, refilled at rate per second.
+
+    Buckets of the least recently seen clients are evicted past maxsize; an evicted
+    client starts again with a full bucket.
+    """
+
+    def __init__(
+            self,
+            rate: float,
+            burst: float,
+            maxsize: int = 10000,
+            clock: Callable[[], float] = time.monotonic
+            ):
+        if rate <= 0 or burst < 1:
+            raise ValueError("A rate above 0 and a burst of at least 1 are required")
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self.clock = clock
+        self._buckets: OrderedDict[Hashable, tuple[float, float]] = OrderedDict() # Tokens and time of the last update
+        self._lock = threading.Lock()
+
+
+    def acquire(self, key: Hashable, cost: float = 1.0) -> float:
+        """
+        Take tokens from a client's bucket. Returns 0 when they were taken, else the seconds until there are enough.
+        """
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+            if tokens >= cost:
+                wait = 0.0
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / self.rate
+
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class ConcurrencyLimiter:
+    """
+    Count the holders of a limited number of slots, without ever waiting for one.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._lock = threading.Lock()
+
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.active >= self.limit:
+                return False
+            self.active += 1
+            return True
+
+
+    def release(self) -> None:
+        with self._lock:
+            self.active -= 1
@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Hashable
+from urllib.parse import parse_qsl, urlencode
+
+from fastapi.routing import APIRoute
+
+from app.utils.metrics import record_single_flight
+
+
+# Headers a response may depend on besides the path and query: the credentials,
+# the negotiated media type, and the validators of conditional requests
+KEY_HEADERS = (b"authorization", b"x-api-key", b"accept", b"if-none-match", b"if-modified-since")
+
+
+class SingleFlight:
+    """
+    Share the result of one computation between the concurrent callers asking for the same key.
+
+    Results are not kept once the computation is done; a later caller computes again.
+    """
+
+    def __init__(self):
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable]) -> tuple[object, bool]:
+        """
+        Compute the result for a key, or wait for the computation already running. Returns it and whether it was shared.
+
+        Errors of the computation are raised to its caller only; the callers waiting
+        for it get None.
+        """
+        future = self._in_flight.get(key)
+        if future is not None:
+            return await asyncio.shield(future), True
+
+        future = self._in_flight[key] = asyncio.get_running_loop().create_future()
+        result = None
+        try:
+            result = await compute()
+            return result, False
+        finally:
+            del self._in_flight[key]
+            future.set_result(result)
+
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+
+def request_key(scope) -> tuple:
+    """
+    Key of a GET request: its path, its query with sorted parameters, and the headers its response depends on.
+    """
+    query = urlencode(sorted(parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)))
+    headers = dict((name, value) for name, value in scope["headers"] if name in KEY_HEADERS)
+    # Credentials are only kept as a digest, not in memory as sent
+    digest = hashlib.sha256(b"\0".join(headers.get(name, b"") for name in KEY_HEADERS)).digest()
+    return scope["path"], query, digest
+
+
+class SingleFlightMiddleware:
+    """
+    Pure ASGI middleware running concurrent identical GET requests of some routes once, and sending its response to them all.
+
+    The whole request is shared, dependencies and serialization included, so it works
+    alike for sync and async endpoints. Responses with a server error status are not
+    shared; the requests waiting for them run themselves.
+    """
+
+    def __init__(self, app, routes: list[APIRoute]):
+        self.app = app
+        self.routes = [(route.path_regex, route.name.removesuffix("_endpoint")) for route in routes]
+        self.flights = SingleFlight()
+
+
+    async def __call__(self, scope, receive, send):
+        name = self.route_name(scope)
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def compute():
+            messages = []
+
+            async def send_and_record(message):
+                messages.append(message)
+                await send(message)
+
+            await self.app(scope, receive, send_and_record)
+            if messages and messages[0]["type"] == "http.response.start" and messages[0]["status"] < 500:
+                return messages
+            return None
+
+        messages, shared = await self.flights.run(request_key(scope), compute)
+        if not shared:
+            record_single_flight(name, "computed")
+            return
+        if messages is None:
+            record_single_flight(name, "failed")
+            await self.app(scope, receive, send)
+            return
+
+        record_single_flight(name, "shared")
+        for message in messages:
+            await send(message)
+
+
+    def route_name(self, scope) -> str | None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return None
+        for path_regex, name in self.routes:
+            if path_regex.match(scope["path"]):
+                return name
+        return None
+
+
+def coalesced_routes(routes, names: list[str]) -> list[APIRoute]:
+    """
+    Select the routes named, without the _endpoint suffix, among the routes of routers.
+    """
+    return [route for route in routes if isinstance(route, APIRoute) and "GET" in route.methods and route.name.removesuffix("_endpoint") in names]
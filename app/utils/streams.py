@@ -0,0 +1,168 @@
+import asyncio
+import datetime
+import json
+import threading
+from collections import deque
+from typing import Iterable
+
+
+# In-process publish/subscribe of new data points, for the /stream endpoints.
+# Repositories publish from threadpool threads once their transaction commits;
+# each subscriber owns a bounded queue on its event loop, which drops its oldest
+# events rather than holding up the publisher when a client reads too slowly.
+
+
+def _default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_event(event: dict) -> str:
+    return json.dumps(event, default=_default, ensure_ascii=False)
+
+
+class Subscription:
+    """
+    Events for a set of data ids, queued for one client. Only read it from the event loop it was created on.
+    """
+
+    def __init__(
+            self,
+            data_ids: Iterable[int],
+            maxlen: int,
+            loop: asyncio.AbstractEventLoop
+            ):
+        self.data_ids = frozenset(data_ids)
+        self.dropped = 0
+        self._events: deque[str] = deque(maxlen=maxlen)
+        self._ready = asyncio.Event()
+        self._loop = loop
+
+
+    def _push(self, events: list[str]) -> None:
+        overflow = len(self._events) + len(events) - self._events.maxlen
+        if overflow > 0:
+            self.dropped += overflow
+        self._events.extend(events)
+        self._ready.set()
+
+
+    async def get(self, timeout: float | None = None) -> list[str]:
+        """
+        Wait for events and take all of them, oldest first. Returns an empty list after the timeout.
+        """
+        if not self._events:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        events = list(self._events)
+        self._events.clear()
+        return events
+
+
+    def take_dropped(self) -> int:
+        """
+        Number of events dropped since the last call.
+        """
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+
+class StreamHub:
+    """
+    Fan published data points out to the subscriptions of their data id.
+    """
+
+    def __init__(self):
+        self._subscriptions: dict[int, set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+
+    def subscribe(
+            self,
+            data_ids: Iterable[int],
+            maxlen: int = 1000
+            ) -> Subscription:
+        """
+        Subscribe to data ids from the running event loop.
+        """
+        subscription = Subscription(data_ids, maxlen, asyncio.get_running_loop())
+        with self._lock:
+            self._add(subscription)
+        return subscription
+
+
+    def update(
+            self,
+            subscription: Subscription,
+            data_ids: Iterable[int]
+            ) -> None:
+        """
+        Replace the data ids of a subscription.
+        """
+        with self._lock:
+            self._remove(subscription)
+            subscription.data_ids = frozenset(data_ids)
+            self._add(subscription)
+
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._remove(subscription)
+
+
+    def has_subscribers(self, data_id: int) -> bool:
+        return data_id in self._subscriptions
+
+
+    def publish(
+            self,
+            data_id: int,
+            events: Iterable[dict]
+            ) -> int:
+        """
+        Queue events for the subscribers of a data id, from any thread. Returns the number of subscribers.
+
+        Events are encoded to JSON once, whatever the number of subscribers.
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(data_id, ()))
+        if not subscriptions:
+            return 0
+
+        encoded = [encode_event(event) for event in events]
+        if not encoded:
+            return 0
+        for subscription in subscriptions:
+            try:
+                subscription._loop.call_soon_threadsafe(subscription._push, encoded)
+            except RuntimeError:
+                # The loop has been closed, along with the client's connection
+                pass
+        return len(subscriptions)
+
+
+    def stats(self) -> dict:
+        with self._lock:
+            subscriptions = set().union(*self._subscriptions.values())
+        return {"data_ids": len(self._subscriptions), "subscriptions": len(subscriptions)}
+
+
+    def _add(self, subscription: Subscription) -> None:
+        for data_id in subscription.data_ids:
+            self._subscriptions.setdefault(data_id, set()).add(subscription)
+
+
+    def _remove(self, subscription: Subscription) -> None:
+        for data_id in subscription.data_ids:
+            subscriptions = self._subscriptions.get(data_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[data_id]
+
+
+stream_hub = StreamHub()
@@ -0,0 +1,88 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from app.utils.metrics import TOKEN_CACHE_EVICTIONS, TOKEN_CACHE_HITS, TOKEN_CACHE_MISSES
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of verified token claims, keyed by a SHA-256 hash of the token.
+
+    Entries expire at the token's exp claim, so a cached token is never accepted
+    after it would have failed verification. Tokens without exp are not cached.
+    Changing the signing key with use_key() drops every entry. Hits, misses and
+    evictions are counted in the hh_token_cache_*_total metrics.
+    """
+
+    def __init__(
+            self, 
+            maxsize: int = 10000, 
+            clock: Callable[[], float] = time.time
+            ):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries: OrderedDict[bytes, tuple[float, Any]] = OrderedDict()
+        self._key_id: Hashable = None
+        self._lock = threading.Lock()
+
+
+    def get(self, token: str) -> Any | None:
+        """
+        Get the cached claims of a token, or None if it has not been verified or has expired.
+        """
+        digest = _digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[0] > self.clock():
+                self._entries.move_to_end(digest)
+                TOKEN_CACHE_HITS.inc()
+                return entry[1]
+            if entry is not None:
+                del self._entries[digest]
+            TOKEN_CACHE_MISSES.inc()
+            return None
+
+
+    def put(self, token: str, exp: float | None, claims: Any) -> None:
+        """
+        Cache the claims of a verified token until its expiry.
+        """
+        if exp is None or self.maxsize <= 0:
+            return
+
+        digest = _digest(token)
+        with self._lock:
+            self._entries[digest] = (float(exp), claims)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                TOKEN_CACHE_EVICTIONS.inc()
+
+
+    def use_key(self, key_id: Hashable) -> None:
+        """
+        Note the signing key in use, dropping every entry if it changed since the last call.
+        """
+        if key_id != self._key_id:
+            with self._lock:
+                self._entries.clear()
+                self._key_id = key_id
+
+
+    def clear(self) -> None:
+        """
+        Drop every entry.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
@@ -0,0 +1,109 @@
+"""
+Login throughput and API latency during a login storm.
+
+Fires LOGINS concurrent logins at the app, in process over ASGI, while a probe
+requests a cheap synchronous endpoint (GET /metas/) back to back. Reports login
+throughput and probe latency during the storm against an idle baseline. Probe
+latency shows whether bcrypt is starving the threadpool that sync endpoints run in.
+
+Uses an in-memory SQLite database. BCRYPT_ROUNDS and PASSWORD_HASH_WORKERS are
+read from the environment like the app's other settings.
+
+Run with: python -m benchmarks.login_storm_bench
+"""
+import asyncio
+import os
+import statistics
+import time
+
+# Settings the app requires but which are unused against SQLite
+for _name, _value in {"POSTGRES_USER": "bench", "POSTGRES_PASSWORD": "bench", "POSTGRES_DB": "bench", "SECRET_KEY": "bench", "ALGORITHM": "HS256"}.items():
+    os.environ.setdefault(_name, _value)
+
+import httpx
+from sqlalchemy.orm import sessionmaker
+
+from app.api.main import app
+from app.config.app_config import settings
+from app.persistence import models
+from app.persistence.database import get_db
+from app.persistence.sqlite import memory_engine
+from app.utils.auth import hash_password
+
+
+LOGINS = 64
+PROBE_IDLE_REQUESTS = 50
+EMAIL = "storm@example.com"
+PASSWORD = "correct horse battery staple"
+
+
+def setup_database():
+    engine = memory_engine()
+    models.BaseWithToDict.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+
+    with session_factory() as db:
+        db.add(models.User(username="storm", email=EMAIL, password=hash_password(PASSWORD)))
+        db.commit()
+
+    def get_bench_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_bench_db
+
+
+async def probe(client: httpx.AsyncClient, latencies: list[float], stop: asyncio.Event | None = None, count: int = 0):
+    while (stop is not None and not stop.is_set()) or len(latencies) < count:
+        start = time.perf_counter()
+        response = await client.get("/metas/")
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200
+
+
+async def login(client: httpx.AsyncClient):
+    response = await client.post("/auth/login", data={"username": EMAIL, "password": PASSWORD})
+    assert response.status_code == 200
+
+
+def summarize(latencies: list[float]) -> str:
+    millis = sorted(latency * 1000 for latency in latencies)
+    p95 = millis[int(len(millis) * 0.95) - 1] if len(millis) > 1 else millis[0]
+    return f"p50 {statistics.median(millis):7.1f} ms  p95 {p95:7.1f} ms  max {millis[-1]:7.1f} ms  ({len(millis)} requests)"
+
+
+async def run():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        idle = []
+        await probe(client, idle, count=PROBE_IDLE_REQUESTS)
+
+        storm = []
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, storm, stop))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(login(client) for _ in range(LOGINS)))
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        await probe_task
+
+    return idle, storm, elapsed
+
+
+def main():
+    setup_database()
+    idle, storm, elapsed = asyncio.run(run())
+
+    print(f"Login storm: {LOGINS} logins, bcrypt rounds {settings.BCRYPT_ROUNDS}, {settings.PASSWORD_HASH_WORKERS} password workers")
+    print(f"  logins                {LOGINS / elapsed:7.1f} /s  ({elapsed:.2f} s)")
+    print(f"  GET /metas/ idle      {summarize(idle)}")
+    print(f"  GET /metas/ in storm  {summarize(storm)}")
+
+
+if __name__ == "__main__":
+    main()
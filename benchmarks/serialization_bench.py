@@ -0,0 +1,89 @@
+"""
+Serialization cost per 1,000 data point rows.
+
+Compares the response_model path (ORM objects validated through
+PaginatedResponse[DataPointResponse], then encoded) with the fast path
+(dicts built from Core row tuples, encoded with orjson).
+
+Run with: python -m benchmarks.serialization_bench
+"""
+import datetime
+import json
+import timeit
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from app.api.schemas.data_point_schema import DataPointResponse
+from app.api.schemas.pagination_schema import PaginatedResponse
+from app.persistence import models
+
+
+ROWS = 1000
+REPEAT = 5
+NUMBER = 20
+
+PAGE_SCHEMA = PaginatedResponse[DataPointResponse]
+KEYS = ("id", "data_id", "created_at", "value")
+
+
+def make_rows(count: int = ROWS) -> list[tuple]:
+    start = datetime.datetime(2025, 1, 1)
+    return [(i, 1, start + datetime.timedelta(seconds=i), 20.0 + i / 100) for i in range(count)]
+
+
+def make_orm_objects(rows: list[tuple]) -> list[models.DataPoint]:
+    return [models.DataPoint(**dict(zip(KEYS, row))) for row in rows]
+
+
+def response_model_stdlib_json(objects):
+    """
+    Validate ORM objects against the response model, then jsonable_encoder and json.dumps.
+    """
+    page = PAGE_SCHEMA.model_validate({"total": len(objects), "limit": ROWS, "offset": 0, "items": objects}, from_attributes=True)
+    return json.dumps(jsonable_encoder(page)).encode("utf-8")
+
+
+def response_model_dump_json(objects):
+    """
+    Validate ORM objects against the response model, then dump JSON with pydantic-core.
+    """
+    page = PAGE_SCHEMA.model_validate({"total": len(objects), "limit": ROWS, "offset": 0, "items": objects}, from_attributes=True)
+    return page.model_dump_json().encode("utf-8")
+
+
+def core_rows_orjson(rows):
+    """
+    Build dicts straight from row tuples and encode them with orjson.
+    """
+    items = [dict(zip(KEYS, row)) for row in rows]
+    return orjson.dumps({"total": len(rows), "limit": ROWS, "offset": 0, "items": items})
+
+
+def measure(func, argument) -> float:
+    """
+    Best time in microseconds for one call.
+    """
+    return min(timeit.repeat(lambda: func(argument), repeat=REPEAT, number=NUMBER)) / NUMBER * 1e6
+
+
+def run() -> dict[str, float]:
+    rows = make_rows()
+    objects = make_orm_objects(rows)
+    return {
+        "response_model_stdlib_json": measure(response_model_stdlib_json, objects),
+        "response_model_dump_json": measure(response_model_dump_json, objects),
+        "core_rows_orjson": measure(core_rows_orjson, rows),
+    }
+
+
+def main():
+    results = run()
+    baseline = results["response_model_stdlib_json"]
+    print(f"Serialization cost per {ROWS} rows")
+    for name, micros in results.items():
+        print(f"  {name:<28} {micros:>10.0f} us  {baseline / micros:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
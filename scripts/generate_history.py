@@ -0,0 +1,323 @@
+"""
+Generate synthetic historian data for scale testing.
+
+Creates DATAS series spread over the four data types, tagged with data metas
+(room, unit, pattern and source), each with POINTS data points following a
+periodic, noisy or bursty pattern. The same seed always produces the same
+series and points, whatever the number of workers.
+
+By default the series are created in the database and their points loaded
+with COPY, by WORKERS processes in parallel; the change versions of the new
+series are bumped afterwards so that running APIs see the new data. With
+--output, nothing touches the database: each series is written to an NDJSON
+file accepted by POST /datas/{data_id}/data_points/batch, with a manifest.json
+describing the series to create first.
+
+The database is DATABASE_URL of the app settings unless --database-url is
+given; it must be migrated already.
+
+Run with: python scripts/generate_history.py --seed 1 --datas 1000 --points 100000 --workers 8
+      or: python scripts/generate_history.py --seed 1 --datas 10 --points 1000 --output history/ --gzip
+"""
+import argparse
+import datetime
+import gzip
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+DATA_TYPES = ("float", "integer", "string", "datetime")
+DATA_TYPE_WEIGHTS = (6, 2, 1, 1)
+PATTERNS = ("periodic", "noisy", "bursty")
+
+ROOMS = ("kitchen", "lounge", "bedroom", "bathroom", "garage", "garden", "office", "attic", "cellar", "hallway")
+SOURCES = ("zigbee", "mqtt", "modbus", "http")
+UNITS = {
+    "float": ("°C", "%", "kWh", "hPa", "V"),
+    "integer": ("W", "count", "lx", "ppm"),
+    "string": ("state",),
+    "datetime": ("timestamp",),
+}
+STATES = ("open", "closed", "on", "off", "idle")
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S" # Format of datetime values, see validate_data_point
+META_NAMES = ("room", "unit", "pattern", "source")
+
+SERIES_PER_TASK = 16 # Series each worker task generates or loads
+
+
+@dataclass(frozen=True)
+class Series:
+    index: int
+    name: str
+    data_type: str
+    pattern: str
+    metas: dict
+    seed: str
+
+
+def plan_series(seed: int, count: int) -> list[Series]:
+    """
+    Describe the series to generate, deterministically from the seed.
+    """
+    rng = random.Random(f"{seed}:plan")
+    series = []
+    for index in range(count):
+        data_type = rng.choices(DATA_TYPES, DATA_TYPE_WEIGHTS)[0]
+        pattern = rng.choice(PATTERNS)
+        room = rng.choice(ROOMS)
+        metas = {"room": room, "unit": rng.choice(UNITS[data_type]), "pattern": pattern, "source": rng.choice(SOURCES)}
+        series.append(Series(index, f"gen{seed}_{room}_{index:06d}", data_type, pattern, metas, f"{seed}:{index}"))
+    return series
+
+
+def generate_points(series: Series, count: int, start: datetime.datetime, interval: float):
+    """
+    Yield the (created_at, value) points of a series, oldest first.
+    """
+    rng = random.Random(series.seed)
+    period = rng.choice((3600, 86400, 7 * 86400))
+    base = rng.uniform(-10, 100)
+    amplitude = rng.uniform(1, 20)
+    noise = amplitude * rng.uniform(0.01, 0.2)
+    level = base
+    state = rng.choice(STATES)
+    burst_left = 0
+
+    seconds = 0.0
+    for _ in range(count):
+        # Timestamps
+        if series.pattern == "bursty":
+            if burst_left:
+                burst_left -= 1
+                seconds += rng.uniform(0.1, 2)
+            else:
+                seconds += rng.expovariate(1 / (interval * 20))
+                if rng.random() < 0.05:
+                    burst_left = rng.randint(10, 200)
+        elif series.pattern == "noisy":
+            seconds += interval * rng.uniform(0.5, 1.5)
+        else:
+            seconds += interval
+
+        # Values
+        if series.pattern == "periodic":
+            level = base + amplitude * math.sin(2 * math.pi * seconds / period) + rng.gauss(0, noise)
+        elif series.pattern == "noisy":
+            level += rng.gauss(0, noise)
+        else:
+            level = base + (amplitude * rng.uniform(2, 5) if burst_left else rng.gauss(0, noise))
+
+        created_at = start + datetime.timedelta(seconds=seconds)
+        if series.data_type == "float":
+            value = round(level, 3)
+        elif series.data_type == "integer":
+            value = round(level)
+        elif series.data_type == "string":
+            if rng.random() < (0.5 if burst_left else 0.05):
+                state = rng.choice(STATES)
+            value = state
+        else:
+            value = (created_at - datetime.timedelta(seconds=rng.uniform(0, period))).strftime(DATETIME_FORMAT)
+
+        yield created_at, value
+
+
+def chunks(items: list, size: int) -> list[list]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+# File output
+
+def write_series_files(tasks: list[Series], directory: str, points: int, start: datetime.datetime, interval: float, compress: bool) -> int:
+    """
+    Write one NDJSON file per series. Returns the number of points written.
+    """
+    written = 0
+    for series in tasks:
+        path = os.path.join(directory, series_file(series, compress))
+        with (gzip.open(path, "wt", compresslevel=6) if compress else open(path, "w")) as f:
+            for created_at, value in generate_points(series, points, start, interval):
+                f.write(json.dumps({"created_at": created_at.isoformat(), "value": value}))
+                f.write("\n")
+                written += 1
+    return written
+
+
+def series_file(series: Series, compress: bool) -> str:
+    return f"{series.name}.ndjson" + (".gz" if compress else "")
+
+
+def write_files(args, series: list[Series], start: datetime.datetime) -> int:
+    os.makedirs(args.output, exist_ok=True)
+
+    manifest = {
+        "seed": args.seed,
+        "points": args.points,
+        "series": [
+            {
+                "name": s.name,
+                "data_type": s.data_type,
+                "description": f"Synthetic {s.pattern} {s.data_type} series",
+                "metas": s.metas,
+                "file": series_file(s, args.gzip),
+            }
+            for s in series
+        ],
+    }
+    with open(os.path.join(args.output, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    with ProcessPoolExecutor(args.workers) as executor:
+        futures = [
+            executor.submit(write_series_files, task, args.output, args.points, start, args.interval, args.gzip)
+            for task in chunks(series, SERIES_PER_TASK)
+        ]
+        return sum(future.result() for future in futures)
+
+
+# Database loading
+
+def create_series(engine, series: list[Series], user_email: str) -> dict[str, int]:
+    """
+    Create the user, metas, datas and data metas of the series. Returns the data ids by name.
+    """
+    from sqlalchemy import event, insert, select
+    from sqlalchemy.orm import sessionmaker
+
+    from app.persistence import models, versions
+
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    event.listen(session_factory, "after_flush", versions.bump_versions_after_flush)
+
+    with session_factory() as db:
+        names = [s.name for s in series]
+        existing = db.scalars(select(models.Data.name).where(models.Data.name.in_(names)).limit(1)).first()
+        if existing:
+            raise SystemExit(f"Data {existing} already exists; use another --seed")
+
+        user = db.scalars(select(models.User).where(models.User.email == user_email)).first()
+        if user is None:
+            # Generated data is owned by a user that cannot log in
+            user = models.User(username=user_email.split("@")[0], email=user_email, password="!")
+            db.add(user)
+
+        metas = {meta.name: meta for meta in db.scalars(select(models.Meta).where(models.Meta.name.in_(META_NAMES)))}
+        for name in META_NAMES:
+            if name not in metas:
+                metas[name] = models.Meta(name=name, meta_type="string")
+                db.add(metas[name])
+        db.flush()
+
+        data_ids = {}
+        for task in chunks(series, 1000):
+            rows = [
+                {
+                    "created_by_user_id": user.id,
+                    "name": s.name,
+                    "description": f"Synthetic {s.pattern} {s.data_type} series",
+                    "data_type": s.data_type,
+                }
+                for s in task
+            ]
+            result = db.execute(insert(models.Data).returning(models.Data.id, models.Data.name), rows)
+            data_ids.update({name: id for id, name in result})
+
+            db.execute(insert(models.DataMeta), [
+                {"data_id": data_ids[s.name], "meta_id": metas[name].id, "value": value}
+                for s in task
+                for name, value in s.metas.items()
+            ])
+
+        # Bulk inserts bypass the flush, so bump the versions of the new rows here
+        versions.bump_versions(db.connection(), {"data", "data_meta", *(f"data:{id}" for id in data_ids.values())})
+        db.commit()
+
+    return data_ids
+
+
+def copy_series(conninfo: str, tasks: list[tuple[int, Series]], points: int, start: datetime.datetime, interval: float) -> int:
+    """
+    Load the points of series with COPY, in one transaction. Returns the number of points loaded.
+    """
+    import psycopg
+
+    loaded = 0
+    with psycopg.connect(conninfo) as connection:
+        with connection.cursor() as cursor:
+            with cursor.copy("COPY hh.data_point (data_id, created_at, value) FROM STDIN") as copy:
+                for data_id, series in tasks:
+                    for created_at, value in generate_points(series, points, start, interval):
+                        copy.write_row((data_id, created_at, json.dumps(value)))
+                        loaded += 1
+    return loaded
+
+
+def load_database(args, series: list[Series], start: datetime.datetime) -> int:
+    from sqlalchemy import create_engine, text
+
+    from app.persistence import versions
+
+    url = args.database_url
+    if url is None:
+        from app.persistence.database import DATABASE_URL as url
+
+    engine = create_engine(url)
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("Loading uses COPY and needs Postgres; use --output to write files instead")
+
+    data_ids = create_series(engine, series, args.user_email)
+    conninfo = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+    with ProcessPoolExecutor(args.workers) as executor:
+        futures = [
+            executor.submit(copy_series, conninfo, [(data_ids[s.name], s) for s in task], args.points, start, args.interval)
+            for task in chunks(series, SERIES_PER_TASK)
+        ]
+        loaded = sum(future.result() for future in futures)
+
+    with engine.begin() as connection:
+        versions.bump_versions(connection, {f"data_point:{id}" for id in data_ids.values()})
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("ANALYZE hh.data_point"))
+
+    engine.dispose()
+    return loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic historian data for scale testing.")
+    parser.add_argument("--seed", type=int, default=1, help="Seed; the same seed generates the same data")
+    parser.add_argument("--datas", type=int, default=1000, help="Number of series")
+    parser.add_argument("--points", type=int, default=10000, help="Data points per series")
+    parser.add_argument("--start", type=datetime.datetime.fromisoformat, default=datetime.datetime(2024, 1, 1), help="Time of the first points, ISO 8601")
+    parser.add_argument("--interval", type=float, default=60.0, help="Mean seconds between points of periodic and noisy series")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes generating and loading points")
+    parser.add_argument("--database-url", help="SQLAlchemy URL of the database to load, defaults to the app's")
+    parser.add_argument("--user-email", default="generator@example.com", help="Owner of the generated datas, created if missing")
+    parser.add_argument("--output", metavar="DIR", help="Write NDJSON files for the ingest endpoint instead of loading the database")
+    parser.add_argument("--gzip", action="store_true", help="Compress the NDJSON files")
+    args = parser.parse_args(argv)
+
+    series = plan_series(args.seed, args.datas)
+    started = time.perf_counter()
+
+    if args.output:
+        count = write_files(args, series, args.start)
+    else:
+        count = load_database(args, series, args.start)
+
+    elapsed = time.perf_counter() - started
+    print(f"Generated {len(series)} series and {count} data points in {elapsed:.1f} s ({count / elapsed:,.0f} points/s)")
+
+
+if __name__ == "__main__":
+    main()
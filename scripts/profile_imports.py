@@ -0,0 +1,88 @@
+"""
+Report the import time of the app, per module.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+lists the modules with the largest cumulative import time. With --budget-ms,
+exits with status 1 when the total passes the budget, so that startup
+regressions fail a CI step.
+
+Settings the app requires are given placeholder values when they are not set;
+importing the app does not connect to the database.
+
+Run with: python scripts/profile_imports.py [--module app.api.main] [--top 25] [--budget-ms 1000] [--json]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+
+REQUIRED_SETTINGS = {
+    "POSTGRES_USER": "profile",
+    "POSTGRES_PASSWORD": "profile",
+    "POSTGRES_DB": "profile",
+    "SECRET_KEY": "profile",
+    "ALGORITHM": "HS256",
+}
+
+LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def profile(module: str) -> list[dict]:
+    """
+    Import a module in a fresh interpreter and parse its -X importtime report.
+    """
+    env = {**REQUIRED_SETTINGS, **os.environ}
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root, env=env, capture_output=True, text=True,
+        )
+    if result.returncode != 0:
+        sys.exit(f"Importing {module} failed:\n{result.stderr}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append({
+                "module": name,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": (len(indent) - 1) // 2,
+            })
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.api.main", help="Module to import")
+    parser.add_argument("--top", type=int, default=25, help="Number of modules to list")
+    parser.add_argument("--budget-ms", type=float, help="Fail when the total import time passes this")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    entries = profile(args.module)
+    total_ms = sum(entry["self_ms"] for entry in entries)
+    top = sorted(entries, key=lambda entry: entry["cumulative_ms"], reverse=True)[:args.top]
+
+    if args.json:
+        print(json.dumps({"module": args.module, "total_ms": total_ms, "top": top}, indent=2))
+    else:
+        print(f"Import time of {args.module}: {total_ms:.0f} ms over {len(entries)} modules")
+        print(f"  {'cumulative':>10}  {'self':>8}  module")
+        for entry in top:
+            print(f"  {entry['cumulative_ms']:>8.1f}ms  {entry['self_ms']:>6.1f}ms  {'  ' * entry['depth']}{entry['module']}")
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"Import time {total_ms:.0f} ms is over the budget of {args.budget_ms:.0f} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import datetime
+
+import msgpack
+
+from app.persistence import models
+
+
+def test_aggregates_negotiated(app_client, sqlite_db):
+    sqlite_db.add(models.User(id=1, username="u", email="u@x.com", password="-"))
+    sqlite_db.add(models.Data(id=1, created_by_user_id=1, name="temperature", data_type="integer"))
+    sqlite_db.add_all([models.DataPoint(data_id=1, created_at=datetime.datetime(2026, 1, 1) + datetime.timedelta(minutes=minute), value=minute) for minute in (0, 10, 70)])
+    sqlite_db.commit()
+    url = "/datas/1/data_points/aggregate?bucket_seconds=3600"
+
+    response = app_client.get(url)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"data_id": 1, "bucket_seconds": 3600, "buckets": [
+        {"start": "2026-01-01T00:00:00", "count": 2, "min": 0.0, "max": 10.0, "avg": 5.0},
+        {"start": "2026-01-01T01:00:00", "count": 1, "min": 70.0, "max": 70.0, "avg": 70.0},
+    ]}
+
+    response = app_client.get(url, headers={"Accept": "application/msgpack"})
+    assert response.headers["content-type"] == "application/msgpack"
+    assert response.headers["Vary"] == "Accept"
+    body = msgpack.unpackb(response.content, timestamp=3)
+    assert [(bucket["start"], bucket["count"]) for bucket in body["buckets"]] == [
+        (datetime.datetime(2026, 1, 1, 0, tzinfo=datetime.timezone.utc), 2),
+        (datetime.datetime(2026, 1, 1, 1, tzinfo=datetime.timezone.utc), 1),
+    ]
+
+    assert app_client.get(url, headers={"If-None-Match": response.headers["ETag"], "Accept": "application/msgpack"}).status_code == 304
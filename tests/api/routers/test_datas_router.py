@@ -0,0 +1,42 @@
+import datetime
+
+from app.persistence import models
+from app.persistence.meta_catalog import meta_catalog
+from app.utils.query_trace import query_budget
+
+
+URL = "/datas/?include=metas,created_by_user,latest&limit=100"
+
+
+def add_datas(db, data_ids):
+    for data_id in data_ids:
+        db.add(models.Data(id=data_id, created_by_user_id=1, name=f"temp{data_id}", data_type="float"))
+        db.add(models.DataMeta(data_id=data_id, meta_id=1, value="kitchen"))
+        db.add_all([models.DataPoint(data_id=data_id, created_at=datetime.datetime(2025, 1, 1, 0, 0, i), value=i) for i in range(3)])
+    db.commit()
+
+
+def page_statements(app_client, engine, count):
+    app_client.get(URL)
+    with query_budget(engine, 100) as stats:
+        response = app_client.get(URL)
+    items = response.json()["items"]
+    assert len(items) == count
+    assert all(item["metas"] and item["created_by_user"]["username"] == "u" and item["latest"]["value"] == 2 for item in items)
+    return stats.count
+
+
+def test_list_datas_with_includes_runs_constant_statements(app_client, sqlite_tables, sqlite_db):
+    sqlite_db.add(models.User(id=1, username="u", email="u@x.com", password="-"))
+    sqlite_db.add(models.Meta(id=1, name="room", meta_type="string"))
+    sqlite_db.commit()
+    meta_catalog.clear()
+    try:
+        add_datas(sqlite_db, range(1, 11))
+        # Count, page, then one statement per include
+        statements = page_statements(app_client, sqlite_tables, 10)
+        assert statements == 5
+        add_datas(sqlite_db, range(11, 101))
+        assert page_statements(app_client, sqlite_tables, 100) == statements
+    finally:
+        meta_catalog.clear()
@@ -0,0 +1,54 @@
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.persistence import models
+from app.utils.auth import create_access_token
+
+
+@pytest.fixture
+def client(app_client, sqlite_db):
+    sqlite_db.add(models.User(id=1, username="u", email="u@x.com", password="-"))
+    sqlite_db.add(models.Data(id=1, created_by_user_id=1, name="temperature", data_type="float"))
+    sqlite_db.commit()
+    return app_client
+
+
+def auth_headers() -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'user_id': 1})}"}
+
+
+def test_websocket_streams_new_data_points(client):
+    with client.websocket_connect("/stream/?data_id=1", headers=auth_headers()) as websocket:
+        response = client.post("/datas/1/data_points/", json={"data_id": 1, "value": 21.5}, headers=auth_headers())
+        assert response.status_code == 201
+        message = websocket.receive_json()
+        assert client.post("/datas/1/data_points/batch", json=[{"value": 22}, {"value": 22.5}], headers=auth_headers()).status_code == 201
+        batch_message = websocket.receive_json()
+
+    assert message["type"] == "data_points"
+    assert [(item["id"], item["data_id"], item["value"]) for item in message["items"]] == [(response.json()["id"], 1, 21.5)]
+    stored = client.get("/datas/1/data_points/", params={"sort_order": "asc"}, headers=auth_headers()).json()
+    assert [item["id"] for item in batch_message["items"]] == [item["id"] for item in stored["items"]][1:]
+
+
+def test_websocket_rejects_unauthenticated_clients(client):
+    with pytest.raises(WebSocketDisconnect) as e, client.websocket_connect("/stream/?data_id=1"):
+        pass
+    assert e.value.code == 1008
+
+
+def test_websocket_rejects_unknown_datas(client):
+    with pytest.raises(WebSocketDisconnect) as e, client.websocket_connect("/stream/?data_id=1&data_id=2", headers=auth_headers()):
+        pass
+    assert e.value.reason == "Data not found: 2"
+
+    with client.websocket_connect("/stream/?data_id=1", headers=auth_headers()) as websocket:
+        websocket.send_json({"subscribe": [3]})
+        assert websocket.receive_json() == {"type": "error", "detail": "Data not found: 3"}
+
+
+def test_sse_checks_credentials_and_datas(client):
+    assert client.get("/stream/?data_id=1").status_code == 401
+    response = client.get("/stream/?data_id=2", headers=auth_headers())
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Data not found: 2"
@@ -0,0 +1,37 @@
+import pytest
+from fastapi.routing import APIRoute
+
+from app.api import admission
+from app.api.routers import data_metas_router, data_points_router, datas_router, devices_router, metas_router, users_router
+from app.config.app_config import settings
+from app.persistence import models
+from app.utils.auth import create_access_token
+from app.utils.rate_limit import RateLimiter
+
+
+def test_rate_limits_name_admitted_endpoints():
+    routers = (data_metas_router, data_points_router, datas_router, devices_router, metas_router, users_router)
+    names = {route.name.removesuffix("_endpoint") for module in routers for route in module.router.routes if isinstance(route, APIRoute)}
+    assert set(settings.RATE_LIMITS) - {admission.DEFAULT_POLICY} <= names
+
+
+def test_rate_limited_write_gets_retry_after(monkeypatch, app_client, sqlite_db):
+    sqlite_db.add(models.User(id=1, username="u", email="u@x.com", password="-"))
+    sqlite_db.add(models.Data(id=1, created_by_user_id=1, name="temperature", data_type="float"))
+    sqlite_db.commit()
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(admission, "rate_limiters", {"add_data_point": RateLimiter(rate=0.5, burst=1)})
+    headers = {"Authorization": f"Bearer {create_access_token({'user_id': 1})}"}
+
+    assert app_client.post("/datas/1/data_points/", json={"data_id": 1, "value": 1}, headers=headers).status_code == 201
+    response = app_client.post("/datas/1/data_points/", json={"data_id": 1, "value": 2}, headers=headers)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    # Other endpoints have no limits here
+    assert app_client.post("/datas/1/data_points/batch", json=[{"value": 3}], headers=headers).status_code == 201
+
+
+@pytest.mark.parametrize("limits", [{"default": (0, 5)}, {"add_data_point": (1, 0)}])
+def test_invalid_rate_limits_rejected(limits):
+    with pytest.raises(ValueError, match="RATE_LIMITS"):
+        settings.model_validate({**settings.model_dump(), "RATE_LIMITS": limits})
@@ -0,0 +1,21 @@
+from app.api.negotiation import media_type_of, negotiate
+
+
+def test_negotiate_default_json():
+    assert negotiate(None) == "application/json"
+    assert negotiate("*/*") == "application/json"
+    assert negotiate("text/html") == "application/json"
+
+
+def test_negotiate_msgpack():
+    assert negotiate("application/msgpack") == "application/msgpack"
+
+
+def test_negotiate_quality():
+    assert negotiate("application/json;q=0.5, application/msgpack") == "application/msgpack"
+    assert negotiate("application/msgpack;q=0, application/json") == "application/json"
+
+
+def test_media_type_of():
+    assert media_type_of("Application/MsgPack; charset=binary") == "application/msgpack"
+    assert media_type_of(None) == ""
@@ -0,0 +1,53 @@
+import json
+import logging
+import queue
+import sys
+
+from app.config.logging_config import AccessRedactFilter, AccessSampleFilter, JsonFormatter, _QueueHandler
+
+
+def access_record(status, path="/"):
+    return logging.LogRecord("uvicorn.access", logging.INFO, "", 0, '%s - "%s %s HTTP/%s" %d', ("1.2.3.4", "GET", path, "1.1", status), None)
+
+
+def test_json_formatter():
+    logger = logging.getLogger("test.json")
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        record = logger.makeRecord(logger.name, logging.ERROR, "", 0, "Failed for %s", ("kitchen",), sys.exc_info(), extra={"data_id": 3})
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Failed for kitchen"
+    assert entry["level"] == "ERROR"
+    assert entry["data_id"] == 3
+    assert "ZeroDivisionError" in entry["exception"]
+
+
+def test_access_sample_filter_keeps_errors():
+    sample = AccessSampleFilter(rate=0.0)
+    assert not sample.filter(access_record(200))
+    assert sample.filter(access_record(404))
+    assert AccessSampleFilter(rate=1.0).filter(access_record(200))
+
+
+def test_access_redact_filter():
+    record = access_record(200, "/stream/?data_id=1&access_token=eyJ.secret&x=2")
+    assert AccessRedactFilter().filter(record)
+    assert record.getMessage() == '1.2.3.4 - "GET /stream/?data_id=1&access_token=REDACTED&x=2 HTTP/1.1" 200'
+
+    record = access_record(200, "/datas/?search=access_token=1")
+    AccessRedactFilter().filter(record)
+    assert "access_token=1" in record.getMessage()
+
+
+def test_queue_handler_never_blocks():
+    target = logging.StreamHandler()
+    handler = _QueueHandler(queue.Queue(1), [target])
+    handler.handle(access_record(200))
+    handler.handle(access_record(200))
+
+    assert handler.dropped == 1
+    record = handler.queue.get_nowait()
+    assert record.getMessage() == '1.2.3.4 - "GET / HTTP/1.1" 200'
+    assert record.hh_targets == [target]
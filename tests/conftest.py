@@ -0,0 +1,51 @@
+import os
+
+# Settings read at import by the app modules; tests never use a configured database
+for _name, _value in {"DB_BACKEND": "sqlite", "SQLITE_PATH": ":memory:", "SECRET_KEY": "test", "ALGORITHM": "HS256", "BCRYPT_ROUNDS": "4"}.items():
+    os.environ.setdefault(_name, _value)
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.persistence import database, models
+from app.persistence.sqlite import memory_engine
+
+
+@pytest.fixture
+def sqlite_engine():
+    """
+    An empty in-memory database with the hh schema.
+    """
+    engine = memory_engine()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sqlite_tables(sqlite_engine):
+    """
+    An in-memory database with the tables of the models.
+    """
+    models.BaseWithToDict.metadata.create_all(sqlite_engine)
+    return sqlite_engine
+
+
+@pytest.fixture
+def sqlite_db(sqlite_tables):
+    with Session(sqlite_tables) as db:
+        yield db
+
+
+@pytest.fixture
+def app_client(monkeypatch, sqlite_tables):
+    """
+    A client of the app using the in-memory database. The lifespan, which would migrate, is not run.
+    """
+    from fastapi.testclient import TestClient
+
+    from app.api.main import app
+
+    monkeypatch.setattr(database, "_engine", sqlite_tables)
+    database.SessionLocal.configure(bind=sqlite_tables)
+    yield TestClient(app)
+    database.SessionLocal.configure(bind=None)
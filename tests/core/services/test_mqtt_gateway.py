@@ -0,0 +1,148 @@
+import datetime
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.core.domains.data_domain import DataType
+from app.core.services.exceptions import ValidationException
+from app.core.services.mqtt_gateway import BatchWriter, MqttGateway, TopicMap, parse_payload, topic_matches, topic_routes
+
+
+class StandInClient:
+    """
+    In-process stand-in for a paho client connected to a broker.
+    """
+
+    def __init__(self):
+        self.on_connect = None
+        self.on_message = None
+        self.subscriptions = set()
+        self.connected = False
+
+    def connect_async(self, host, port, keepalive):
+        pass
+
+    def loop_start(self):
+        self.connected = True
+        self.on_connect(self, None, {}, SimpleNamespace(is_failure=False))
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        self.connected = False
+
+    def is_connected(self):
+        return self.connected
+
+    def subscribe(self, topics):
+        self.subscriptions.update(topic for topic, qos in topics)
+
+    def unsubscribe(self, topics):
+        self.subscriptions.difference_update(topics)
+
+    def publish(self, topic, payload):
+        self.on_message(self, None, SimpleNamespace(topic=topic, payload=payload))
+
+
+def outcomes():
+    return {outcome: REGISTRY.get_sample_value("hh_mqtt_messages_total", {"outcome": outcome}) or 0 for outcome in ("written", "failed", "dropped", "invalid", "unrouted")}
+
+
+class Writes:
+    def __init__(self):
+        self.batches = []
+        self.done = threading.Event()
+
+    def __call__(self, data_id, data_points):
+        self.batches.append((data_id, [data_point.value for data_point in data_points]))
+        self.done.set()
+
+
+def test_topic_matches():
+    assert topic_matches("home/+/temperature", "home/kitchen/temperature")
+    assert not topic_matches("home/+/temperature", "home/kitchen/humidity")
+    assert topic_matches("home/#", "home/kitchen/temperature")
+    assert topic_matches("home/#", "home")
+    assert not topic_matches("home/kitchen", "home/kitchen/temperature")
+
+
+def test_topic_map_prefers_exact_topics():
+    topic_map = TopicMap(topic_routes([(1, "float", "home/+/temperature"), (2, "float", "home/kitchen/temperature"), (3, "float", "home/#/bad")]))
+    assert topic_map.route("home/kitchen/temperature").data_id == 2
+    assert topic_map.route("home/lounge/temperature").data_id == 1
+    assert topic_map.route("garden/temperature") is None
+    assert topic_map.topic_filters == {"home/+/temperature", "home/kitchen/temperature"}
+
+
+def test_parse_payload():
+    assert parse_payload(b"21.5", DataType.FLOAT).value == 21.5
+    assert parse_payload(b" 42 ", DataType.INTEGER).value == 42
+    assert parse_payload(b"open", DataType.STRING).value == "open"
+    data_point = parse_payload(b'{"value": "19", "created_at": "2025-01-01T00:00:00"}', DataType.FLOAT)
+    assert (data_point.value, data_point.created_at) == (19.0, datetime.datetime(2025, 1, 1))
+    with pytest.raises(ValidationException):
+        parse_payload(b"open", DataType.FLOAT)
+    with pytest.raises(ValidationException):
+        parse_payload(b'{"created_at": "2025-01-01T00:00:00"}', DataType.FLOAT)
+
+
+def test_parse_payload_keeps_strings_as_text():
+    assert parse_payload(b"21", DataType.STRING).value == "21"
+    assert parse_payload(b"true", DataType.STRING).value == "true"
+    assert parse_payload(b"null", DataType.STRING).value == "null"
+    assert parse_payload(b'"open"', DataType.STRING).value == "open"
+    assert parse_payload(b'{"value": 21.5}', DataType.STRING).value == "21.5"
+    assert parse_payload(b'{"value": false}', DataType.STRING).value == "false"
+
+
+def test_batch_writer_groups_by_data():
+    writes = Writes()
+    writer = BatchWriter(writes)
+    for data_id, value in [(1, 1.0), (2, 2.0), (1, 3.0)]:
+        writer.submit(data_id, parse_payload(str(value).encode(), DataType.FLOAT))
+    writer.write_batch([writer._queue.get_nowait() for _ in range(3)])
+    assert writes.batches == [(1, [1.0, 3.0]), (2, [2.0])]
+    assert writer.written == 3
+
+
+def test_batch_writer_drops_when_full():
+    dropped = outcomes()["dropped"]
+    writer = BatchWriter(Writes(), max_in_flight=1)
+    assert writer.submit(1, parse_payload(b"1", DataType.FLOAT))
+    start = time.perf_counter()
+    assert not writer.submit(1, parse_payload(b"2", DataType.FLOAT))
+    assert not writer.submit(1, parse_payload(b"3", DataType.FLOAT))
+    assert time.perf_counter() - start < 0.5
+    assert writer.dropped == 2
+    assert outcomes()["dropped"] == dropped + 2
+
+
+def test_gateway_routes_messages_to_writer():
+    routes = [(1, "float", "home/+/temperature")]
+    client = StandInClient()
+    writes = Writes()
+    before = outcomes()
+    gateway = MqttGateway(client, BatchWriter(writes, linger_seconds=0), lambda: topic_routes(routes), shared_group="hh")
+    gateway.start()
+    try:
+        assert client.subscriptions == {"$share/hh/home/+/temperature"}
+
+        client.publish("home/kitchen/temperature", b"21.5")
+        client.publish("home/kitchen/temperature", b"warm")
+        client.publish("garden/humidity", b"80")
+        assert writes.done.wait(5)
+        while gateway.writer.written < 1:
+            time.sleep(0.01)
+        assert writes.batches == [(1, [21.5])]
+        assert gateway.received == 3
+        assert {outcome: count - before[outcome] for outcome, count in outcomes().items()} == {"written": 1, "failed": 0, "dropped": 0, "invalid": 1, "unrouted": 1}
+
+        routes[:] = [(2, "integer", "home/garage/door")]
+        gateway.reload()
+        assert client.subscriptions == {"$share/hh/home/garage/door"}
+    finally:
+        gateway.stop()
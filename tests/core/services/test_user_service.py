@@ -0,0 +1,25 @@
+import asyncio
+
+from passlib.context import CryptContext
+
+from app.api.schemas import user_schema
+from app.core.services.user_service import UserService
+from app.persistence import models
+from app.persistence.repositories.user_repo import UserRepository
+from app.utils.query_trace import query_budget
+
+
+def test_authenticate_rehashes_without_reloading_the_user(sqlite_tables, sqlite_db):
+    # Rounds other than BCRYPT_ROUNDS, so the hash is replaced on login
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=5).hash("pw")
+    sqlite_db.add(models.User(id=1, username="u", email="u@x.com", password=old_hash))
+    sqlite_db.commit()
+    sqlite_db.expunge_all()
+
+    user = asyncio.run(UserService(UserRepository(sqlite_db)).authenticate("u@x.com", "pw"))
+    with query_budget(sqlite_tables, 0):
+        assert isinstance(user, user_schema.UserResponse)
+        assert user.id == 1
+
+    assert sqlite_db.get(models.User, 1).password != old_hash
+    assert asyncio.run(UserService(UserRepository(sqlite_db)).authenticate("u@x.com", "wrong")) is None
@@ -0,0 +1,49 @@
+import datetime
+
+from app.api.schemas import data_schema
+from app.persistence import models
+from app.persistence.meta_catalog import meta_catalog
+from app.persistence.repositories.data_point_repo import DataPointRepository
+from app.persistence.repositories.data_repo import DataRepository
+from app.utils.pagination import PaginationContext
+from app.utils.query_trace import query_budget
+
+
+DATAS = 10
+
+
+def seed(db):
+    db.add(models.User(id=1, username="u", email="u@x.com", password="-"))
+    db.add(models.Meta(id=1, name="room", meta_type="string"))
+    for data_id in range(1, DATAS + 1):
+        db.add(models.Data(id=data_id, created_by_user_id=1, name=f"temp{data_id}", data_type="float"))
+        db.add(models.DataMeta(data_id=data_id, meta_id=1, value="kitchen"))
+        db.add_all([models.DataPoint(data_id=data_id, created_at=datetime.datetime(2025, 1, 1, 0, 0, i), value=i) for i in range(3)])
+    db.commit()
+
+
+def test_get_datas_loads_relationships_in_batches(sqlite_tables, sqlite_db):
+    seed(sqlite_db)
+    meta_catalog.clear()
+    repo = DataRepository(sqlite_db)
+    repo.get_datas(PaginationContext(limit=DATAS), {"room": "kitchen"})
+
+    # Count, page, then one query per included relationship, whatever the number of datas
+    with query_budget(sqlite_tables, 4):
+        page = repo.get_datas(PaginationContext(limit=DATAS), {"room": "kitchen"}, include={"metas", "created_by_user"})
+        items = [data_schema.DataResponse.model_validate(data) for data in page.items]
+        for data in page.items:
+            assert [data_meta.value for data_meta in data.data_metas] == ["kitchen"]
+            assert data.created_by_user.username == "u"
+
+    assert page.total == DATAS
+    assert len(items) == DATAS
+    meta_catalog.clear()
+
+
+def test_get_latest_data_points_in_one_query(sqlite_tables, sqlite_db):
+    seed(sqlite_db)
+    with query_budget(sqlite_tables, 1):
+        latest = DataPointRepository(sqlite_db).get_latest_data_points(list(range(1, DATAS + 1)))
+
+    assert {data_id: data_point.value for data_id, data_point in latest.items()} == {data_id: 2 for data_id in range(1, DATAS + 1)}
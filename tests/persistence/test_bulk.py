@@ -0,0 +1,75 @@
+import datetime
+
+import pytest
+from sqlalchemy import create_engine, exc, func, literal_column, select
+
+from app.persistence import bulk, models
+from app.persistence.sqlite import configure_sqlite_engine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+    configure_sqlite_engine(engine, str(tmp_path / "hh.db"), cache_size_kb=1024, mmap_size=1024 * 1024)
+    models.BaseWithToDict.metadata.create_all(engine)
+    with engine.begin() as connection:
+        user_id = connection.execute(models.User.__table__.insert().values(username="u", email="u@x.com", password="-")).inserted_primary_key[0]
+        connection.execute(models.Data.__table__.insert().values(id=1, created_by_user_id=user_id, name="temp", data_type="float"))
+        connection.execute(models.Meta.__table__.insert().values(id=1, name="room", meta_type="string"))
+    yield engine
+    engine.dispose()
+
+
+def test_sqlite_pragmas(engine):
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA hh.journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA hh.synchronous").scalar() == 1
+        assert connection.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+
+
+def test_insert_data_points_matches_orm_storage(engine):
+    start = datetime.datetime(2025, 1, 1, 1, tzinfo=datetime.timezone(datetime.timedelta(hours=1)))
+    with engine.begin() as connection:
+        ids = bulk.insert_data_points(connection, [(1, start + datetime.timedelta(seconds=i), i) for i in (2, 0, 1)])
+
+    with engine.connect() as connection:
+        assert connection.execute(select(models.DataPoint.id, models.DataPoint.value).order_by(models.DataPoint.id)).all() == list(zip(ids, (2, 0, 1)))
+        rows = connection.execute(select(models.DataPoint.created_at, models.DataPoint.value).order_by(models.DataPoint.created_at)).all()
+        found = connection.execute(select(func.count()).where(models.DataPoint.created_at >= datetime.datetime(2025, 1, 1, 0, 0, 1))).scalar()
+
+    assert rows == [(datetime.datetime(2025, 1, 1, 0, 0, i), i) for i in range(3)]
+    assert found == 2
+
+
+def test_insert_data_points_foreign_key(engine):
+    with pytest.raises(exc.IntegrityError):
+        with engine.begin() as connection:
+            bulk.insert_data_points(connection, [(99, datetime.datetime(2025, 1, 1), 1.0)])
+
+
+def test_upsert(engine):
+    table = models.DataMeta.__table__
+    with engine.begin() as connection:
+        first = bulk.upsert(connection, table, {"data_id": 1, "meta_id": 1, "value": "kitchen"}, ["data_id", "meta_id"])
+        second = bulk.upsert(connection, table, {"data_id": 1, "meta_id": 1, "value": "lounge"}, ["data_id", "meta_id"])
+        count = connection.execute(select(func.count()).select_from(table)).scalar()
+
+    assert second.id == first.id
+    assert second.value == "lounge"
+    assert count == 1
+
+
+def test_epoch_bucket_aggregates(engine):
+    start = datetime.datetime(2025, 1, 1)
+    with engine.begin() as connection:
+        bulk.insert_data_points(connection, [(1, start + datetime.timedelta(minutes=i), float(i)) for i in range(120)])
+
+    bucket = models.epoch_bucket(models.DataPoint.created_at, literal_column("3600")).label("bucket")
+    value = models.json_number(models.DataPoint.value)
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(bucket, func.count(), func.min(value), func.max(value), func.avg(value)).group_by(bucket).order_by(bucket)
+            ).all()
+
+    epoch = int(start.replace(tzinfo=datetime.timezone.utc).timestamp())
+    assert rows == [(epoch, 60, 0.0, 59.0, 29.5), (epoch + 3600, 60, 60.0, 119.0, 89.5)]
@@ -0,0 +1,109 @@
+import datetime
+
+import psycopg
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from app.persistence import models, versions
+from app.persistence.changes import MAX_PAYLOAD_BYTES, ChangeBus, decode_changes, encode_changes, track_changes
+from app.persistence.versions import Change
+
+
+def session_factory(engine):
+    factory = sessionmaker(bind=engine, autoflush=False)
+    event.listen(factory, "after_flush", versions.bump_versions_after_flush)
+    return factory
+
+
+class Connection:
+    def __init__(self, fail_after=None):
+        self.payloads = []
+        self.fail_after = fail_after
+
+    def execute(self, statement, parameters):
+        if self.fail_after is not None and len(self.payloads) >= self.fail_after:
+            raise psycopg.OperationalError("connection lost")
+        self.payloads.append(parameters[1])
+
+
+def test_encode_decode():
+    changes = [Change("meta", 3), Change("data_point:7", 12, 1042, 20)]
+    payloads = encode_changes("worker", changes)
+    assert len(payloads) == 1
+    assert payloads[0][1] == changes
+    assert decode_changes(payloads[0][0]) == ("worker", changes)
+
+
+def test_encode_splits_payloads():
+    changes = [Change(f"data_point:{i}", i, i, 1) for i in range(2000)]
+    payloads = encode_changes("worker", changes)
+    assert len(payloads) > 1
+    assert all(len(payload) <= MAX_PAYLOAD_BYTES for payload, _ in payloads)
+    assert [change for payload, _ in payloads for change in decode_changes(payload)[1]] == changes
+    assert [change for _, batch in payloads for change in batch] == changes
+
+
+def test_tracks_committed_changes(sqlite_tables):
+    factory = session_factory(sqlite_tables)
+    published = []
+    track_changes(factory, published.append)
+
+    with factory() as db:
+        db.add(models.User(id=1, username="u", email="u@x.com", password="-"))
+        db.add(models.Data(id=1, created_by_user_id=1, name="temp", data_type="float"))
+        db.commit()
+        db.add_all([models.DataPoint(data_id=1, created_at=datetime.datetime(2025, 1, 1, 0, 0, i), value=i) for i in range(3)])
+        db.commit()
+        db.add(models.DataPoint(data_id=1, created_at=datetime.datetime(2025, 1, 2), value=0))
+        db.flush()
+        db.rollback()
+        versions.bump_versions(db.connection(), {"data_point:1"}, {"data_point:1": (9, 5)})
+        db.commit()
+
+    assert {change.key for change in published[0]} == {"user", "data", "data:1"}
+    assert published[1] == [Change("data_point:1", 1, 3, 3)]
+    assert published[2] == [Change("data_point:1", 2, 9, 5)]
+    assert len(published) == 3
+
+
+def test_bus_coalesces_and_skips_own_changes():
+    received = []
+    bus = ChangeBus("", received.append)
+    bus.publish([Change("data_point:1", 4, 10, 1)])
+    bus.publish([Change("data_point:1", 5, 12, 2), Change("meta", 2)])
+
+    connection = Connection()
+    bus.flush(connection)
+    bus.flush(connection)
+    assert len(connection.payloads) == 1
+    assert decode_changes(connection.payloads[0])[1] == [Change("data_point:1", 5, 12, 3), Change("meta", 2)]
+
+    bus.receive(connection.payloads[0])
+    assert received == []
+    bus.receive(encode_changes("other", [Change("meta", 3)])[0][0])
+    assert received == [[Change("meta", 3)]]
+
+
+def test_bus_keeps_unsent_changes():
+    received = []
+    resets = []
+    bus = ChangeBus("", received.append, lambda: resets.append(True))
+    changes = [Change(f"data_point:{i}", i, i, 1) for i in range(2000)]
+    bus.publish(changes)
+
+    connection = Connection(fail_after=1)
+    with pytest.raises(psycopg.Error):
+        bus.flush(connection)
+    bus.publish([Change("data_point:1999", 2000, 2001, 1)])
+
+    connection.fail_after = None
+    bus.flush(connection)
+    other = ChangeBus("", received.append, lambda: resets.append(True))
+    for payload in connection.payloads:
+        other.receive(payload)
+
+    assert resets == [True]
+    sent = {change.key: change for batch in received for change in batch}
+    assert len(sent) == 2000
+    assert sent["data_point:1999"] == Change("data_point:1999", 2000, 2001, 2)
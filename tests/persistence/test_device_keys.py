@@ -0,0 +1,82 @@
+import datetime
+
+from app.persistence import models, versions
+from app.persistence.device_keys import DeviceKeyTable, device_key_table
+from app.utils.api_keys import digest_secret, generate_api_key
+from app.utils.auth import device_key_pepper
+from app.utils.query_trace import query_budget
+
+
+PEPPER = b"pepper"
+
+
+def add_key(db, id, pepper=PEPPER):
+    key_id, secret, api_key = generate_api_key()
+    db.add(models.DeviceKey(id=id, key_id=key_id, name=f"sensor {id}", digest=digest_secret(secret, pepper), created_by_user_id=1))
+    db.flush()
+    versions.bump_versions(db.connection(), {"device_key"})
+    db.commit()
+    return api_key
+
+
+def revoke_key(db, id):
+    db.get(models.DeviceKey, id).revoked_at = datetime.datetime(2026, 1, 1)
+    db.flush()
+    versions.bump_versions(db.connection(), {"device_key"})
+    db.commit()
+
+
+def test_revoked_key_stops_authenticating(sqlite_db):
+    sqlite_db.add(models.User(id=1, username="u", email="u@x.com", password="-"))
+    sqlite_db.commit()
+    api_key = add_key(sqlite_db, 1)
+
+    # Refreshed on its own once reload_seconds passed
+    table = DeviceKeyTable(reload_seconds=0)
+    assert table.authenticate(sqlite_db, api_key, PEPPER).id == 1
+    assert table.authenticate(sqlite_db, api_key, b"other") is None
+    revoke_key(sqlite_db, 1)
+    assert table.authenticate(sqlite_db, api_key, PEPPER) is None
+
+    # Or at once when a change event invalidates it
+    api_key = add_key(sqlite_db, 2)
+    table = DeviceKeyTable(reload_seconds=3600, miss_reload_seconds=3600)
+    assert table.authenticate(sqlite_db, api_key, PEPPER).id == 2
+    revoke_key(sqlite_db, 2)
+    assert table.authenticate(sqlite_db, api_key, PEPPER).id == 2
+    table.invalidate()
+    assert table.authenticate(sqlite_db, api_key, PEPPER) is None
+
+
+def test_unknown_keys_reload_throttled(sqlite_tables, sqlite_db):
+    sqlite_db.add(models.User(id=1, username="u", email="u@x.com", password="-"))
+    sqlite_db.commit()
+    add_key(sqlite_db, 1)
+    table = DeviceKeyTable(reload_seconds=3600, miss_reload_seconds=3600)
+    _, _, unknown_key = generate_api_key()
+    assert table.authenticate(sqlite_db, unknown_key, PEPPER) is None
+
+    new_key = add_key(sqlite_db, 2)
+    with query_budget(sqlite_tables, 0):
+        assert table.authenticate(sqlite_db, unknown_key, PEPPER) is None
+        assert table.authenticate(sqlite_db, new_key, PEPPER) is None
+        assert table.peek(new_key, PEPPER) is None
+
+    table.miss_reload_seconds = 0
+    assert table.authenticate(sqlite_db, new_key, PEPPER).id == 2
+    assert table.peek(new_key, PEPPER).id == 2
+
+
+def test_ingest_accepts_device_keys(app_client, sqlite_db):
+    sqlite_db.add(models.User(id=1, username="u", email="u@x.com", password="-"))
+    sqlite_db.add(models.Data(id=1, created_by_user_id=1, name="temperature", data_type="float"))
+    sqlite_db.commit()
+    api_key = add_key(sqlite_db, 1, device_key_pepper())
+    device_key_table.invalidate()
+    try:
+        headers = {"X-API-Key": api_key}
+        assert app_client.post("/datas/1/data_points/", json={"data_id": 1, "value": 21.5}, headers=headers).status_code == 201
+        assert app_client.post("/datas/1/data_points/batch", json=[{"value": 22}], headers=headers).json() == {"data_id": 1, "count": 1}
+        assert app_client.post("/datas/1/data_points/", json={"data_id": 1, "value": 1}, headers={"X-API-Key": api_key + "x"}).status_code == 401
+    finally:
+        device_key_table.invalidate()
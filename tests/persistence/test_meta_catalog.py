@@ -0,0 +1,45 @@
+import pytest
+
+from app.persistence import models, versions
+from app.persistence.meta_catalog import MetaCatalog
+from app.utils.query_trace import query_budget
+
+
+@pytest.fixture
+def db(sqlite_db):
+    sqlite_db.add_all([models.Meta(id=1, name="room", meta_type="string"), models.Meta(id=2, name="unit", meta_type="string")])
+    sqlite_db.commit()
+    return sqlite_db
+
+
+def test_lookup(db):
+    catalog = MetaCatalog()
+    assert catalog.version is None
+    assert catalog.get_by_id(db, 1).name == "room"
+    assert catalog.get_by_name(db, "unit").id == 2
+    assert catalog.get_by_id(db, 3) is None
+    assert catalog.version == 0
+
+
+def test_miss_reloads(db):
+    catalog = MetaCatalog(miss_reload_seconds=0)
+    catalog.snapshot(db)
+
+    db.add(models.Meta(id=3, name="floor", meta_type="integer"))
+    versions.bump_versions(db.connection(), {"meta"})
+    db.commit()
+
+    assert catalog.get_by_name(db, "floor").meta_type == "integer"
+
+
+def test_misses_are_throttled(db, sqlite_tables):
+    catalog = MetaCatalog()
+    catalog.snapshot(db)
+    with query_budget(sqlite_tables, 0):
+        for _ in range(10):
+            assert catalog.get_by_name(db, "bogus") is None
+
+    # Past the interval, a miss only checks the version while nothing changed
+    catalog.miss_reload_seconds = 0
+    with query_budget(sqlite_tables, 1):
+        assert catalog.get_by_name(db, "bogus") is None
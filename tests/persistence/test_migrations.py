@@ -0,0 +1,57 @@
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+from app.persistence import migrate, models
+
+
+def test_head_revision():
+    script = ScriptDirectory.from_config(migrate.alembic_config())
+    assert script.get_current_head() == migrate.HEAD_REVISION
+
+
+def test_upgrade_matches_models(sqlite_engine):
+    engine = sqlite_engine
+    assert migrate.upgrade_if_needed(engine)
+    assert not migrate.upgrade_if_needed(engine)
+
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={"include_schemas": True, "include_object": migrate.include_object})
+        diffs = compare_metadata(context, models.BaseWithToDict.metadata)
+
+    # The trigram indexes only exist on Postgres
+    assert [diff for diff in diffs if not (diff[0] == "add_index" and diff[1].name.endswith("_trgm"))] == []
+
+
+def test_stamps_databases_predating_migrations(sqlite_engine):
+    engine = sqlite_engine
+    with engine.connect() as connection:
+        command.upgrade(migrate.alembic_config(connection), migrate.BASELINE_REVISION)
+        connection.exec_driver_sql("DROP TABLE hh.alembic_version")
+        connection.commit()
+        assert migrate.current_revision(connection) is None
+
+    assert migrate.upgrade_if_needed(engine)
+
+    with engine.connect() as connection:
+        assert migrate.current_revision(connection) == migrate.HEAD_REVISION
+
+
+def test_unique_data_metas_keep_duplicates(sqlite_engine):
+    engine = sqlite_engine
+    with engine.connect() as connection:
+        command.upgrade(migrate.alembic_config(connection), "0002")
+        connection.exec_driver_sql("INSERT INTO hh.user (id, created_at, username, email, password) VALUES (1, '2026-01-01', 'u', 'u@x.com', '-')")
+        connection.exec_driver_sql("INSERT INTO hh.data (id, created_by_user_id, created_at, name, data_type) VALUES (1, 1, '2026-01-01', 'd', 'string')")
+        connection.exec_driver_sql("INSERT INTO hh.meta (id, name, meta_type) VALUES (2, 'room', 'string')")
+        connection.exec_driver_sql("INSERT INTO hh.data_meta (data_id, meta_id, value) VALUES (1, 2, '\"a\"'), (1, 2, '\"b\"')")
+        connection.commit()
+
+    with pytest.raises(RuntimeError, match=r"\(1, 2\)"):
+        migrate.upgrade_if_needed(engine)
+
+    with engine.connect() as connection:
+        assert migrate.current_revision(connection) == "0002"
+        assert connection.exec_driver_sql("SELECT count(*) FROM hh.data_meta").scalar() == 2
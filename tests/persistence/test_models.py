@@ -0,0 +1,12 @@
+from app.persistence.models import Meta, User, compile_serializer
+
+
+def test_to_dict_columns():
+    meta = Meta(id=1, name="room", meta_type="string")
+    assert meta.to_dict() == {"id": 1, "name": "room", "meta_type": "string"}
+
+
+def test_compile_serializer_exclude():
+    serialize_user = compile_serializer(User, exclude=("password", "created_at"))
+    user = User(id=1, username="fred", email="fred@example.com", password="secret")
+    assert serialize_user(user) == {"id": 1, "username": "fred", "email": "fred@example.com"}
@@ -0,0 +1,50 @@
+from app.persistence import models
+from app.persistence.search import fts5_query, search_datas
+
+
+def test_fts5_query_prefix_words():
+    assert fts5_query("kitchen temp") == '"kitchen"* "temp"*'
+
+
+def test_fts5_query_strips_syntax():
+    assert fts5_query('kitchen" OR temp*') == '"kitchen"* "OR"* "temp"*'
+
+
+def test_fts5_query_empty():
+    assert fts5_query("--") == ""
+
+
+def test_search_datas_sqlite(sqlite_db):
+    sqlite_db.add(models.User(id=1, username="u", email="u@x.com", password="-"))
+    sqlite_db.add_all([
+        models.Data(id=1, created_by_user_id=1, name="kitchen_temperature", description="Temperature by the oven", data_type="float"),
+        models.Data(id=2, created_by_user_id=1, name="garage_door", description="Open or closed", data_type="string"),
+        models.Data(id=3, created_by_user_id=1, name="cellar_humidity", data_type="float"),
+        models.Meta(id=1, name="room", meta_type="string"),
+        models.Meta(id=2, name="floor", meta_type="integer"),
+    ])
+    sqlite_db.flush()
+    sqlite_db.add_all([
+        models.DataMeta(data_id=3, meta_id=1, value="Basement"),
+        models.DataMeta(data_id=2, meta_id=2, value=0),
+    ])
+    sqlite_db.commit()
+
+    def search(text):
+        return [data.id for data in search_datas(sqlite_db.query(models.Data), text, "sqlite")]
+
+    # Names, descriptions and string meta values, by word prefix
+    assert search("oven") == [1]
+    assert search("temp") == [1]
+    assert search("basem") == [3]
+    assert search("0") == []
+    assert search("temperature oven") == [1]
+
+    # The triggers follow updates and deletes
+    sqlite_db.get(models.Data, 2).description = "Basement door"
+    sqlite_db.query(models.DataMeta).filter_by(data_id=3).delete()
+    sqlite_db.commit()
+    assert search("basement") == [2]
+
+    # Searches without words fall back to a name substring match, with wildcards escaped
+    assert search("%") == []
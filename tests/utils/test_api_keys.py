@@ -0,0 +1,20 @@
+from app.utils.api_keys import digest_secret, generate_api_key, parse_api_key, verify_secret
+
+
+def test_generate_and_parse():
+    key_id, secret, api_key = generate_api_key()
+    assert api_key.startswith("hh_")
+    assert parse_api_key(api_key) == (key_id, secret)
+
+
+def test_parse_malformed():
+    assert parse_api_key("") is None
+    assert parse_api_key("hh_abc") is None
+    assert parse_api_key("xx_abc_def") is None
+
+
+def test_verify_secret():
+    digest = digest_secret("secret", b"pepper")
+    assert verify_secret("secret", digest, b"pepper")
+    assert not verify_secret("secreT", digest, b"pepper")
+    assert not verify_secret("secret", digest, b"other")
@@ -0,0 +1,20 @@
+from app.persistence import models
+from app.utils.auth import create_access_token
+
+
+def test_not_modified_varies_on_accept(app_client, sqlite_db):
+    sqlite_db.add(models.User(id=1, username="u", email="u@x.com", password="-"))
+    sqlite_db.add(models.Data(id=1, created_by_user_id=1, name="temperature", data_type="float"))
+    sqlite_db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'user_id': 1})}"}
+
+    response = app_client.get("/datas/1/data_points/", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["Vary"] == "Accept"
+
+    response = app_client.get("/datas/1/data_points/", headers={**headers, "If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+    assert response.headers["Vary"] == "Accept"
+
+    csv_response = app_client.get("/datas/1/data_points/", headers={**headers, "Accept": "text/csv", "If-None-Match": response.headers["ETag"]})
+    assert csv_response.status_code == 200
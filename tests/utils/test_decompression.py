@@ -0,0 +1,72 @@
+import gzip
+
+import pytest
+
+from app.utils.decompression import OUTPUT_CHUNK_SIZE, BoundedDecompressor, DecompressedSizeExceededException, InvalidCompressedDataException, UnsupportedEncodingException
+
+
+def decompress_all(decompressor, data, chunk_size=1000):
+    pieces = []
+    for i in range(0, len(data), chunk_size):
+        pieces += decompressor.decompress(data[i:i + chunk_size])
+    return pieces + decompressor.flush()
+
+
+def test_gzip():
+    body = b"0123456789" * 50000
+    pieces = decompress_all(BoundedDecompressor("gzip", len(body)), gzip.compress(body))
+    assert b"".join(pieces) == body
+    assert max(len(piece) for piece in pieces) <= OUTPUT_CHUNK_SIZE
+
+
+def test_gzip_members():
+    data = gzip.compress(b"abc") + gzip.compress(b"def")
+    assert b"".join(decompress_all(BoundedDecompressor("gzip", 10), data)) == b"abcdef"
+
+
+def test_gzip_limit():
+    decompressor = BoundedDecompressor("gzip", 10 ** 6)
+    with pytest.raises(DecompressedSizeExceededException):
+        decompressor.decompress(gzip.compress(b"\0" * 10 ** 8))
+    assert decompressor.size <= 10 ** 6 + OUTPUT_CHUNK_SIZE
+
+
+def test_gzip_truncated():
+    with pytest.raises(InvalidCompressedDataException):
+        decompress_all(BoundedDecompressor("gzip", 100), gzip.compress(b"abc")[:-4])
+
+
+def test_zstd_limit():
+    zstandard = pytest.importorskip("zstandard")
+    data = zstandard.ZstdCompressor().compress(b"\0" * 10 ** 8)
+    assert b"".join(decompress_all(BoundedDecompressor("zstd", 10 ** 8), data)) == b"\0" * 10 ** 8
+    with pytest.raises(DecompressedSizeExceededException):
+        decompress_all(BoundedDecompressor("zstd", 10 ** 6), data)
+
+
+def test_zstd_frames():
+    zstandard = pytest.importorskip("zstandard")
+    body = b"0123456789" * 50000
+    data = zstandard.ZstdCompressor().compress(body) + zstandard.ZstdCompressor().compress(b"abc")
+    pieces = decompress_all(BoundedDecompressor("zstd", len(body) + 3), data)
+    assert b"".join(pieces) == body + b"abc"
+    assert max(len(piece) for piece in pieces) <= OUTPUT_CHUNK_SIZE
+
+
+def test_zstd_truncated():
+    zstandard = pytest.importorskip("zstandard")
+    data = zstandard.ZstdCompressor().compress(b"0123456789" * 50000)
+    with pytest.raises(InvalidCompressedDataException):
+        decompress_all(BoundedDecompressor("zstd", 10 ** 6), data[:len(data) // 2])
+
+
+def test_identity_limit():
+    decompressor = BoundedDecompressor("identity", 5)
+    assert decompressor.decompress(b"abc") == [b"abc"]
+    with pytest.raises(DecompressedSizeExceededException):
+        decompressor.decompress(b"abc")
+
+
+def test_unsupported():
+    with pytest.raises(UnsupportedEncodingException):
+        BoundedDecompressor("br", 100)
@@ -0,0 +1,53 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.utils.metrics import MetricsMiddleware, instrument_engine
+
+
+engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+instrument_engine(engine)
+
+app = FastAPI()
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/items/{item_id}")
+def read_item(item_id: int):
+    with engine.connect() as connection:
+        for _ in range(3):
+            connection.execute(text("SELECT 1"))
+    return {"id": item_id}
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_requests_labelled_by_route_template():
+    client = TestClient(app)
+    before = sample("hh_http_requests_total", method="GET", route="/items/{item_id}", status="200")
+    unmatched = sample("hh_http_requests_total", method="GET", route="unmatched", status="404")
+    latencies = sample("hh_http_request_duration_seconds_count", method="GET", route="/items/{item_id}", status="200")
+
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing")
+
+    assert sample("hh_http_requests_total", method="GET", route="/items/{item_id}", status="200") == before + 2
+    assert sample("hh_http_requests_total", method="GET", route="unmatched", status="404") == unmatched + 1
+    assert sample("hh_http_request_duration_seconds_count", method="GET", route="/items/{item_id}", status="200") == latencies + 2
+    assert sample("hh_http_requests_in_flight") == 0
+
+
+def test_statements_counted_per_request():
+    client = TestClient(app)
+    count = sample("hh_http_request_db_statements_count", route="/items/{item_id}")
+    statements = sample("hh_http_request_db_statements_sum", route="/items/{item_id}")
+
+    client.get("/items/1")
+
+    assert sample("hh_http_request_db_statements_count", route="/items/{item_id}") == count + 1
+    assert sample("hh_http_request_db_statements_sum", route="/items/{item_id}") == statements + 3
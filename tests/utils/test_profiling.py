@@ -0,0 +1,63 @@
+import pstats
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils.profiling import ProfilingMiddleware, instrument_sync_endpoints
+
+
+def sync_work(n):
+    return sum(range(n))
+
+
+async def async_work(n):
+    return sum(range(n))
+
+
+router = APIRouter()
+
+
+@router.get("/sync/{n}")
+def sync_endpoint(n: int):
+    return {"sum": sync_work(n)}
+
+
+@router.get("/async/{n}")
+async def async_endpoint(n: int):
+    return {"sum": await async_work(n)}
+
+
+def make_client(directory):
+    instrument_sync_endpoints(router.routes)
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, directory=str(directory), token="secret", keep=2)
+    app.include_router(router)
+    return TestClient(app)
+
+
+def profiled_functions(path):
+    return {function for _, _, function in pstats.Stats(str(path)).stats}
+
+
+def test_profiles_requests_with_token(tmp_path):
+    client = make_client(tmp_path)
+
+    response = client.get("/sync/10")
+    assert response.json() == {"sum": 45}
+    assert "x-profile-id" not in response.headers
+    assert "x-profile-id" not in client.get("/sync/10", headers={"X-Profile": "wrong"}).headers
+
+    name = client.get("/sync/10", headers={"X-Profile": "secret"}).headers["x-profile-id"]
+    assert "sync_work" in profiled_functions(tmp_path / name)
+
+    name = client.get("/async/10", headers={"X-Profile": "secret"}).headers["x-profile-id"]
+    assert "async_work" in profiled_functions(tmp_path / name)
+
+    # Path parameters still come from the endpoint signature
+    assert "n" in str(client.app.openapi()["paths"]["/sync/{n}"])
+
+
+def test_keeps_newest_profiles(tmp_path):
+    client = make_client(tmp_path)
+    names = [client.get("/async/1", headers={"X-Profile": "secret"}).headers["x-profile-id"] for _ in range(3)]
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(names[1:])
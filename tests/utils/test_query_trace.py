@@ -0,0 +1,87 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.utils.metrics import StatementStats, instrument_engine, request_statements
+from app.utils.query_trace import QueryBudgetExceeded, QueryTracer, query_budget
+
+
+def make_engine(tracer):
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    instrument_engine(engine, slow_seconds=tracer.slow_seconds, on_slow_statement=tracer.log_slow)
+    return engine
+
+
+def test_slow_statement_logged_with_plan(caplog):
+    engine = make_engine(QueryTracer(slow_ms=0.000001, explain=True, log_parameters=True))
+    with caplog.at_level(logging.WARNING), engine.connect() as connection:
+        assert connection.execute(text("SELECT :value"), {"value": 7}).scalar() == 7
+
+    assert "Slow statement" in caplog.text
+    assert "7" in caplog.text
+    assert "Plan:" in caplog.text
+
+
+def test_slow_statement_parameters_redacted(caplog):
+    engine = make_engine(QueryTracer(slow_ms=0.000001))
+    with caplog.at_level(logging.WARNING), engine.connect() as connection:
+        connection.execute(text("SELECT :secret"), {"secret": "$2b$12$hash"})
+
+    assert "Slow statement" in caplog.text
+    assert "$2b$12$hash" not in caplog.text
+
+
+class Cursor:
+    def __init__(self, executed):
+        self.executed = executed
+
+    def execute(self, statement, parameters=None):
+        self.executed.append(statement)
+        if statement.startswith("EXPLAIN"):
+            raise RuntimeError("canceling statement due to statement timeout")
+
+    def close(self):
+        pass
+
+
+def test_failed_explain_rolls_back_to_savepoint():
+    executed = []
+    conn = SimpleNamespace(
+        dialect=SimpleNamespace(name="postgresql"),
+        connection=SimpleNamespace(dbapi_connection=SimpleNamespace(cursor=lambda: Cursor(executed))),
+        )
+    plan = QueryTracer(explain=True)._explain(conn, "SELECT 1", ())
+
+    assert plan.startswith("EXPLAIN failed: canceling statement")
+    assert executed == ["SAVEPOINT hh_explain", "EXPLAIN (ANALYZE, BUFFERS) SELECT 1", "ROLLBACK TO SAVEPOINT hh_explain", "RELEASE SAVEPOINT hh_explain"]
+
+
+def test_repeated_statements_reported(caplog):
+    tracer = QueryTracer(statement_warn=3, repeat_warn=2)
+    engine = make_engine(tracer)
+    stats = StatementStats()
+    token = request_statements.set(stats)
+    with engine.connect() as connection:
+        for i in range(4):
+            connection.execute(text("SELECT :i"), {"i": i})
+    request_statements.reset(token)
+
+    with caplog.at_level(logging.WARNING):
+        tracer.report(stats, "GET", "/datas/{data_id}")
+
+    assert "executed 4 statements" in caplog.text
+    assert "same statement 4 times" in caplog.text
+
+
+def test_query_budget():
+    engine = make_engine(QueryTracer())
+    with query_budget(engine, 2), engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    with pytest.raises(QueryBudgetExceeded, match="3 statements"):
+        with query_budget(engine, 2), engine.connect() as connection:
+            for _ in range(3):
+                connection.execute(text("SELECT 1"))
@@ -0,0 +1,43 @@
+from app.utils.rate_limit import ConcurrencyLimiter, RateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_rate_limiter_allows_burst_then_refills():
+    clock = Clock()
+    limiter = RateLimiter(rate=2, burst=3, clock=clock)
+    assert [limiter.acquire("a") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("a") == 0.5
+    assert limiter.acquire("b") == 0
+
+    clock.now = 0.5
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == 0.5
+
+    clock.now = 100
+    assert [limiter.acquire("a") for _ in range(3)] == [0, 0, 0]
+
+
+def test_rate_limiter_evicts_least_recent():
+    limiter = RateLimiter(rate=1, burst=1, maxsize=2, clock=Clock())
+    limiter.acquire("a")
+    limiter.acquire("b")
+    limiter.acquire("a")
+    limiter.acquire("c")
+    assert len(limiter) == 2
+    assert limiter.acquire("a") > 0
+    assert limiter.acquire("b") == 0
+
+
+def test_concurrency_limiter():
+    limiter = ConcurrencyLimiter(2)
+    assert limiter.try_acquire() and limiter.try_acquire()
+    assert not limiter.try_acquire()
+    limiter.release()
+    assert limiter.try_acquire()
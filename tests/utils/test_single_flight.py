@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import httpx
+from fastapi import APIRouter, FastAPI, HTTPException
+
+from app.utils.single_flight import SingleFlightMiddleware, coalesced_routes
+
+
+router = APIRouter()
+calls = []
+
+
+@router.get("/sync/{item_id}")
+def get_sync_endpoint(item_id: int, unit: str = "c"):
+    calls.append(("sync", item_id))
+    time.sleep(0.1)
+    return {"item_id": item_id, "unit": unit, "call": len(calls)}
+
+
+@router.get("/async/{item_id}")
+async def get_async_endpoint(item_id: int):
+    calls.append(("async", item_id))
+    await asyncio.sleep(0.1)
+    if item_id == 0:
+        raise HTTPException(status_code=503)
+    return {"item_id": item_id, "call": len(calls)}
+
+
+@router.get("/other")
+async def get_other_endpoint():
+    calls.append(("other", None))
+    await asyncio.sleep(0.1)
+    return {}
+
+
+app = FastAPI()
+app.include_router(router)
+app.add_middleware(SingleFlightMiddleware, routes=coalesced_routes(router.routes, ["get_sync", "get_async"]))
+
+
+async def get_all(*requests):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await asyncio.gather(*[client.get(url, **kwargs) for url, kwargs in requests])
+
+
+def test_coalesces_identical_requests():
+    calls.clear()
+    responses = asyncio.run(get_all(
+        *[("/sync/1?unit=c&x=1", {})] * 5,
+        ("/sync/1?x=1&unit=c", {}),
+        *[("/async/1", {})] * 5,
+        ))
+    assert calls.count(("sync", 1)) == 1
+    assert calls.count(("async", 1)) == 1
+    assert len({response.content for response in responses[:6]}) == 1
+    assert len({response.content for response in responses[6:]}) == 1
+
+
+def test_keys_on_query_and_credentials():
+    calls.clear()
+    asyncio.run(get_all(
+        ("/sync/1", {}),
+        ("/sync/1?unit=f", {}),
+        ("/sync/1", {"headers": {"Authorization": "Bearer a"}}),
+        ("/sync/1", {"headers": {"Authorization": "Bearer b"}}),
+        ("/sync/2", {}),
+        ))
+    assert len(calls) == 5
+
+
+def test_runs_again_after_server_errors_and_outside_routes():
+    calls.clear()
+    responses = asyncio.run(get_all(*[("/async/0", {})] * 3, *[("/other", {})] * 2))
+    assert [response.status_code for response in responses] == [503] * 3 + [200] * 2
+    assert calls.count(("async", 0)) == 3
+    assert calls.count(("other", None)) == 2
@@ -0,0 +1,56 @@
+import asyncio
+import datetime
+import json
+import threading
+
+from app.utils.streams import StreamHub
+
+
+def test_publish_to_subscribers():
+    async def run():
+        hub = StreamHub()
+        subscription = hub.subscribe({1, 2})
+        other = hub.subscribe({2})
+        assert hub.publish(1, [{"data_id": 1, "created_at": datetime.datetime(2025, 1, 1), "value": 1.5}]) == 1
+        assert hub.publish(3, [{"data_id": 3, "value": 0}]) == 0
+        events = await subscription.get(1)
+        assert [json.loads(event) for event in events] == [{"data_id": 1, "created_at": "2025-01-01T00:00:00", "value": 1.5}]
+        assert await other.get(0.01) == []
+    asyncio.run(run())
+
+
+def test_drops_oldest():
+    async def run():
+        hub = StreamHub()
+        subscription = hub.subscribe({1}, maxlen=3)
+        hub.publish(1, [{"value": i} for i in range(2)])
+        hub.publish(1, [{"value": i} for i in range(2, 7)])
+        events = await subscription.get(1)
+        assert [json.loads(event)["value"] for event in events] == [4, 5, 6]
+        assert subscription.take_dropped() == 4
+        assert subscription.take_dropped() == 0
+    asyncio.run(run())
+
+
+def test_publish_from_thread():
+    async def run():
+        hub = StreamHub()
+        subscription = hub.subscribe({1})
+        thread = threading.Thread(target=hub.publish, args=(1, [{"value": 1}]))
+        thread.start()
+        events = await subscription.get(1)
+        thread.join()
+        assert events == ['{"value": 1}']
+    asyncio.run(run())
+
+
+def test_update_and_unsubscribe():
+    async def run():
+        hub = StreamHub()
+        subscription = hub.subscribe({1})
+        hub.update(subscription, {2})
+        assert not hub.has_subscribers(1)
+        assert hub.has_subscribers(2)
+        hub.unsubscribe(subscription)
+        assert hub.stats() == {"data_ids": 0, "subscriptions": 0}
+    asyncio.run(run())
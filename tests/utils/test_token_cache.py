@@ -0,0 +1,63 @@
+from prometheus_client import REGISTRY
+
+from app.utils.token_cache import TokenCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def counts():
+    return [REGISTRY.get_sample_value(f"hh_token_cache_{name}_total") for name in ("hits", "misses", "evictions")]
+
+
+def test_hit_and_miss():
+    hits, misses, evictions = counts()
+    cache = TokenCache()
+    assert cache.get("token") is None
+    cache.put("token", 2 ** 40, {"id": 1})
+    assert cache.get("token") == {"id": 1}
+    assert counts() == [hits + 1, misses + 1, evictions]
+    assert len(cache) == 1
+
+
+def test_expiry():
+    clock = Clock()
+    cache = TokenCache(clock=clock)
+    cache.put("token", 1060, {"id": 1})
+    assert cache.get("token") == {"id": 1}
+    clock.now = 1060
+    assert cache.get("token") is None
+    assert len(cache) == 0
+
+
+def test_no_exp_not_cached():
+    cache = TokenCache()
+    cache.put("token", None, {"id": 1})
+    assert cache.get("token") is None
+
+
+def test_lru_eviction():
+    evictions = counts()[2]
+    cache = TokenCache(maxsize=2)
+    cache.put("a", 2 ** 40, 1)
+    cache.put("b", 2 ** 40, 2)
+    cache.get("a")
+    cache.put("c", 2 ** 40, 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert counts()[2] == evictions + 1
+
+
+def test_key_rotation():
+    cache = TokenCache()
+    cache.use_key("first")
+    cache.put("token", 2 ** 40, {"id": 1})
+    cache.use_key("first")
+    assert cache.get("token") == {"id": 1}
+    cache.use_key("second")
+    assert cache.get("token") is None